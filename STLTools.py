@@ -5,6 +5,19 @@ import re
 import struct
 import math
 import sys
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # the facets are read one at a time without numpy
+
+if numpy != None:
+    # one record of a binary STL file, 50 bytes
+    facet_dtype = numpy.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (9,)), ('attribute', '<u2')])
+    # ASCII files are read as doubles, like the values given to PushTriangle without numpy
+    ascii_facet_dtype = numpy.dtype([('normal', '<f8', (3,)), ('vertices', '<f8', (9,)), ('attribute', '<u2')])
+    ascii_vertex_pattern = re.compile("vertex[^\S\n]*([\d\-+\.EeDd]+)[^\S\n]*([\d\-+\.EeDd]+)[^\S\n]*([\d\-+\.EeDd]+)")
 
 ###########################################################################        
 def TriangleNormal(x0, y0, z0, x1, y1, z1, x2, y2, z2):
@@ -36,6 +49,7 @@ class reader:
         
         self.nfacets = 0
         self.ndegenerate = 0
+        self.facets = None # with numpy, the array of facets last read
         
         self.mr = MeasureBoundingBox()
             
@@ -59,6 +73,10 @@ class reader:
 
 
     def BinaryReadFacets(self, fl, fs = None):
+        if numpy != None:
+            self.SetFacetArray(self.BinaryReadArray(fl), fs)
+            return
+
         # 80 bytes of header
         hdr = fl.read(80)
         
@@ -92,6 +110,10 @@ class reader:
                 
             
     def AsciiReadFacets(self, fl, fs = None):
+        if numpy != None:
+            self.SetFacetArray(self.AsciiReadArray(fl), fs)
+            return
+
         lines = fl.readlines()
         xyz = []
         for l in lines:
@@ -111,6 +133,80 @@ class reader:
                 self.mr.PushTriangle(xyz[0], xyz[1], xyz[2], xyz[3], xyz[4], xyz[5], xyz[6], xyz[7], xyz[8])
                 xyz = []
 
+    def BinaryReadArray(self, fl):
+        # reads the facets into a numpy array of facet_dtype
+        hdr = fl.read(80)
+        self.nfacets = struct.unpack("<i", fl.read(4))[0]
+        data = fl.read()
+        # like BinaryReadFacets, use the file size rather than the number of facets in the header
+        nfacets = len(data) / facet_dtype.itemsize
+        if self.nfacets != nfacets:
+            sys.stderr.write("Number of facets according to header: %d, number of facets read: %d\n" % (self.nfacets, nfacets))
+        self.nfacets = 0 # added to by SetFacetArray
+        return numpy.frombuffer(data, dtype = facet_dtype, count = nfacets)
+
+    def AsciiReadArray(self, fl):
+        # reads the facets into a numpy array of ascii_facet_dtype, the normals are left as zero
+        # all the vertex lines are found with one regular expression, rather than ReadVertex for each line
+        data = fl.read().replace(",", ".") # Catia writes ASCII STL with , as decimal point
+        values = ascii_vertex_pattern.findall(data)
+        nfacets = len(values) / 3
+        facets = numpy.zeros(nfacets, dtype = ascii_facet_dtype)
+        if nfacets:
+            facets['vertices'] = numpy.array(values[:nfacets * 3]).astype(numpy.float64).reshape(nfacets, 9)
+        return facets
+
+    def MapFacetArray(self):
+        # maps the facets of a binary file into memory, without reading them, and measures them
+        # the triangles can be given to PushTriangle with PushTriangles
+        if self.isascii:
+            fl = open(self.fn, "r")
+            self.SetFacetArray(self.AsciiReadArray(fl))
+            fl.close()
+            return self.facets
+
+        fl = open(self.fn, "rb")
+        fl.read(80)
+        self.nfacets = struct.unpack("<i", fl.read(4))[0]
+        fl.close()
+        nfacets = (os.path.getsize(self.fn) - 84) / facet_dtype.itemsize
+        if self.nfacets != nfacets:
+            sys.stderr.write("Number of facets according to header: %d, number of facets read: %d\n" % (self.nfacets, nfacets))
+        self.nfacets = 0
+        if nfacets > 0: facets = numpy.memmap(self.fn, dtype = facet_dtype, mode = 'r', offset = 84, shape = (nfacets,))
+        else: facets = numpy.zeros(0, dtype = facet_dtype)
+        self.SetFacetArray(facets)
+        return self.facets
+
+    def SetFacetArray(self, facets, fs = None):
+        self.facets = facets
+        self.nfacets += len(facets)
+        self.ndegenerate += CountDegenerate(facets['vertices'])
+        self.mr.PushTriangleArray(facets['vertices'])
+        if fs:
+            self.PushTriangles(fs)
+
+    def Triangles(self, block_size = 65536):
+        # iterates through the facets last read, giving the 9 coordinates of each one as a tuple
+        for i in xrange(0, len(self.facets), block_size):
+            for xyz in self.facets['vertices'][i:i + block_size].tolist():
+                yield tuple(xyz)
+
+    def PushTriangles(self, fs):
+        # gives the facets last read to an object with a PushTriangle method, as BinaryReadFacets and AsciiReadFacets do
+        for xyz in self.Triangles():
+            fs.PushTriangle(xyz[0], xyz[1], xyz[2], xyz[3], xyz[4], xyz[5], xyz[6], xyz[7], xyz[8])
+
+###########################################################################        
+def CountDegenerate(vertices):
+    # the number of triangles in an array of 9 coordinates per triangle which TriangleNormal would give None for
+    if len(vertices) == 0: return 0
+    v = numpy.asarray(vertices, dtype = numpy.float64)
+    v01 = v[:, 3:6] - v[:, 0:3]
+    v02 = v[:, 6:9] - v[:, 0:3]
+    n = numpy.cross(v01, v02)
+    ln = numpy.sqrt((n * n).sum(axis = 1))
+    return int(len(ln) - numpy.count_nonzero(ln > 0.0))
         
 
 ################################################################################        
@@ -196,6 +292,18 @@ class MeasureBoundingBox:
             if self.zhi is None or v[2] > self.zhi:
                 self.zhi = v[2]
 
+    def PushTriangleArray(self, vertices):
+        # measures a numpy array of 9 coordinates per triangle
+        if len(vertices) == 0: return
+        for lo, hi, i in [('xlo', 'xhi', 0), ('ylo', 'yhi', 1), ('zlo', 'zhi', 2)]:
+            values = vertices[:, i::3]
+            low = float(values.min())
+            high = float(values.max())
+            if getattr(self, lo) is None or low < getattr(self, lo):
+                setattr(self, lo, low)
+            if getattr(self, hi) is None or high > getattr(self, hi):
+                setattr(self, hi, high)
+
             
 
 ###########################################################################        
@@ -47,11 +47,48 @@ class VoxelCyl:
         self.z_top = int(z) + 1
         self.color = color
 
+    def sweep_step(self):
+        # the distance between the places along a move that the cylinder is removed at
+        r = self.radius
+        if self.z_top - self.z_bottom > 1:
+            # a voxel on the edge of a small circle is only removed by a cylinder centred right beside it,
+            # and where another cut is next to it, it would be left inside the cut
+            if r <= 4: return 1.0
+        else:
+            # a cylinder one voxel high can only leave material one voxel deep
+            r = max(r, 3)
+        # near enough that the material left between two circles is less than 0.9 of a voxel deep,
+        # even when rounding their centres down to whole voxels moves them up to 1.414 voxels further apart
+        return max(1.0, 2 * math.sqrt(1.8 * r - 0.81) - 1.414)
+
     def cut(self, rapid):
         if rapid == True: voxelcut.set_current_color(0x600000)
         else: voxelcut.set_current_color(self.color)
         voxelcut.remove_cylinder(int(x_for_cut), int(y_for_cut), z_for_cut + int(self.z_bottom), int(x_for_cut), int(y_for_cut), z_for_cut + int(self.z_top), int(self.radius))
-        
+
+    def cut_line(self, x0, y0, z0, x1, y1, z1, rapid):
+        # removes the volume the cylinder sweeps through moving from x0, y0, z0 to x1, y1, z1, in voxels
+        # voxelcut can only remove upright cylinders, so the cylinder is removed at places spaced along the move
+        # a move straight up or down is one cylinder; along a move which goes up or down by more than the height of the
+        # cylinder at each step, the cylinders are made taller, so that there are no gaps between them
+        # the bottom is rounded down and the top rounded up, so that no layer the cylinder passes through is left
+        if rapid == True: voxelcut.set_current_color(0x600000)
+        else: voxelcut.set_current_color(self.color)
+        dx = x1 - x0
+        dy = y1 - y0
+        dz = z1 - z0
+        num_steps = int(math.ceil(math.sqrt(dx*dx + dy*dy) / self.sweep_step()))
+        if num_steps == 0:
+            voxelcut.remove_cylinder(int(x0), int(y0), int(math.floor(min(z0, z1) + self.z_bottom)), int(x0), int(y0), int(math.ceil(max(z0, z1) + self.z_top)), self.radius)
+            return
+        extra_height = max(0.0, math.fabs(dz) / num_steps - (self.z_top - self.z_bottom))
+        for i in range(0, num_steps + 1):
+            f = float(i) / num_steps
+            x = int(x0 + dx * f)
+            y = int(y0 + dy * f)
+            z = z0 + dz * f
+            voxelcut.remove_cylinder(x, y, int(math.floor(z + self.z_bottom)), x, y, int(math.ceil(z + extra_height + self.z_top)), self.radius)
+
     def draw(self, rapid):
 
         color = self.color
@@ -133,7 +170,11 @@ class Tool:
         
         for cylinder in self.cylinders:
             cylinder.cut(rapid)
-            
+
+    def cut_line(self, x0, y0, z0, x1, y1, z1, rapid):
+        for cylinder in self.cylinders:
+            cylinder.cut_line(x0, y0, z0, x1, y1, z1, rapid)
+
     def draw(self, x, y, z, rapid):
         global x_for_cut
         global y_for_cut
@@ -203,14 +244,17 @@ class Toolpath:
             self.tools[tool_number].cut(x, y, z, rapid)
          
     def cut_line(self, line):
-        length = line.Length()
-        num_segments = int(1 + length * self.coords.voxels_per_mm * 0.2)
-        step = length/num_segments
-        dv = (line.p1 - line.p0) * (1.0/num_segments)
-        for i in range (0, num_segments + 1):
-            p = line.p0 + (dv * i)
-            self.cut_point(p)
-            
+        # removes the volume swept by the tool along the line, each cylinder of the tool spaced along it by its own sweep_step
+        index = self.current_line_index
+        if index < 0: index = 0
+        tool_number = self.lines[index].tool_number
+        rapid = self.lines[index].rapid
+
+        if tool_number in self.tools:
+            x0, y0, z0 = self.coords.mm_to_voxels(line.p0.x, line.p0.y, line.p0.z)
+            x1, y1, z1 = self.coords.mm_to_voxels(line.p1.x, line.p1.y, line.p1.z)
+            self.tools[tool_number].cut_line(x0, y0, z0, x1, y1, z1, rapid)
+
     def cut_to_position(self, pos):
         if self.current_line_index >= len(self.lines):
             return
@@ -1,7 +1,10 @@
 import area
 from nc.nc import *
+import nc.nc
 import math
 import kurve_funcs
+import geometry_cache
+import worker_processes
 
 # ramping parameters
 ramp_angle = 6
@@ -11,10 +14,26 @@ helix_ramp_direction = 1 #  1 for clockwise,  -1 for anti-clockwise
 
 # some globals, to save passing variables as parameters too much
 area_for_feed_possible = None
+feed_possible_grid = None
 tool_radius_for_pocket = None
 
 ramp_h_angles_to_try = [0,90,180,270,45,135,225,315]
 
+# the separate regions of a pocket can be made in worker processes, set in the program, for example area_funcs.processes = 4
+# the regions are then cut one after another, going to the nearest one next, so the curves aren't in the same order as with processes = 1
+processes = 1
+
+# the curves of a pocket can be put in an order with shorter rapids between them, set in the program, for example
+# area_funcs.order_curves = True; curves with overlapping boxes, like the rings around one island, stay in the order they were made
+order_curves = False
+two_opt_passes = 10 # passes of 2-opt after the nearest neighbour order
+two_opt_max_run = 100 # the most curves reversed at once, 2-opt tries every run up to this long
+order_curves_report = False # print the length of the moves between curves before and after putting them in order
+
+# pockets cut at several depths can have the moves which are the same at every depth written once, as subroutines called at
+# each depth, set in the program, for example area_funcs.use_subroutines = True; creators without subroutines get every move
+use_subroutines = False
+
 def check_ramp_angle():
     if ramp_angle < 0.1:
         raise Exception('Invalid Ramp Angle: ' + str(ramp_angle) + ', must be at least 0.1 degrees!')
@@ -25,10 +44,12 @@ def GetRampStartGivenAngle(p, h_angle, ramp_depth):
     ramp_length = ramp_depth / math.tan(math.radians(float(ramp_angle)))
     r_angle = math.radians(h_angle)
     p1 = p + area.Point(ramp_length * math.cos(r_angle), ramp_length * math.sin(r_angle))
-    obround = make_obround(p, p1, tool_radius_for_pocket)
-    a = area.Area(area_for_feed_possible)
-    obround.Subtract(a)
-    if obround.num_curves() > 0:
+    if feed_possible_grid != None:
+        fits = feed_possible_grid.fits(p, p1, tool_radius_for_pocket)
+        if fits != None:
+            if fits: return p1
+            return None
+    if not inside_area_for_feed_possible(make_obround(p, p1, tool_radius_for_pocket)):
         return None
     return p1
 
@@ -61,10 +82,12 @@ def GetHelixRampCircleCentreGivenAngle(p, h_angle, circle_radius):
     if helix_diameter_factor > 1.0:
         raise Exception('Invalid helix_diameter_factor: ' + str(helix_diameter_factor) + ', must be no more than 1.0')
     centre = p + area.Point(math.cos(math.radians(helix_diameter_factor)), math.sin(math.radians(helix_diameter_factor))) * circle_radius
-    circle = make_circle(centre, circle_radius + tool_radius_for_pocket)
-    a = area.Area(area_for_feed_possible)
-    circle.Subtract(a)
-    if circle.num_curves() > 0:
+    if feed_possible_grid != None:
+        fits = feed_possible_grid.fits(centre, centre, circle_radius + tool_radius_for_pocket)
+        if fits != None:
+            if fits: return centre
+            return None
+    if not inside_area_for_feed_possible(make_circle(centre, circle_radius + tool_radius_for_pocket)):
         return None
     return centre
         
@@ -125,32 +148,37 @@ def do_helix_entry_move(p, rapid_safety_space, current_start_depth, final_depth)
             arc_cw(pos.x, pos.y, depth, circle_centre.x, circle_centre.y)
         
 def cut_curve(curve, need_rapid, p, rapid_safety_space, current_start_depth, final_depth, entry_style = 'plunge'):
-    prev_p = p
-    first = True
-
-    for vertex in curve.getVertices():
-        if need_rapid and first:
-            if entry_style == 'ramp':
-                do_ramp_entry_move(vertex.p, rapid_safety_space, current_start_depth, final_depth)
-            elif entry_style == 'helical':
-                do_helix_entry_move(vertex.p, rapid_safety_space, current_start_depth, final_depth)
-            else:
-                # rapid across
-                rapid(vertex.p.x, vertex.p.y)
-                ##rapid down
-                rapid(z = current_start_depth + rapid_safety_space)
-                #feed down
-                feed(z = final_depth)
-            first = False
+    vertices = curve.getVertices()
+    if need_rapid and len(vertices) > 0:
+        do_entry_move(vertices[0].p, rapid_safety_space, current_start_depth, final_depth, entry_style)
+        p = vertices[0].p
+        vertices = vertices[1:]
+    return cut_vertices(vertices, p)
+
+def do_entry_move(p, rapid_safety_space, current_start_depth, final_depth, entry_style):
+    if entry_style == 'ramp':
+        do_ramp_entry_move(p, rapid_safety_space, current_start_depth, final_depth)
+    elif entry_style == 'helical':
+        do_helix_entry_move(p, rapid_safety_space, current_start_depth, final_depth)
+    else:
+        # rapid across
+        rapid(p.x, p.y)
+        ##rapid down
+        rapid(z = current_start_depth + rapid_safety_space)
+        #feed down
+        feed(z = final_depth)
+
+def cut_vertices(vertices, p):
+    # feeds along the vertices, at the same height, returns the last point
+    for vertex in vertices:
+        if vertex.type == 1:
+            arc_ccw(vertex.p.x, vertex.p.y, i = vertex.c.x, j = vertex.c.y)
+        elif vertex.type == -1:
+            arc_cw(vertex.p.x, vertex.p.y, i = vertex.c.x, j = vertex.c.y)
         else:
-            if vertex.type == 1:
-                arc_ccw(vertex.p.x, vertex.p.y, i = vertex.c.x, j = vertex.c.y)
-            elif vertex.type == -1:
-                arc_cw(vertex.p.x, vertex.p.y, i = vertex.c.x, j = vertex.c.y)
-            else:
-                feed(vertex.p.x, vertex.p.y)
-        prev_p = vertex.p
-    return prev_p
+            feed(vertex.p.x, vertex.p.y)
+        p = vertex.p
+    return p
 
 def area_distance(a, old_area):
     best_dist = None
@@ -199,15 +227,145 @@ def make_circle(p, radius):
     circle.append(c)
     return circle    
 
+class BoundaryGrid:
+    # the spans of the curves of an area, with arcs split into lines, put in the square cells of a grid they pass through,
+    # so that the distance from a line to the curves only needs the spans in the cells near the line
+    def __init__(self, a, cell_size):
+        one_over_units = 1 / area.get_units()
+        self.tolerance = 0.001 * one_over_units # the most that a line of a split arc is away from the arc
+        self.margin = 0.02 * one_over_units # distances closer than this to a radius are left to the area boolean
+        self.lines = []
+        for curve in a.getCurves():
+            prev_p = None
+            for vertex in curve.getVertices():
+                if prev_p != None:
+                    if vertex.type == 0: self.lines.append((prev_p.x, prev_p.y, vertex.p.x, vertex.p.y))
+                    else: self.add_arc(prev_p, vertex)
+                prev_p = vertex.p
+
+        b = area.Box()
+        a.GetBox(b)
+        self.x0 = b.MinX()
+        self.y0 = b.MinY()
+        if cell_size <= 0.0: cell_size = max(b.MaxX() - b.MinX(), b.MaxY() - b.MinY(), one_over_units) / 64
+        self.cell_size = cell_size
+        self.cells = {} # (i, j) to a list of indexes into self.lines
+        for n in range(0, len(self.lines)):
+            x0, y0, x1, y1 = self.lines[n]
+            pieces = int(math.hypot(x1 - x0, y1 - y0) / cell_size) + 1
+            for k in range(0, pieces):
+                # each piece is no longer than a cell, so the cells its box touches are the ones it passes through
+                xa = x0 + (x1 - x0) * k / pieces
+                ya = y0 + (y1 - y0) * k / pieces
+                xb = x0 + (x1 - x0) * (k + 1) / pieces
+                yb = y0 + (y1 - y0) * (k + 1) / pieces
+                for i in range(self.cell_i(min(xa, xb)), self.cell_i(max(xa, xb)) + 1):
+                    for j in range(self.cell_j(min(ya, yb)), self.cell_j(max(ya, yb)) + 1):
+                        cell = self.cells.setdefault((i, j), [])
+                        if len(cell) == 0 or cell[-1] != n: cell.append(n)
+        self.max_i = self.cell_i(b.MaxX())
+
+    def add_arc(self, p, vertex):
+        c = vertex.c
+        r = p.dist(c)
+        a0 = math.atan2(p.y - c.y, p.x - c.x)
+        a1 = math.atan2(vertex.p.y - c.y, vertex.p.x - c.x)
+        if vertex.type == 1:
+            if a1 <= a0: a1 += 2 * math.pi
+        else:
+            if a1 >= a0: a1 -= 2 * math.pi
+        segments = 1
+        if r > self.tolerance:
+            segments = int(math.fabs(a1 - a0) / (2 * math.acos(1 - self.tolerance / r))) + 1
+        x = p.x
+        y = p.y
+        for k in range(1, segments + 1):
+            if k == segments:
+                nx = vertex.p.x
+                ny = vertex.p.y
+            else:
+                angle = a0 + (a1 - a0) * k / segments
+                nx = c.x + r * math.cos(angle)
+                ny = c.y + r * math.sin(angle)
+            self.lines.append((x, y, nx, ny))
+            x = nx
+            y = ny
+
+    def cell_i(self, x):
+        return int(math.floor((x - self.x0) / self.cell_size))
+
+    def cell_j(self, y):
+        return int(math.floor((y - self.y0) / self.cell_size))
+
+    def distance(self, p0, p1, limit):
+        # the distance from the line p0 to p1 to the nearest span, or limit if there are none nearer
+        best = limit
+        seen = set()
+        for i in range(self.cell_i(min(p0.x, p1.x) - limit), self.cell_i(max(p0.x, p1.x) + limit) + 1):
+            for j in range(self.cell_j(min(p0.y, p1.y) - limit), self.cell_j(max(p0.y, p1.y) + limit) + 1):
+                for n in self.cells.get((i, j), ()):
+                    if n in seen: continue
+                    seen.add(n)
+                    d = line_line_distance(p0.x, p0.y, p1.x, p1.y, self.lines[n])
+                    if d < best: best = d
+        return best
+
+    def inside(self, p):
+        # whether p is inside the area, counting the spans crossed by a line from p in the +x direction
+        crossings = 0
+        seen = set()
+        j = self.cell_j(p.y)
+        for i in range(self.cell_i(p.x), self.max_i + 1):
+            for n in self.cells.get((i, j), ()):
+                if n in seen: continue
+                seen.add(n)
+                x0, y0, x1, y1 = self.lines[n]
+                if (y0 > p.y) != (y1 > p.y):
+                    if x0 + (x1 - x0) * (p.y - y0) / (y1 - y0) > p.x: crossings += 1
+        return (crossings % 2) == 1
+
+    def fits(self, p0, p1, radius):
+        # whether the obround of radius around the line p0 to p1 is inside the area
+        # gives None if it touches the curves too nearly to tell without the area boolean
+        d = self.distance(p0, p1, radius + self.margin + self.tolerance)
+        if d < radius - self.margin - self.tolerance: return False
+        if d < radius + self.margin + self.tolerance: return None
+        return self.inside(p0)
+
+def point_line_distance(x, y, x0, y0, x1, y1):
+    dx = x1 - x0
+    dy = y1 - y0
+    length2 = dx * dx + dy * dy
+    t = 0.0
+    if length2 > 0.0:
+        t = ((x - x0) * dx + (y - y0) * dy) / length2
+        if t < 0.0: t = 0.0
+        elif t > 1.0: t = 1.0
+    return math.hypot(x - x0 - dx * t, y - y0 - dy * t)
+
+def line_line_distance(ax0, ay0, ax1, ay1, line):
+    bx0, by0, bx1, by1 = line
+    # zero if they cross
+    d1 = (bx1 - bx0) * (ay0 - by0) - (by1 - by0) * (ax0 - bx0)
+    d2 = (bx1 - bx0) * (ay1 - by0) - (by1 - by0) * (ax1 - bx0)
+    d3 = (ax1 - ax0) * (by0 - ay0) - (ay1 - ay0) * (bx0 - ax0)
+    d4 = (ax1 - ax0) * (by1 - ay0) - (ay1 - ay0) * (bx1 - ax0)
+    if ((d1 > 0.0) != (d2 > 0.0)) and ((d3 > 0.0) != (d4 > 0.0)): return 0.0
+    return min(point_line_distance(ax0, ay0, bx0, by0, bx1, by1), point_line_distance(ax1, ay1, bx0, by0, bx1, by1),
+               point_line_distance(bx0, by0, ax0, ay0, ax1, ay1), point_line_distance(bx1, by1, ax0, ay0, ax1, ay1))
+
+def inside_area_for_feed_possible(shape):
+    a = area.Area(area_for_feed_possible)
+    shape.Subtract(a)
+    return shape.num_curves() == 0
+
 def feed_possible(p0, p1):
     if p0 == p1:
         return True
-    obround = make_obround(p0, p1, tool_radius_for_pocket)
-    a = area.Area(area_for_feed_possible)
-    obround.Subtract(a)
-    if obround.num_curves() > 0:
-        return False
-    return True
+    if feed_possible_grid != None:
+        fits = feed_possible_grid.fits(p0, p1, tool_radius_for_pocket)
+        if fits != None: return fits
+    return inside_area_for_feed_possible(make_obround(p0, p1, tool_radius_for_pocket))
 
 def cut_curvelist1(curve_list, rapid_safety_space, current_start_depth, depth, clearance_height, keep_tool_down_if_poss, entry_style):
     p = None
@@ -229,6 +387,48 @@ def cut_curvelist1(curve_list, rapid_safety_space, current_start_depth, depth, c
 
     rapid(z = clearance_height)
 
+def cut_curvelist_in_subroutines(curve_list, rapid_safety_space, start_depth, depths, clearance_height, keep_tool_down_if_poss, entry_style):
+    # does the same moves as cut_curvelist1 at each depth, but the moves from each entry move to the next rapid are written
+    # in a subroutine the first time, then the subroutine is called at the other depths
+
+    # the runs of moves, (entry point, vertices, subroutine), each going on until the next rapid
+    runs = []
+    p = None
+    for curve in curve_list:
+        vertices = curve.getVertices()
+        if len(vertices) == 0:
+            continue
+        need_rapid = True
+        if p != None:
+            s = vertices[0].p
+            if keep_tool_down_if_poss == True:
+                # see if we can feed across
+                if feed_possible(p, s):
+                    need_rapid = False
+            elif s.x == p.x and s.y == p.y:
+                need_rapid = False
+        if need_rapid:
+            runs.append((vertices[0].p, vertices[1:]))
+        else:
+            runs[-1][1].extend(vertices)
+        p = vertices[-1].p
+    for k in range(0, len(runs)):
+        entry_point, vertices = runs[k]
+        subroutine = None
+        if len(vertices) > 0:
+            subroutine = kurve_funcs.Subroutine(lambda vertices = vertices, entry_point = entry_point: cut_vertices(vertices, entry_point))
+        runs[k] = (entry_point, vertices, subroutine)
+
+    current_start_depth = start_depth
+    for depth in depths:
+        for entry_point, vertices, subroutine in runs:
+            rapid(z = clearance_height)
+            do_entry_move(entry_point, rapid_safety_space, current_start_depth, depth, entry_style)
+            if subroutine != None:
+                subroutine.call()
+        rapid(z = clearance_height)
+        current_start_depth = depth
+
 def cut_curvelist2(curve_list, rapid_safety_space, current_start_depth, depth, clearance_height, keep_tool_down_if_poss,start_point):
     p = area.Point(0, 0)
     start_x,start_y=start_point
@@ -253,29 +453,190 @@ def cut_curvelist2(curve_list, rapid_safety_space, current_start_depth, depth, c
         first = False #change to True if you want to rapid back to start side before zigging again with unidirectional set
     rapid(z = clearance_height)
 
-def recur(arealist, a1, stepover, from_center):
-    # this makes arealist by recursively offsetting a1 inwards
-
-    if a1.num_curves() == 0:
-        return
+def current_position():
+    # (x, y) of the tool, or None if the creator doesn't know it
+    x = getattr(nc.nc.creator, 'x', None)
+    y = getattr(nc.nc.creator, 'y', None)
+    if x == None or y == None:
+        return None
+    return (x, y)
+
+def curve_box(curve):
+    # (min x, min y, max x, max y) of a curve, with the whole circle of each arc
+    minx = None
+    for v in curve.getVertices():
+        r = 0.0
+        cx = v.p.x
+        cy = v.p.y
+        if v.type != 0:
+            r = v.p.dist(v.c)
+            cx = v.c.x
+            cy = v.c.y
+        if minx == None:
+            minx = cx - r
+            miny = cy - r
+            maxx = cx + r
+            maxy = cy + r
+        else:
+            minx = min(minx, cx - r)
+            miny = min(miny, cy - r)
+            maxx = max(maxx, cx + r)
+            maxy = max(maxy, cy + r)
+    return (minx, miny, maxx, maxy)
+
+def rapid_distance(order, starts, ends, p):
+    # the length of the moves from p to the first curve and from the end of each curve to the start of the next
+    total = 0.0
+    for i in order:
+        if p != None:
+            total += math.hypot(starts[i][0] - p[0], starts[i][1] - p[1])
+        p = ends[i]
+    return total
+
+def order_curve_list(curve_list, p = None):
+    # gives curve_list in an order with shorter moves between the curves, starting from p, (x, y) or None
+    # the order is made by going to the nearest curve each time, then improved by 2-opt, reversing runs of curves
+    # curves whose boxes overlap have to stay in the order they were in, so the rings around an island aren't cut in the wrong order
+    n = len(curve_list)
+    if n < 3:
+        return curve_list
+
+    starts = []
+    ends = []
+    boxes = []
+    for curve in curve_list:
+        s = curve.FirstVertex().p
+        e = curve.LastVertex().p
+        starts.append((s.x, s.y))
+        ends.append((e.x, e.y))
+        boxes.append(curve_box(curve))
+
+    # the curves which have to be cut before each curve, and after it
+    waiting_for = [0] * n
+    followers = []
+    overlapping = []
+    for i in range(0, n):
+        followers.append([])
+        overlapping.append(set())
+    by_minx = range(0, n)
+    by_minx.sort(key = lambda i: boxes[i][0])
+    for a in range(0, n):
+        i = by_minx[a]
+        for b in range(a + 1, n):
+            j = by_minx[b]
+            if boxes[j][0] > boxes[i][2]:
+                break
+            if boxes[j][1] > boxes[i][3] or boxes[i][1] > boxes[j][3]:
+                continue
+            followers[min(i, j)].append(max(i, j))
+            waiting_for[max(i, j)] += 1
+            overlapping[i].add(j)
+            overlapping[j].add(i)
+
+    # nearest neighbour
+    order = []
+    available = []
+    for i in range(0, n):
+        if waiting_for[i] == 0:
+            available.append(i)
+    if p == None:
+        x, y = starts[0]
+    else:
+        x, y = p
+    while len(available) > 0:
+        best = None
+        for k in range(0, len(available)):
+            sx, sy = starts[available[k]]
+            d = (sx - x) * (sx - x) + (sy - y) * (sy - y)
+            if best == None or d < best_d:
+                best = k
+                best_d = d
+        i = available.pop(best)
+        order.append(i)
+        x, y = ends[i]
+        for j in followers[i]:
+            waiting_for[j] -= 1
+            if waiting_for[j] == 0:
+                available.append(j)
+
+    # 2-opt, reversing the order of a run of curves, but not the curves themselves
+    for two_opt_pass in range(0, two_opt_passes):
+        improved = False
+        for i in range(0, n - 1):
+            # the lengths of the moves from each curve in the run to the next, forwards and backwards
+            forwards = 0.0
+            backwards = 0.0
+            if i > 0:
+                prev_end = ends[order[i - 1]]
+            else:
+                prev_end = p
+            run = set([order[i]])
+            for j in range(i + 1, min(n, i + two_opt_max_run)):
+                if len(overlapping[order[j]] & run) > 0:
+                    break # every longer run would change the order of these two
+                run.add(order[j])
+                a = order[j - 1]
+                b = order[j]
+                forwards += math.hypot(starts[b][0] - ends[a][0], starts[b][1] - ends[a][1])
+                backwards += math.hypot(starts[a][0] - ends[b][0], starts[a][1] - ends[b][1])
+                old_length = forwards
+                new_length = backwards
+                first = order[i]
+                if prev_end != None:
+                    old_length += math.hypot(starts[first][0] - prev_end[0], starts[first][1] - prev_end[1])
+                    new_length += math.hypot(starts[b][0] - prev_end[0], starts[b][1] - prev_end[1])
+                if j + 1 < n:
+                    next_start = starts[order[j + 1]]
+                    old_length += math.hypot(next_start[0] - ends[b][0], next_start[1] - ends[b][1])
+                    new_length += math.hypot(next_start[0] - ends[first][0], next_start[1] - ends[first][1])
+                if new_length < old_length - 0.000001:
+                    run_order = order[i:j + 1]
+                    run_order.reverse()
+                    order[i:j + 1] = run_order
+                    improved = True
+                    break
+        if improved == False:
+            break
+
+    if order_curves_report:
+        print('order curves: %.1f of moves between curves before, %.1f after' % (rapid_distance(range(0, n), starts, ends, p), rapid_distance(order, starts, ends, p)))
+    return [curve_list[i] for i in order]
 
+def recur(arealist, a1, stepover, from_center):
+    # this makes arealist by offsetting a1 inwards again and again
+    rings = list(offset_rings(a1, stepover))
     if from_center:
-        arealist.insert(0, a1)
+        rings.reverse()
+        arealist[0:0] = rings
     else:
-        arealist.append(a1)
-
-    a_offset = area.Area(a1)
-    a_offset.Offset(stepover)
-
+        arealist += rings
+
+def offset_rings(a1, stepover):
+    # generator giving the areas made by offsetting a1 inwards again and again, in the order recur puts them in with
+    # from_center False; each is offset from the one before it, and the areas still to be offset are kept on a stack
+    stack = [a1]
+    while len(stack) > 0:
+        a1 = stack.pop()
+        if a1.num_curves() == 0:
+            continue
+        yield a1
+
+        a_offset = area.Area(a1)
+        a_offset.Offset(stepover)
+        separate_areas = split_offset_area(a_offset)
+        separate_areas.reverse()
+        stack += separate_areas
+
+def split_offset_area(a_offset):
     # split curves into new areas
+    separate_areas = []
     if area.holes_linked():
         for curve in a_offset.getCurves():
             a2 = area.Area()
             a2.append(curve)
-            recur(arealist, a2, stepover, from_center)
+            separate_areas.append(a2)
 
     else:
-        # split curves into new areas
         a_offset.Reorder()
         a2 = None
 
@@ -285,12 +646,25 @@ def recur(arealist, a1, stepover, from_center):
                     a2.append(curve)
             else:
                 if a2 != None:
-                    recur(arealist, a2, stepover, from_center)
+                    separate_areas.append(a2)
                 a2 = area.Area()
                 a2.append(curve)
 
         if a2 != None:
-            recur(arealist, a2, stepover, from_center)
+            separate_areas.append(a2)
+    return separate_areas
+
+def stream_offset_curves(cache, a_offset, stepover, reverse_curves):
+    # generator giving the curves of an offset pocket as they are made, so the first of them can be cut before the
+    # rest are made, then keeping them all in the geometry cache
+    curve_list = []
+    for a1 in offset_rings(a_offset, stepover):
+        for curve in a1.getCurves():
+            if reverse_curves == True:
+                curve.Reverse()
+            curve_list.append(curve)
+            yield curve
+    cache.save(curve_list)
 
 def get_curve_list(arealist, reverse_curves = False):
     curve_list = list()
@@ -309,108 +683,195 @@ sin_minus_angle_for_zigs = 0.0
 cos_minus_angle_for_zigs = 1.0
 one_over_units = 1.0
 
-def make_zig_curve(curve, y0, y, zig_unidirectional):
-    if rightward_for_zigs:
-        curve.Reverse()
-
-    # find a high point to start looking from
-    high_point = None
-    for vertex in curve.getVertices():
-        if high_point == None:
-            high_point = vertex.p
-        elif vertex.p.y > high_point.y:
-            # use this as the new high point
-            high_point = vertex.p
-        elif math.fabs(vertex.p.y - high_point.y) < 0.002 * one_over_units:
-            # equal high point
-            if rightward_for_zigs:
-                # use the furthest left point
-                if vertex.p.x < high_point.x:
-                    high_point = vertex.p
-            else:
-                 # use the furthest right point
-                if vertex.p.x > high_point.x:
-                    high_point = vertex.p
-
-    zig = area.Curve()
-
-    high_point_found = False
-    zig_started = False
-    zag_found = False
-
-    for i in range(0, 2): # process the curve twice because we don't know where it will start
+def zig_edges(a):
+    # the spans of each curve of a, as (x0, y0, x1, y1, type, centre), with the arcs split at their top and bottom
+    # so that every span only goes up or only goes down
+    curves = []
+    for curve in a.getCurves():
+        edges = []
         prev_p = None
         for vertex in curve.getVertices():
-            if zag_found: break
             if prev_p != None:
-                if zig_started:
-                    zig.append(unrotated_vertex(vertex))
-                    if math.fabs(vertex.p.y - y) < 0.002 * one_over_units:
-                        zag_found = True
-                        break
-                elif high_point_found:
-                    if math.fabs(vertex.p.y - y0) < 0.002 * one_over_units:
-                        if zig_started:
-                            zig.append(unrotated_vertex(vertex))
-                        elif math.fabs(prev_p.y - y0) < 0.002 * one_over_units and vertex.type == 0:
-                            zig.append(area.Vertex(0, unrotated_point(prev_p), area.Point(0, 0)))
-                            zig.append(unrotated_vertex(vertex))
-                            zig_started = True
-                elif vertex.p.x == high_point.x and vertex.p.y == high_point.y:
-                    high_point_found = True
+                if vertex.type == 0: edges.append((prev_p.x, prev_p.y, vertex.p.x, vertex.p.y, 0, None))
+                else: add_zig_arc_edges(edges, prev_p, vertex)
             prev_p = vertex.p
-
-    if zig_started:
-
-        if zig_unidirectional == True:
-            # remove the last bit of zig
-            if math.fabs(zig.LastVertex().p.y - y) < 0.002 * one_over_units:
-                vertices = zig.getVertices()
-                while len(vertices) > 0:
-                    v = vertices[len(vertices)-1]
-                    if math.fabs(v.p.y - y0) < 0.002 * one_over_units:
-                        break
-                    else:
-                        vertices.pop()
-                zig = area.Curve()
-                for v in vertices:
-                    zig.append(v)
-
-        curve_list_for_zigs.append(zig)
-
-def make_zig(a, y0, y, zig_unidirectional):
-    for curve in a.getCurves():
-        make_zig_curve(curve, y0, y, zig_unidirectional)
-
-reorder_zig_list_list = []
-
-def add_reorder_zig(curve):
-    global reorder_zig_list_list
-
-    # look in existing lists
-    s = curve.FirstVertex().p
-    for curve_list in reorder_zig_list_list:
-        last_curve = curve_list[len(curve_list) - 1]
-        e = last_curve.LastVertex().p
-        if math.fabs(s.x - e.x) < 0.002 * one_over_units and math.fabs(s.y - e.y) < 0.002 * one_over_units:
-            curve_list.append(curve)
-            return
-
-    # else add a new list
-    curve_list = []
-    curve_list.append(curve)
-    reorder_zig_list_list.append(curve_list)
+        if len(edges) > 0: curves.append(edges)
+    return curves
+
+def add_zig_arc_edges(edges, p, vertex):
+    c = vertex.c
+    r = p.dist(c)
+    a0 = math.atan2(p.y - c.y, p.x - c.x)
+    a1 = math.atan2(vertex.p.y - c.y, vertex.p.x - c.x)
+    x = p.x
+    y = p.y
+    # the top and bottom of the circle are at pi/2 + n * pi
+    if vertex.type == 1:
+        if a1 <= a0: a1 += 2 * math.pi
+        n = math.floor((a0 - math.pi / 2) / math.pi) + 1
+        while math.pi / 2 + n * math.pi < a1 - 0.000000001:
+            if math.pi / 2 + n * math.pi > a0 + 0.000000001:
+                if n % 2 == 0: ny = c.y + r
+                else: ny = c.y - r
+                edges.append((x, y, c.x, ny, 1, c))
+                x = c.x
+                y = ny
+            n += 1
+    else:
+        if a1 >= a0: a1 -= 2 * math.pi
+        n = math.ceil((a0 - math.pi / 2) / math.pi) - 1
+        while math.pi / 2 + n * math.pi > a1 + 0.000000001:
+            if math.pi / 2 + n * math.pi < a0 - 0.000000001:
+                if n % 2 == 0: ny = c.y + r
+                else: ny = c.y - r
+                edges.append((x, y, c.x, ny, -1, c))
+                x = c.x
+                y = ny
+            n -= 1
+    edges.append((x, y, vertex.p.x, vertex.p.y, vertex.type, c))
+
+def zig_edge_x(edge, y):
+    # where an edge, which only goes one way in y, crosses y
+    x0, y0, x1, y1, type, c = edge
+    if type == 0:
+        return x0 + (x1 - x0) * (y - y0) / (y1 - y0)
+    r2 = (x0 - c.x) * (x0 - c.x) + (y0 - c.y) * (y0 - c.y)
+    dx = math.sqrt(max(0.0, r2 - (y - c.y) * (y - c.y)))
+    # anti-clockwise arcs go up on the right of the centre and down on the left of it
+    if (type == 1) == (y1 > y0): return c.x + dx
+    return c.x - dx
+
+class ZigCrossing:
+    # a place where a curve crosses one of the zig lines
+    def __init__(self, level, x, curve, edge, up):
+        self.level = level
+        self.x = x
+        self.curve = curve
+        self.edge = edge
+        self.up = up # whether the curve goes up here, in the order of its spans
+        self.index = None # position in the list of crossings along the curve
+
+def zig_crossings(curves, levels):
+    # finds where the curves cross the zig lines, in one pass over their spans
+    # returns a list of the crossings along each curve and a list of the crossings on each zig line, sorted by x
+    curve_crossings = []
+    level_crossings = [[] for y in levels]
+    base = levels[0]
+    step = 1.0
+    if len(levels) > 1: step = (levels[-1] - levels[0]) / (len(levels) - 1)
+    for ci in range(0, len(curves)):
+        along = []
+        edges = curves[ci]
+        for ei in range(0, len(edges)):
+            x0, y0, x1, y1, type, c = edges[ei]
+            if y0 == y1: continue
+            k0 = max(0, int(math.floor((min(y0, y1) - base) / step)) - 1)
+            k1 = min(len(levels) - 1, int(math.ceil((max(y0, y1) - base) / step)) + 1)
+            ks = range(k0, k1 + 1)
+            if y1 < y0: ks.reverse()
+            for k in ks:
+                y = levels[k]
+                if (y0 > y) != (y1 > y):
+                    crossing = ZigCrossing(k, zig_edge_x(edges[ei], y), ci, ei, y1 > y0)
+                    crossing.index = len(along)
+                    along.append(crossing)
+                    level_crossings[k].append(crossing)
+        curve_crossings.append(along)
+    for crossings in level_crossings:
+        crossings.sort(key = lambda crossing: crossing.x)
+    return curve_crossings, level_crossings
+
+def add_zig_edges_between(zig, edges, c0, c1, forward, levels):
+    # adds the spans of a curve from crossing c0 to crossing c1 to zig, a list of (type, x, y, centre)
+    n = len(edges)
+    if forward:
+        if c1.edge != c0.edge or c1.index <= c0.index:
+            e = c0.edge
+            while True:
+                x0, y0, x1, y1, type, c = edges[e]
+                zig.append((type, x1, y1, c))
+                e = (e + 1) % n
+                if e == c1.edge: break
+        type = edges[c1.edge][4]
+    else:
+        if c1.edge != c0.edge or c1.index >= c0.index:
+            e = c0.edge
+            while True:
+                x0, y0, x1, y1, type, c = edges[e]
+                zig.append((-type, x0, y0, c))
+                e = (e - 1) % n
+                if e == c1.edge: break
+        type = -edges[c1.edge][4]
+    zig.append((type, c1.x, levels[c1.level], edges[c1.edge][5]))
+
+def make_zig(curves, curve_crossings, start, end, zig_unidirectional, levels):
+    # returns a zig along the zig line from crossing start to crossing end, then up the side of the area to the next zig line,
+    # or, where the area stops below the next zig line, over the top of it and back down to the zig line
+    k = start.level
+    along = curve_crossings[end.curve]
+    if end.up: c1 = along[(end.index + 1) % len(along)]
+    else: c1 = along[(end.index - 1) % len(along)]
+    zig = [(0, start.x, levels[k], None), (0, end.x, levels[k], None)]
+    add_zig_edges_between(zig, curves[end.curve], end, c1, end.up, levels)
+
+    vertices = []
+    for type, x, y, c in zig:
+        if type == 0: vertices.append(area.Vertex(0, unrotated_point(area.Point(x, y)), area.Point(0, 0)))
+        else: vertices.append(area.Vertex(type, unrotated_point(area.Point(x, y)), unrotated_point(c)))
+
+    if zig_unidirectional == True:
+        vertices = remove_zag(vertices, levels[k], levels[k + 1])
+
+    curve = area.Curve()
+    for v in vertices:
+        curve.append(v)
+    return curve
+
+def remove_zag(vertices, y0, y):
+    # removes the last bit of a zig, from the zig line at y0 up to the next one at y
+    # the vertices are unrotated, so they are rotated back to compare them with the zig lines
+    if math.fabs(rotated_point(vertices[len(vertices)-1].p).y - y) < 0.002 * one_over_units:
+        while len(vertices) > 0:
+            v = vertices[len(vertices)-1]
+            if math.fabs(rotated_point(v.p).y - y0) < 0.002 * one_over_units:
+                break
+            else:
+                vertices.pop()
+    return vertices
 
 def reorder_zigs():
+    # joins each zig on to the first list of zigs which ends where it starts, then puts the lists one after another
+    # the lists are found from the squares, of the size of the tolerance, that their ends are in
     global curve_list_for_zigs
-    global reorder_zig_list_list
-    reorder_zig_list_list = []
+    tolerance = 0.002 * one_over_units
+    zig_lists = []
+    list_ends = [] # the square the end of each list is in
+    ends = {} # square to the indexes of the lists which end in it
     for curve in curve_list_for_zigs:
-        add_reorder_zig(curve)
+        s = curve.FirstVertex().p
+        si = int(math.floor(s.x / tolerance))
+        sj = int(math.floor(s.y / tolerance))
+        found = None
+        for i in range(si - 1, si + 2):
+            for j in range(sj - 1, sj + 2):
+                for n in ends.get((i, j), ()):
+                    e = zig_lists[n][-1].LastVertex().p
+                    if math.fabs(s.x - e.x) < tolerance and math.fabs(s.y - e.y) < tolerance:
+                        if found == None or n < found: found = n
+        if found == None:
+            found = len(zig_lists)
+            zig_lists.append([curve])
+            list_ends.append(None)
+        else:
+            ends[list_ends[found]].remove(found)
+            zig_lists[found].append(curve)
+        e = curve.LastVertex().p
+        list_ends[found] = (int(math.floor(e.x / tolerance)), int(math.floor(e.y / tolerance)))
+        ends.setdefault(list_ends[found], []).append(found)
 
     curve_list_for_zigs = []
-    for curve_list in reorder_zig_list_list:
-        for curve in curve_list:
+    for zig_list in zig_lists:
+        for curve in zig_list:
             curve_list_for_zigs.append(curve)
 
 def rotated_point(p):
@@ -457,55 +918,54 @@ def zigzag(a, stepover, zig_unidirectional):
     b = area.Box()
     a.GetBox(b)
 
-    x0 = b.MinX() - 1.0
-    x1 = b.MaxX() + 1.0
-
     height = b.MaxY() - b.MinY()
     num_steps = int(height / stepover + 1)
     y = b.MinY() + 0.1 * one_over_units
-    null_point = area.Point(0, 0)
     rightward_for_zigs = True
     curve_list_for_zigs = []
 
+    # the zig lines, and where the area crosses them
+    levels = [y]
     for i in range(0, num_steps):
-        y0 = y
         y = y + stepover
-        p0 = area.Point(x0, y0)
-        p1 = area.Point(x0, y)
-        p2 = area.Point(x1, y)
-        p3 = area.Point(x1, y0)
-        c = area.Curve()
-        c.append(area.Vertex(0, p0, null_point, 0))
-        c.append(area.Vertex(0, p1, null_point, 0))
-        c.append(area.Vertex(0, p2, null_point, 1))
-        c.append(area.Vertex(0, p3, null_point, 0))
-        c.append(area.Vertex(0, p0, null_point, 1))
-        a2 = area.Area()
-        a2.append(c)
-        a2.Intersect(a)
-        make_zig(a2, y0, y, zig_unidirectional)
+        levels.append(y)
+    curves = zig_edges(a)
+    curve_crossings, level_crossings = zig_crossings(curves, levels)
+
+    for i in range(0, num_steps):
+        # the crossings on a zig line, in order of x, go into the area and out of it in turn, so each pair is a piece of
+        # the zig line inside the area, whose zig is followed along the crossings; the pieces are cut in the direction
+        # the zigs go along the line
+        crossings = level_crossings[i]
+        zigs = []
+        for n in range(0, len(crossings) - 1, 2):
+            if rightward_for_zigs: zigs.append(make_zig(curves, curve_crossings, crossings[n + 1], crossings[n], zig_unidirectional, levels))
+            else: zigs.append(make_zig(curves, curve_crossings, crossings[n], crossings[n + 1], zig_unidirectional, levels))
+        if rightward_for_zigs: zigs.reverse()
+        curve_list_for_zigs += zigs
         if zig_unidirectional == False:
             rightward_for_zigs = (rightward_for_zigs == False)
 
     reorder_zigs()
 
-def pocket(a,tool_radius, extra_offset, stepover, depthparams, from_center, keep_tool_down_if_poss, use_zig_zag, zig_angle, zig_unidirectional = False,
-           start_point=None, cut_mode = 'conventional', entry_style = 'plunge'):
-    global tool_radius_for_pocket
-    global area_for_feed_possible
-    
-    #if len(a.getCurves()) > 1:
-    #    for crv in a.getCurves():
-    #        ar = area.Area()
-    #        ar.append(crv)
-    #        pocket(ar, tool_radius, extra_offset, rapid_safety_space, start_depth, final_depth, stepover, stepdown, clearance_height, from_center, keep_tool_down_if_poss, use_zig_zag, zig_angle, zig_unidirectional)
-    #    return
-
-    tool_radius_for_pocket = tool_radius
+def pocket_curve_list(a, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode, stream = False):
+    # the curves of the toolpath for a pocket, at any depth, from the geometry cache if they have been made before
+    # with stream True, offset curves which go from the outside in may be given by a generator, to be used only once
+    cache = geometry_cache.GeometryCache('pocket', a, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode)
+    if cache.hit: return cache.curves
+    if stream and area.holes_linked() and use_zig_zag == False and from_center == False:
+        a_offset = area.Area(a)
+        a_offset.Offset(tool_radius + extra_offset)
+        return stream_offset_curves(cache, a_offset, stepover, cut_mode == 'climb')
+    curve_list = make_pocket_curve_list(a, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode)
+    cache.save(curve_list)
+    return curve_list
 
-    if keep_tool_down_if_poss:
-        area_for_feed_possible = area.Area(a)
-        area_for_feed_possible.Offset(extra_offset - 0.01)
+def make_pocket_curve_list(a, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode):
+    global sin_angle_for_zigs
+    global cos_angle_for_zigs
+    global sin_minus_angle_for_zigs
+    global cos_minus_angle_for_zigs
 
     use_internal_function = (area.holes_linked() == False) # use internal function, if area module is the Clipper library
 
@@ -513,10 +973,6 @@ def pocket(a,tool_radius, extra_offset, stepover, depthparams, from_center, keep
         curve_list = a.MakePocketToolpath(tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle)
 
     else:
-        global sin_angle_for_zigs
-        global cos_angle_for_zigs
-        global sin_minus_angle_for_zigs
-        global cos_minus_angle_for_zigs
         radians_angle = zig_angle * math.pi / 180
         sin_angle_for_zigs = math.sin(-radians_angle)
         cos_angle_for_zigs = math.cos(-radians_angle)
@@ -543,16 +999,115 @@ def pocket(a,tool_radius, extra_offset, stepover, depthparams, from_center, keep
                         arealist.insert(0, a_offset)
                     else:
                         arealist.append(a_offset)
-                    current_offset = current_offset + stepover
-                    a_offset = area.Area(a)
-                    a_offset.Offset(current_offset)
+                    a_offset = area.Area(a_offset)
+                    a_offset.Offset(stepover)
             curve_list = get_curve_list(arealist, cut_mode == 'climb')
-            
-    depths = depthparams.get_depths()
+
+    return curve_list
+
+def area_regions(a):
+    # splits an area into separate areas, each an outside curve and the holes in it
+    # if there is a hole before the first outside curve, it belongs to none of them, so the area is given as one region
+    regions = []
+    if area.holes_linked():
+        for curve in a.getCurves():
+            region = area.Area()
+            region.append(curve)
+            regions.append(region)
+    else:
+        a = area.Area(a)
+        a.Reorder()
+        region = None
+        for curve in a.getCurves():
+            if curve.IsClockwise():
+                if region == None: return [a]
+                region.append(curve)
+            else:
+                region = area.Area()
+                region.append(curve)
+                regions.append(region)
+    return regions
+
+def pocket_region(job):
+    # the curves of the toolpath for one region of a pocket, as lists of vertices, for map_jobs
+    curves, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode = job
+    a = area.Area()
+    for curve in curves:
+        a.append(geometry_cache.curve_from_list(curve))
+    curve_list = pocket_curve_list(a, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode)
+    return [geometry_cache.curve_to_list(curve) for curve in curve_list]
+
+def order_regions(region_curves, start_point):
+    # orders the curve lists of the regions, starting with the region nearest start_point, or the first region,
+    # then going to the region which starts nearest to where the one before it ends
+    remaining = []
+    for curves in region_curves:
+        if len(curves) > 0: remaining.append(curves)
+    ordered = []
+    if start_point != None: x, y = start_point
+    elif len(remaining) > 0: x, y = remaining[0][0][0][1:3]
+    while len(remaining) > 0:
+        best = None
+        for i in range(0, len(remaining)):
+            sx, sy = remaining[i][0][0][1:3]
+            d = (sx - x) * (sx - x) + (sy - y) * (sy - y)
+            if best == None or d < best_d:
+                best = i
+                best_d = d
+        curves = remaining.pop(best)
+        ordered.append(curves)
+        x, y = curves[-1][-1][1:3]
+    return ordered
+
+def pocket(a,tool_radius, extra_offset, stepover, depthparams, from_center, keep_tool_down_if_poss, use_zig_zag, zig_angle, zig_unidirectional = False,
+           start_point=None, cut_mode = 'conventional', entry_style = 'plunge'):
+    global tool_radius_for_pocket
+    global area_for_feed_possible
+    global feed_possible_grid
     
+    #if len(a.getCurves()) > 1:
+    #    for crv in a.getCurves():
+    #        ar = area.Area()
+    #        ar.append(crv)
+    #        pocket(ar, tool_radius, extra_offset, rapid_safety_space, start_depth, final_depth, stepover, stepdown, clearance_height, from_center, keep_tool_down_if_poss, use_zig_zag, zig_angle, zig_unidirectional)
+    #    return
+
+    tool_radius_for_pocket = tool_radius
+
+    if keep_tool_down_if_poss:
+        area_for_feed_possible = area.Area(a)
+        area_for_feed_possible.Offset(extra_offset - 0.01)
+        feed_possible_grid = BoundaryGrid(area_for_feed_possible, tool_radius)
+    else:
+        feed_possible_grid = None
+
+    depths = depthparams.get_depths()
+
+    curve_list = None
+    if processes > 1 and tool_radius + extra_offset >= 0:
+        # the regions are only pocketed separately when they are offset inwards, offset outwards they could join
+        regions = area_regions(a)
+        if len(regions) > 1:
+            jobs = []
+            for region in regions:
+                jobs.append(([geometry_cache.curve_to_list(curve) for curve in region.getCurves()], tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode))
+            curve_list = []
+            for curves in order_regions(worker_processes.map_jobs(pocket_region, jobs, processes), start_point):
+                for curve in curves: curve_list.append(geometry_cache.curve_from_list(curve))
+
+    if curve_list == None:
+        # cut at one depth, the curves can be cut as they are made
+        curve_list = pocket_curve_list(a, tool_radius, extra_offset, stepover, from_center, use_zig_zag, zig_angle, zig_unidirectional, cut_mode, len(depths) == 1 and start_point == None)
+
+    if order_curves and start_point == None:
+        curve_list = order_curve_list(list(curve_list), current_position())
+
     current_start_depth = depthparams.start_depth
 
-    if start_point==None:
+    if start_point == None and use_subroutines and len(depths) > 1 and kurve_funcs.creator_has_subroutines():
+        cut_curvelist_in_subroutines(curve_list, depthparams.rapid_safety_space, current_start_depth, depths, depthparams.clearance_height, keep_tool_down_if_poss, entry_style)
+
+    elif start_point==None:
         for depth in depths:
             cut_curvelist1(curve_list, depthparams.rapid_safety_space, current_start_depth, depth, depthparams.clearance_height, keep_tool_down_if_poss, entry_style)
             current_start_depth = depth
@@ -1,12 +1,27 @@
 import sys
 from nc.hxml_writer import HxmlWriter
+from nc.hbin_writer import HbinWriter
+from nc import parallel_backplot
 
-if len(sys.argv)>2:
+# backplot.py reader nc_file [xml|binary] [processes]
+# xml writes backplot.xml in the temp directory, binary writes the smaller backplot.hbp
+# with processes more than 1, xml is written by parsing parts of the file in that many processes
+writers = {'xml':HxmlWriter, 'binary':HbinWriter}
+
+if __name__ == '__main__' and len(sys.argv)>2:
     reader = sys.argv[1]
     nc_file = sys.argv[2]
+    output_format = 'xml'
+    if len(sys.argv)>3: output_format = sys.argv[3]
+    processes = 1
+    if len(sys.argv)>4: processes = int(sys.argv[4])
     
     machine_module = __import__('nc.' + reader, fromlist = ['dummy'])
-        
-    parser = machine_module.Parser(HxmlWriter())
 
-    parser.Parse(nc_file)
+    if processes > 1 and output_format == 'xml' and parallel_backplot.can_parse_in_parts(machine_module.Parser):
+        parallel_backplot.backplot(reader, nc_file, processes)
+    else:
+        parser = machine_module.Parser(writers[output_format]())
+
+        parser.Parse(nc_file)
+        del parser # the writers finish their files when deleted
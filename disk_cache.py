@@ -0,0 +1,131 @@
+import tempfile
+import os
+import stat
+import hashlib
+import marshal
+
+# results which take a long time to calculate, like offset curves and drop cutter points, are kept in files,
+# so posting the program again, after changing only feed rates or the post processor, doesn't calculate them again
+# the files are in a directory only the user can read or write, and are read with marshal, which only makes numbers,
+# strings, lists, tuples and dictionaries, so a file put there by someone else can't run code when it is loaded
+
+def private_dir(path):
+    # makes the directory, if it isn't there, so only the user can use it
+    # returns path, or None if it is a link, or is someone else's, or others can use it
+    try:
+        os.mkdir(path, 0700)
+    except OSError:
+        pass # it is there already, or it can't be made, which the checks below find
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode): return None
+    if hasattr(os, 'getuid'):
+        if st.st_uid != os.getuid() or st.st_mode & 0077: return None
+    return path
+
+def user_cache_dir():
+    # the directory the caches are kept in, one for each user, or None if it isn't safe to use
+    if hasattr(os, 'getuid'): name = 'heekscnc_cache_%d' % os.getuid()
+    else: name = 'heekscnc_cache' # on Windows the temp directory is the user's own
+    return private_dir(os.path.join(tempfile.gettempdir(), name))
+
+class DiskCache:
+    # a directory of results, each in a file named from an md5 of everything it depends on
+    def __init__(self, name, version, size_limit):
+        self.name = name # of the directory, in the user's cache directory
+        self.version = version # change this when the way the results are calculated changes
+        self.size_limit = size_limit # bytes of files kept, the least recently used are removed past this; 0 keeps nothing
+        self.hits = 0
+        self.misses = 0
+
+    def directory(self):
+        base = user_cache_dir()
+        if base == None: return None
+        return private_dir(os.path.join(base, self.name))
+
+    def file_path(self, key):
+        # the file for a tuple of values, or None if nothing is to be kept
+        if self.size_limit <= 0: return None
+        directory = self.directory()
+        if directory == None: return None
+        return os.path.join(directory, hashlib.md5(repr((self.version,) + key)).hexdigest() + '.dat')
+
+    def load(self, path):
+        # the list kept in the file, or None
+        result = None
+        if path != None:
+            try:
+                f = open(path, 'rb')
+                try:
+                    result = marshal.load(f)
+                finally:
+                    f.close()
+                os.utime(path, None) # most recently used
+            except Exception:
+                result = None # not there or unreadable, so calculate it again
+            if not isinstance(result, list): result = None
+        if result == None: self.misses += 1
+        else: self.hits += 1
+        return result
+
+    def save(self, path, result):
+        # result is a list, made of numbers, strings, lists, tuples and dictionaries
+        if path == None: return
+        temp_path = path + '.%d.tmp' % os.getpid()
+        try:
+            f = open(temp_path, 'wb')
+            try:
+                marshal.dump(result, f, 2)
+            finally:
+                f.close()
+            if os.path.exists(path): os.remove(path) # rename won't replace a file on Windows
+            os.rename(temp_path, path)
+        except Exception:
+            # the disk is full, or the directory was removed, or the result can't be marshalled, so it isn't kept
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self.remove_least_recently_used()
+
+    def files(self):
+        # a list of (time last used, bytes, path) for each file kept
+        directory = self.directory()
+        if directory == None: return []
+        files = []
+        for name in os.listdir(directory):
+            if not name.endswith('.dat'): continue
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue # removed by another process
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def remove_least_recently_used(self):
+        files = self.files()
+        total = 0
+        for used, size, path in files: total += size
+        if total <= self.size_limit: return
+        files.sort()
+        for used, size, path in files[:-1]: # the newest is kept, even if it is bigger than the limit
+            if total <= self.size_limit: break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for used, size, path in self.files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def report(self, description):
+        return '%s: %d operations reused, %d calculated' % (description, self.hits, self.misses)
@@ -0,0 +1,51 @@
+import area
+import disk_cache
+
+# toolpath curves made by area_funcs.pocket and kurve_funcs.profile are kept in a disk_cache, so posting the program again,
+# after changing only feed rates or the post processor, doesn't offset the same curves again
+# the files are named from everything the curves depend on, including the vertices of the area or curve offset
+# set the size limit in the program, for example geometry_cache.cache.size_limit = 0 to keep nothing
+cache = disk_cache.DiskCache('geometry', 2, 64 * 1024 * 1024)
+
+def curve_to_list(curve):
+    # a list of (type, x, y, cx, cy) for each vertex, which can be kept in a file
+    vertices = []
+    for v in curve.getVertices():
+        vertices.append((v.type, v.p.x, v.p.y, v.c.x, v.c.y))
+    return vertices
+
+def curve_from_list(vertices):
+    curve = area.Curve()
+    for type, x, y, cx, cy in vertices:
+        curve.append(area.Vertex(type, area.Point(x, y), area.Point(cx, cy)))
+    return curve
+
+def key_value(value):
+    # curves and areas are keyed by their vertices
+    if isinstance(value, area.Curve): return ('curve', tuple(curve_to_list(value)))
+    if isinstance(value, area.Area): return ('area', tuple([tuple(curve_to_list(curve)) for curve in value.getCurves()]))
+    return value
+
+class GeometryCache:
+    # the curves for one operation, in a file named from everything they depend on
+    def __init__(self, *key):
+        key = (area.get_units(), area.holes_linked()) + tuple([key_value(value) for value in key])
+        self.file_path = cache.file_path(key)
+        self.curves = None
+        curve_lists = cache.load(self.file_path)
+        if curve_lists != None:
+            try:
+                self.curves = [curve_from_list(vertices) for vertices in curve_lists]
+            except Exception:
+                self.curves = None # not a list of curves, so make them again
+        self.hit = (self.curves != None)
+
+    def save(self, curves):
+        if self.hit: return
+        cache.save(self.file_path, [curve_to_list(curve) for curve in curves])
+
+def ClearGeometryCache():
+    cache.clear()
+
+def GeometryCacheReport():
+    return cache.report('geometry cache')
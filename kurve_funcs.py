@@ -1,6 +1,10 @@
 import math
+import bisect
 from nc.nc import *
+import nc.nc
 import area
+import geometry_cache
+import worker_processes
 
 def set_good_start_point( curve, rev ):
     if curve.IsClosed():
@@ -41,54 +45,55 @@ class Tag:
         self.angle = angle # the angle of the ramp in radians. Between 0 and Pi/2; 0 is horizontal, Pi/2 is vertical
         self.height = height # the height of the tag, always measured above "final_depth"
         self.ramp_width = self.height / math.tan(self.angle)
+
+    def __getstate__(self):
+        # area.Point can't be pickled, so tags going to or from worker processes keep x and y instead
+        state = self.__dict__.copy()
+        state['p'] = (self.p.x, self.p.y)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.p = area.Point(state['p'][0], state['p'][1])
         
     def split_curve(self, curve, radius, start_depth, depth, final_depth):
+        self.split_curve_at(curve, curve.PointToPerim(self.p), radius, depth, final_depth)
+
+    def split_curve_at(self, curve, d, radius, depth, final_depth):
+        # split_curve, with the tag at d along the kurve
+        for d0 in self.break_perims(d, radius, depth, final_depth, curve.Perim(), curve.IsClosed()):
+            p = curve.PerimToPoint(d0)
+            curve.Break(p)
+
+    def break_perims(self, d, radius, depth, final_depth, perim, closed):
+        # where the kurve needs splitting for this tag, at the ends of the flat top and where the ramps reach depth
         tag_top_depth = final_depth + self.height
         
         if depth > tag_top_depth - 0.0000001:
-            return # kurve is above this tag, so doesn't need splitting
+            return [] # kurve is above this tag, so doesn't need splitting
         
         height_above_depth = tag_top_depth - depth
         ramp_width_at_depth = height_above_depth / math.tan(self.angle)
-        cut_depth = start_depth - depth
         half_flat_top = radius + self.width / 2
 
-        d = curve.PointToPerim(self.p)
-        d0 = d - half_flat_top
-        perim = curve.Perim()
-        if curve.IsClosed():
-            while d0 < 0: d0 += perim
-            while d0 > perim: d0 -= perim
-        p = curve.PerimToPoint(d0)
-        curve.Break(p)
-        d1 = d + half_flat_top
-        if curve.IsClosed():
-            while d1 < 0: d1 += perim
-            while d1 > perim: d1 -= perim
-        p = curve.PerimToPoint(d1)
-        curve.Break(p)
-        
-        d0 = d - half_flat_top - ramp_width_at_depth
-        if curve.IsClosed():
-            while d0 < 0: d0 += perim
-            while d0 > perim: d0 -= perim
-        p = curve.PerimToPoint(d0)
-        curve.Break(p)
-        d1 = d + half_flat_top + ramp_width_at_depth
-        if curve.IsClosed():
-            while d1 < 0: d1 += perim
-            while d1 > perim: d1 -= perim
-        p = curve.PerimToPoint(d1)
-        curve.Break(p)
+        perims = []
+        for d0 in [d - half_flat_top, d + half_flat_top, d - half_flat_top - ramp_width_at_depth, d + half_flat_top + ramp_width_at_depth]:
+            if closed:
+                while d0 < 0: d0 += perim
+                while d0 > perim: d0 -= perim
+            perims.append(d0)
+        return perims
         
     def get_z_at_perim(self, current_perim, curve, radius, start_depth, depth, final_depth):
         # return the z for this position on the kurve ( specified by current_perim ), for this tag
         # if the position is not within the tag, then depth is returned
-        cut_depth = start_depth - depth
+        return self.get_z_at_d(current_perim, curve.PointToPerim(self.p), radius, depth, final_depth)
+
+    def get_z_at_d(self, current_perim, d, radius, depth, final_depth):
+        # get_z_at_perim, with the tag at d along the kurve
         half_flat_top = radius + self.width / 2
 
         z = depth
-        d = curve.PointToPerim(self.p)
         dist_from_d = math.fabs(current_perim - d)
         if dist_from_d < half_flat_top:
             # on flat top of tag
@@ -142,6 +147,146 @@ def get_tag_z_for_span(current_perim, curve, radius, start_depth, depth, final_d
         
     return max_z
 
+class TagIndex:
+    # the tags near a kurve, each found on it once, in order along it, for the heights and splits at every depth
+    # for a closed kurve each tag is also put a perimeter before and after itself, so tags work across the start of the kurve
+    def __init__(self, tags, curve, radius):
+        self.radius = radius
+        self.tags = [] # the tags within radius of the kurve, the others are left out
+        self.tag_perims = [] # where each of self.tags is along the kurve
+        entries = []
+        perim = curve.Perim()
+        self.perim = perim
+        self.closed = curve.IsClosed()
+        self.max_reach = 0.0
+        for tag in tags:
+            d = curve.PointToPerim(tag.p)
+            if (tag.p - curve.PerimToPoint(d)).length() > radius + 0.001:
+                continue
+            self.tags.append(tag)
+            self.tag_perims.append(d)
+            self.max_reach = max(self.max_reach, radius + tag.width / 2 + tag.ramp_width)
+            entries.append((d, tag))
+            if curve.IsClosed():
+                entries.append((d - perim, tag))
+                entries.append((d + perim, tag))
+        entries.sort(key = lambda entry: entry[0])
+        self.perims = [entry[0] for entry in entries]
+        self.entry_tags = [entry[1] for entry in entries]
+
+    def split_curve(self, curve, depth, final_depth):
+        for i in range(0, len(self.tags)):
+            self.tags[i].split_curve_at(curve, self.tag_perims[i], self.radius, depth, final_depth)
+
+    def break_perims(self, depth, final_depth):
+        # where split_curve would break the kurve at this depth, in order along it
+        perims = []
+        for i in range(0, len(self.tags)):
+            perims += self.tags[i].break_perims(self.tag_perims[i], self.radius, depth, final_depth, self.perim, self.closed)
+        perims.sort()
+        return perims
+
+    def get_z(self, current_perim, depth, final_depth):
+        # the same as get_tag_z_for_span, but only the tags near current_perim are tried
+        if len(self.tags) == 0:
+            return None
+        max_z = depth
+        i0 = bisect.bisect_right(self.perims, current_perim - self.max_reach)
+        i1 = bisect.bisect_left(self.perims, current_perim + self.max_reach)
+        for i in range(i0, i1):
+            z = self.entry_tags[i].get_z_at_d(current_perim, self.perims[i], self.radius, depth, final_depth)
+            if z > max_z:
+                max_z = z
+        return max_z
+
+def kurve_moves(curve):
+    # (type, x, y, cx, cy, perim) for each span of the kurve, perim being how far along the kurve the span ends
+    moves = []
+    perim = 0.0
+    for span in curve.GetSpans():
+        perim += span.Length()
+        moves.append((span.v.type, span.v.p.x, span.v.p.y, span.v.c.x, span.v.c.y, perim))
+    return moves
+
+def move_point(sx, sy, move, span_start, d):
+    # the point d along the kurve, on the span of move, which starts at sx, sy, span_start along the kurve
+    type, x, y, cx, cy, perim = move
+    if type == 0:
+        f = (d - span_start) / (perim - span_start)
+        return sx + (x - sx) * f, sy + (y - sy) * f
+    r = math.hypot(sx - cx, sy - cy)
+    a = (d - span_start) / r
+    if type == -1: a = -a
+    c = math.cos(a)
+    s = math.sin(a)
+    return cx + (sx - cx) * c - (sy - cy) * s, cy + (sx - cx) * s + (sy - cy) * c
+
+def split_moves(moves, start, break_perims):
+    # the moves with the spans broken at each of break_perims, in order along the kurve, the same as curve.Break would
+    # start is the x, y the kurve starts at; arcs are broken into arcs about the same centre; breaks at the ends of spans are left out
+    if len(break_perims) == 0:
+        return moves
+    new_moves = []
+    b = 0
+    span_start = 0.0
+    sx, sy = start
+    for move in moves:
+        type, x, y, cx, cy, perim = move
+        while b < len(break_perims) and break_perims[b] < perim - 0.000001:
+            d = break_perims[b]
+            b += 1
+            if d <= span_start + 0.000001:
+                continue
+            sx, sy = move_point(sx, sy, move, span_start, d)
+            new_moves.append((type, sx, sy, cx, cy, d))
+            span_start = d
+        new_moves.append(move)
+        span_start = perim
+        sx, sy = x, y
+    return new_moves
+
+def cut_moves(moves, tag_index, depth, final_depth):
+    # feeds along the moves, at the heights of the tags
+    for type, x, y, cx, cy, perim in moves:
+        ez = tag_index.get_z(perim, depth, final_depth)
+        if type == 0:#line
+            feed(x, y, ez)
+        else:
+            if type == 1:# anti-clockwise arc
+                arc_ccw(x, y, ez, i = cx, j = cy)
+            else:
+                arc_cw(x, y, ez, i = cx, j = cy)
+
+def creator_has_subroutines():
+    # whether the creator writes subroutines itself; redirectors change the moves they are given, so they don't count
+    # the subroutine numbers follow on from the program number, which some posts, like mach3, don't keep
+    c = nc.nc.creator
+    if hasattr(c, 'original') or not hasattr(c, 'current_sub_id') or not hasattr(c, 'disable_output'):
+        return False
+    if c.current_sub_id == None and getattr(c, 'program_id', None) == None:
+        return False
+    return c.PROGRAM() != None and c.SUBPROG_CALL() != None
+
+class Subroutine:
+    # moves which are the same each time they are done, written as a subroutine the first time, then called
+    def __init__(self, cut):
+        self.cut = cut # function doing the moves
+        self.id = None
+
+    def call(self):
+        if self.id == None:
+            sub_begin(None)
+            self.cut()
+            sub_end()
+            self.id = nc.nc.creator.current_sub_id
+            sub_call(self.id)
+        else:
+            sub_call(self.id)
+            # the creator keeps the position and the modes the subroutine ends with
+            nc.nc.creator.disable_output()
+            self.cut()
+            nc.nc.creator.enable_output()
+
 def add_roll_on(curve, roll_on_curve, direction, roll_radius, offset_extra, roll_on):
     if direction == "on": roll_on = None
     if curve.getNumVertices() <= 1: return
@@ -240,11 +385,40 @@ def add_CRC_end_line(curve,roll_on_curve,roll_off_curve,radius,direction,crc_end
 
 using_area_for_offset = False
 
-# profile command,
-# direction should be 'left' or 'right' or 'on'
-def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radius = 2.0, roll_on = None, roll_off = None, depthparams = None, extend_at_start = 0.0, extend_at_end = 0.0, lead_in_line_len=0.0,lead_out_line_len= 0.0):
-    global tags
-
+# profiles cut at several depths, without tags or cutter radius compensation, can have the moves along the kurve written
+# once, as a subroutine called at each depth, set in the program, for example kurve_funcs.use_subroutines = True
+use_subroutines = False
+
+# profile_batch makes the profile paths in this many worker processes, set in the program, for example kurve_funcs.processes = 4
+processes = 1
+
+class ProfilePath:
+    # what profile cuts at each depth along one kurve, made once from the offset kurve, its roll on and roll off and its tags
+    # it keeps numbers and tags, not area objects, so it can be made in a worker process
+    def __init__(self, offset_curve, direction, radius, tag_index, roll_on_curve, roll_off_curve, crc_start_point, crc_end_point):
+        self.direction = direction
+        self.radius = radius
+        self.tag_index = tag_index
+        self.moves = kurve_moves(offset_curve)
+        p = offset_curve.FirstVertex().p
+        self.kurve_start = (p.x, p.y)
+        self.roll_on = geometry_cache.curve_to_list(roll_on_curve)
+        self.roll_off = geometry_cache.curve_to_list(roll_off_curve)
+        p = roll_on_curve.FirstVertex().p
+        self.start = (p.x, p.y)
+        p = offset_curve.LastVertex().p
+        if roll_off_curve.getNumVertices() > 0:
+            p = roll_off_curve.LastVertex().p
+        self.end = (p.x, p.y)
+        self.crc_start = None
+        self.crc_end = None
+        if crc_start_point != None:
+            self.crc_start = (crc_start_point.x, crc_start_point.y)
+            self.crc_end = (crc_end_point.x, crc_end_point.y)
+
+# profile paths for a kurve, usually one, but more if the kurve had to be offset as an area
+# tags is the list of tags to use, which are left out of the paths' tag indexes if they aren't near the kurve
+def profile_paths(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radius = 2.0, roll_on = None, roll_off = None, extend_at_start = 0.0, extend_at_end = 0.0, lead_in_line_len=0.0,lead_out_line_len= 0.0, tags = []):
     offset_curve = area.Curve(curve)
     if direction == "on":
         use_CRC() == False 
@@ -259,7 +433,14 @@ def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radi
             if math.fabs(offset) > 0.00005:
                 if direction == "right":
                     offset = -offset
-                offset_success = offset_curve.Offset(offset)
+                # the offset curve from the geometry cache, if this curve has been offset before
+                cache = geometry_cache.GeometryCache('profile', curve, offset)
+                if cache.hit:
+                    offset_curve = cache.curves[0]
+                    offset_success = True
+                else:
+                    offset_success = offset_curve.Offset(offset)
+                    if offset_success: cache.save([offset_curve])
                 if offset_success == False:
                     global using_area_for_offset
                     if curve.IsClosed() and (using_area_for_offset == False):
@@ -268,14 +449,16 @@ def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radi
                         a = area.Area()
                         a.append(curve)
                         a.Offset(-offset)
+                        paths = []
                         for curve in a.getCurves():
                             curve_cw = curve.IsClockwise()
                             if cw != curve_cw:
                                 curve.Reverse()
                             set_good_start_point(curve, False)
-                            profile(curve, direction, 0.0, 0.0, roll_radius, roll_on, roll_off, depthparams, extend_at_start, extend_at_end, lead_in_line_len, lead_out_line_len)
+                            paths += profile_paths(curve, direction, 0.0, 0.0, roll_radius, roll_on, roll_off, extend_at_start, extend_at_end, lead_in_line_len, lead_out_line_len, tags)
+                            tags = paths[-1].tag_index.tags
                         using_area_for_offset = False
-                        return                    
+                        return paths
                     else:
                         raise Exception("couldn't offset curve %s" % offset_curve)
             
@@ -295,25 +478,92 @@ def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radi
         offset_curve.append(new_end)
                 
     # remove tags further than radius from the offset kurve
-    new_tags = []
-    for tag in tags:
-        if tag.dist(offset_curve) <= radius + 0.001:
-            new_tags.append(tag)
-    tags = new_tags
+    tag_index = TagIndex(tags, offset_curve, radius)
 
     if offset_curve.getNumVertices() <= 1:
         raise Exception("sketch has no spans!")
 
+    # the roll on and roll off kurves and the moves along the kurve are made once, only the heights change with depth
+    roll_on_curve = area.Curve()
+    add_roll_on(offset_curve, roll_on_curve, direction, roll_radius, offset_extra, roll_on)
+    roll_off_curve = area.Curve()
+    add_roll_off(offset_curve, roll_off_curve, direction, roll_radius, offset_extra, roll_off)
+    crc_start_point = None
+    crc_end_point = None
+    if use_CRC():
+        crc_start_point = area.Point()
+        add_CRC_start_line(offset_curve,roll_on_curve,roll_off_curve,radius,direction,crc_start_point,lead_in_line_len)
+        crc_end_point = area.Point()
+        add_CRC_end_line(offset_curve,roll_on_curve,roll_off_curve,radius,direction,crc_end_point,lead_out_line_len)
+
+    return [ProfilePath(offset_curve, direction, radius, tag_index, roll_on_curve, roll_off_curve, crc_start_point, crc_end_point)]
+
+# profile command,
+# direction should be 'left' or 'right' or 'on'
+def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radius = 2.0, roll_on = None, roll_off = None, depthparams = None, extend_at_start = 0.0, extend_at_end = 0.0, lead_in_line_len=0.0,lead_out_line_len= 0.0):
+    global tags
+
+    paths = profile_paths(curve, direction, radius, offset_extra, roll_radius, roll_on, roll_off, extend_at_start, extend_at_end, lead_in_line_len, lead_out_line_len, tags)
+    if len(paths) > 0:
+        tags = paths[-1].tag_index.tags
+    for path in paths:
+        cut_profile_path(path, depthparams)
+
+def profile_job(job):
+    # the profile paths for one job of profile_batch, made from the kurve's vertices
+    vertices, args, job_tags = job
+    args = dict(args)
+    for name in ['roll_on', 'roll_off']:
+        if isinstance(args.get(name), tuple):
+            args[name] = area.Point(args[name][0], args[name][1])
+    return profile_paths(geometry_cache.curve_from_list(vertices), tags = job_tags, **args)
+
+def profile_batch(jobs):
+    # profiles for a list of (curve, arguments) jobs, arguments being a dictionary of the keyword arguments of profile,
+    # cut in the order of the list; the kurves are offset and their roll ons, roll offs and tags are worked out first,
+    # in worker processes when processes > 1
+    # a job uses the tags given as 'tags' in its arguments, or else the tags added with add_tag, which are left as they are
+    batch = []
+    job_depthparams = []
+    for curve, args in jobs:
+        args = dict(args)
+        job_depthparams.append(args.pop('depthparams', None))
+        job_tags = args.pop('tags', tags)
+        for name in ['roll_on', 'roll_off']:
+            if isinstance(args.get(name), area.Point):
+                args[name] = (args[name].x, args[name].y)
+        batch.append((geometry_cache.curve_to_list(curve), args, job_tags))
+
+    job_paths = worker_processes.map_jobs(profile_job, batch, processes)
+
+    for i in range(0, len(jobs)):
+        for path in job_paths[i]:
+            cut_profile_path(path, job_depthparams[i])
+
+def cut_profile_path(path, depthparams):
+    # cuts one profile path at each depth
+    direction = path.direction
+    radius = path.radius
+    tag_index = path.tag_index
+    moves = path.moves
+    roll_on_curve = geometry_cache.curve_from_list(path.roll_on)
+    roll_off_curve = geometry_cache.curve_from_list(path.roll_off)
+    s = area.Point(path.start[0], path.start[1])
+    kurve_end = area.Point(path.end[0], path.end[1])
+
     # do multiple depths
     depths = depthparams.get_depths()
 
     current_start_depth = depthparams.start_depth
 
-    # tags
-    if len(tags) > 0:
-        # make a copy to restore to after each level
-        copy_of_offset_curve = area.Curve(offset_curve)
-    
+    subroutine = None
+    if use_subroutines and len(depths) > 1 and len(tag_index.tags) == 0 and use_CRC() == False and creator_has_subroutines():
+        def cut_kurve():
+            cut_curve(roll_on_curve)
+            cut_moves(moves, tag_index, None, depthparams.final_depth)
+            cut_curve(roll_off_curve)
+        subroutine = Subroutine(cut_kurve)
+
     prev_depth = depthparams.start_depth
     
     endpoint = None
@@ -321,29 +571,16 @@ def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radi
     for depth in depths:
         mat_depth = prev_depth
         
-        if len(tags) > 0:
-            split_for_tags(offset_curve, radius, depthparams.start_depth, depth, depthparams.final_depth)
-
-        # make the roll on and roll off kurves
-        roll_on_curve = area.Curve()
-        add_roll_on(offset_curve, roll_on_curve, direction, roll_radius, offset_extra, roll_on)
-        roll_off_curve = area.Curve()
-        add_roll_off(offset_curve, roll_off_curve, direction, roll_radius, offset_extra, roll_off)
-        if use_CRC():
-            crc_start_point = area.Point()
-            add_CRC_start_line(offset_curve,roll_on_curve,roll_off_curve,radius,direction,crc_start_point,lead_in_line_len)
-        
         # get the tag depth at the start
-        start_z = get_tag_z_for_span(0, offset_curve, radius, depthparams.start_depth, depth, depthparams.final_depth)
+        start_z = tag_index.get_z(0, depth, depthparams.final_depth)
         if start_z > mat_depth: mat_depth = start_z
 
         # rapid across to the start
-        s = roll_on_curve.FirstVertex().p
         
         # start point 
         if (endpoint == None) or (endpoint != s):
             if use_CRC():
-                rapid(crc_start_point.x,crc_start_point.y)
+                rapid(path.crc_start[0],path.crc_start[1])
             else:
                 rapid(s.x, s.y)
         
@@ -363,48 +600,27 @@ def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radi
             # move to the startpoint
             feed(s.x, s.y)
         
-        # cut the roll on arc
-        cut_curve(roll_on_curve)
-        
-        # cut the main kurve
-        current_perim = 0.0
-        
-        for span in offset_curve.GetSpans():
-            # height for tags
-            current_perim += span.Length()
-            ez = get_tag_z_for_span(current_perim, offset_curve, radius, depthparams.start_depth, depth, depthparams.final_depth)
-            
-            if span.v.type == 0:#line
-                feed(span.v.p.x, span.v.p.y, ez)
-            else:
-                if span.v.type == 1:# anti-clockwise arc
-                    arc_ccw(span.v.p.x, span.v.p.y, ez, i = span.v.c.x, j = span.v.c.y)
-                else:
-                    arc_cw(span.v.p.x, span.v.p.y, ez, i = span.v.c.x, j = span.v.c.y)
-                    
-    
-        # cut the roll off arc
-        cut_curve(roll_off_curve)
+        if subroutine != None:
+            subroutine.call()
+        else:
+            # cut the roll on arc
+            cut_curve(roll_on_curve)
 
-        endpoint = offset_curve.LastVertex().p
-        if roll_off_curve.getNumVertices() > 0:
-            endpoint = roll_off_curve.LastVertex().p
+            # cut the main kurve, split where the tags start and end at this depth
+            cut_moves(split_moves(moves, path.kurve_start, tag_index.break_perims(depth, depthparams.final_depth)), tag_index, depth, depthparams.final_depth)
+
+            # cut the roll off arc
+            cut_curve(roll_off_curve)
+
+        endpoint = kurve_end
         
         #add CRC end_line
         if use_CRC():
-            crc_end_point = area.Point()
-            add_CRC_end_line(offset_curve,roll_on_curve,roll_off_curve,radius,direction,crc_end_point,lead_out_line_len)
             if direction == "on":
                 rapid(z = depthparams.clearance_height)
             else:
-                feed(crc_end_point.x, crc_end_point.y)
-            
-              
-        # restore the unsplit kurve
-        if len(tags) > 0:
-            offset_curve = area.Curve(copy_of_offset_curve)
-        if use_CRC():
-            end_CRC()            
+                feed(path.crc_end[0], path.crc_end[1])
+            end_CRC()
         
         if endpoint != s:
             # rapid up to the clearance height
@@ -413,8 +629,3 @@ def profile(curve, direction = "on", radius = 1.0, offset_extra = 0.0, roll_radi
         prev_depth = depth
 
     rapid(z = depthparams.clearance_height)        
-
-    del offset_curve
-                
-    if len(tags) > 0:
-        del copy_of_offset_curve
@@ -6,6 +6,10 @@ import nc
 import iso
 
 class Creator(iso.Creator):
+    def __init__(self):
+        iso.Creator.__init__(self)
+        self.output_block_numbers = False # this program_end has never numbered the lines
+
     def init(self): 
         iso.Creator.init(self)
         self.arc_centre_absolute = True
@@ -11,6 +11,7 @@ import nc
 
 attached = False
 units = 1.0
+batch_size = 10000 # z-only feeds waiting for their surface height before the queue is written
 
 ################################################################################
 class Creator(recreator.Redirector):
@@ -24,6 +25,12 @@ class Creator(recreator.Redirector):
         self.path = None
         self.pdcf = None
         self.material_allowance = 0.0
+        self.path_spans = 0
+        self.spans = [] # the lines and arcs of path, for ocl_funcs.adaptive_drop_paths
+        # moves waiting to be written, in order; ('path', ocl.Path, z, spans), ('rapid', args) or ('plunge', x, y, z)
+        # the surface heights of all the plunges are found together, with one batch drop cutter
+        self.queue = []
+        self.plunges = 0
 
     ############################################################################
     ##  Shift in Z
@@ -36,32 +43,79 @@ class Creator(recreator.Redirector):
             self.pdcf.setSampling(0.1)
             self.pdcf.setZ(self.minz/units)
                     
+    def min_z(self):
+        if (self.z>self.minz):
+            return self.z  # Adjust Z if we have gotten a higher limit (Fix pocketing loosing steps when using attach?)
+        return self.minz/units # Else use minz
+
     def z2(self, z):
         path = ocl.Path()
         # use a line with no length
         path.append(ocl.Line(ocl.Point(self.x, self.y, self.z), ocl.Point(self.x, self.y, self.z)))
         self.setPdcfIfNotSet()
-        if (self.z>self.minz):
-            self.pdcf.setZ(self.z)  # Adjust Z if we have gotten a higher limit (Fix pocketing loosing steps when using attach?)
-        else:
-            self.pdcf.setZ(self.minz/units) # Else use minz
+        self.pdcf.setZ(self.min_z())
         self.pdcf.setPath(path)
         self.pdcf.run()
         plist = self.pdcf.getCLPoints()
         p = plist[0]
         return p.z + self.material_allowance/units
         
-    def cut_path(self):
+    def queue_path(self):
+        # the path so far is cut at the current z, like cut_path used to do straight away
         if self.path == None: return
+        if self.path_spans > 0: self.queue.append(('path', self.path, self.min_z(), self.spans))
+        self.path = ocl.Path()
+        self.path_spans = 0
+        self.spans = []
+
+    def cut_path(self):
+        self.queue_path()
+        if len(self.queue) == 0: return
+        queue = self.queue
+        self.queue = []
+        self.plunges = 0
+
+        # find the surface heights for all the plunges
+        heights = []
+        bdc = None
+        for item in queue:
+            if item[0] == 'plunge':
+                if bdc == None:
+                    bdc = ocl.BatchDropCutter()
+                    bdc.setSTL(self.stl)
+                    bdc.setCutter(self.cutter)
+                bdc.appendPoint(ocl.CLPoint(item[1], item[2], item[3]))
+        if bdc != None:
+            bdc.run()
+            heights = [p.z + self.material_allowance/units for p in bdc.getCLPoints()]
+
+        # with adaptive sampling, the points of all the paths are found together too
+        adaptive = None
+        if ocl_funcs.chordal_tolerance != None:
+            paths = [item for item in queue if item[0] == 'path']
+            adaptive = ocl_funcs.adaptive_drop_paths([item[3] for item in paths], self.stl, self.cutter, [item[2] for item in paths])
+
+        h = 0
+        n = 0
+        for item in queue:
+            if item[0] == 'path':
+                if adaptive == None:
+                    self.cut_queued_path(item[1], item[2])
+                else:
+                    self.feed_points(ocl_funcs.filter_points(adaptive[n], 0.005))
+                    n = n + 1
+            elif item[0] == 'rapid':
+                self.original.rapid(*item[1])
+            else:
+                self.original.feed(item[1]/units, item[2]/units, heights[h]/units)
+                h = h + 1
+
+    def cut_queued_path(self, path, z):
         self.setPdcfIfNotSet()
-        
-        if (self.z>self.minz):
-            self.pdcf.setZ(self.z)  # Adjust Z if we have gotten a higher limit (Fix pocketing loosing steps when using attach?)
-        else:
-            self.pdcf.setZ(self.minz/units) # Else use minz
+        self.pdcf.setZ(z)
             
        # get the points on the surface
-        self.pdcf.setPath(self.path)
+        self.pdcf.setPath(path)
         
         self.pdcf.run()
         plist = self.pdcf.getCLPoints()
@@ -72,35 +126,47 @@ class Creator(recreator.Redirector):
         for p in plist:
             f.addCLPoint(p)
         f.run()
-        plist = f.getCLPoints()
-        
-        i = 0
-        for p in plist:
-            if i > 0:
-                self.original.feed(p.x/units, p.y/units, p.z/units + self.material_allowance/units)
-            i = i + 1
-            
-        self.path = ocl.Path()
+        self.feed_points([(p.x, p.y, p.z) for p in f.getCLPoints()])
+
+    def feed_points(self, plist):
+        # feeds to the points of a path, after the first, which is where the path starts
+        for x, y, z in plist[1:]:
+            self.original.feed(x/units, y/units, z/units + self.material_allowance/units)
         
     def rapid(self, x=None, y=None, z=None, a=None, b=None, c=None ):
         if z != None:
             if z < self.z:
                 return
-        recreator.Redirector.rapid(self, x, y, z, a, b, c)
+        self.queue_path()
+        self.queue.append(('rapid', (x, y, z, a, b, c)))
+        if x != None: self.x = x * recreator.units
+        if y != None: self.y = y * recreator.units
+        if z != None: self.z = z * recreator.units
 
     def feed(self, x=None, y=None, z=None, a=None, b=None, c=None):
         px = self.x
         py = self.y
         pz = self.z
-        recreator.Redirector.feed(self, x, y, z, a, b, c)
+        if x != None: self.x = x * recreator.units
+        if y != None: self.y = y * recreator.units
+        if z != None: self.z = z * recreator.units
         if self.x == None or self.y == None or self.z == None:
+            self.cut_path()
+            self.original.feed(x, y, z)
             return
         if px == self.x and py == self.y:
+            # z move only, queue it to find its height on the surface with the others
+            self.queue_path()
+            self.queue.append(('plunge', self.x, self.y, self.min_z()))
+            self.plunges = self.plunges + 1
+            if self.plunges >= batch_size: self.cut_path()
             return
             
         # add a line to the path
         if self.path == None: self.path = ocl.Path()
         self.path.append(ocl.Line(ocl.Point(px, py, pz), ocl.Point(self.x, self.y, self.z)))
+        self.path_spans = self.path_spans + 1
+        self.spans.append(((px, py), (self.x, self.y)))
         
     def arc(self, x=None, y=None, z=None, i=None, j=None, k=None, r=None, ccw = True):
         px = self.x
@@ -111,7 +177,22 @@ class Creator(recreator.Redirector):
         # add an arc to the path
         if self.path == None: self.path = ocl.Path()
         self.path.append(ocl.Arc(ocl.Point(px, py, pz), ocl.Point(self.x, self.y, self.z), ocl.Point(i, j, pz), ccw))
+        self.path_spans = self.path_spans + 1
+        self.spans.append(((px, py), (self.x, self.y), (i * recreator.units, j * recreator.units), ccw))
         
+    def write(self, s):
+        # the queued moves are written first, so they come before the text, and before output is turned off or on
+        self.cut_path()
+        recreator.Redirector.write(self, s)
+
+    def disable_output(self):
+        self.cut_path()
+        recreator.Redirector.disable_output(self)
+
+    def enable_output(self):
+        self.cut_path()
+        recreator.Redirector.enable_output(self)
+
     def set_ocl_cutter(self, cutter):
         self.cutter = cutter
 
@@ -130,5 +211,6 @@ def attach_begin():
 def attach_end():
     global attached
     nc.creator.cut_path()
+    if nc.creator.stl != None: print(ocl_funcs.STLCacheReport())
     nc.creator = nc.creator.original
     attached = False
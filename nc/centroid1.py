@@ -27,6 +27,7 @@ class Creator(iso_modal.Creator):
         self.absolute_flag = True
         self.prev_g91 = ''
         self.safe_z =None
+        self.output_block_numbers = False # this program_end has never numbered the lines
     def SPINDLE(self, format, speed): return(self.SPACE() + 'S' + (format % speed))
 ################################################################################
 #cutter comp
@@ -1,5 +1,8 @@
 import math
 
+# the settings which change the text made by Format.string
+format_options = ['number_of_decimal_places', 'add_leading_zeros', 'add_trailing_zeros', 'dp_wanted', 'add_plus', 'no_minus', 'round_down']
+
 class Format:
     def __init__(self, number_of_decimal_places = 3, add_leading_zeros = 1, add_trailing_zeros = False, dp_wanted = True, add_plus = False, no_minus = False, round_down = False):
         self.number_of_decimal_places = number_of_decimal_places
@@ -9,10 +12,114 @@ class Format:
         self.add_plus = add_plus
         self.no_minus = no_minus
         self.round_down = round_down
+        self.cache_size = 512 # number of recently formatted values to remember
+        self.compile()
+
+    def __setattr__(self, name, value):
+        self.__dict__[name] = value
+        if name in format_options:
+            # the post processors change the settings after the Format is made, for example in metric() and imperial()
+            self.__dict__['compiled'] = False
+            self.__dict__['cache'] = {} # so that string() doesn't find the text made with the old settings
+
+    def compile(self):
+        # work out everything that doesn't depend on the number, so that string() only has to do integer arithmetic
+        self.multiplier = math.pow(10, self.number_of_decimal_places)
+        if self.round_down: self.rounding = 0.0
+        else: self.rounding = 0.5
+        # string_exact goes via str(float), which shows at most 12 significant digits and uses an exponent for tiny numbers,
+        # so only use the integer arithmetic where it gives the same text
+        if self.number_of_decimal_places <= 4: self.fast_limit = 100000000000
+        else: self.fast_limit = 0
+        # below fast_limit, the %f text of the rounded value has exactly its digits
+        self.fixed_format = '%.' + str(self.number_of_decimal_places) + 'f'
+        self.plus = ''
+        if self.add_plus: self.plus = '+'
+        self.dp = ''
+        if self.dp_wanted: self.dp = '.'
+        # without extra leading zeros or a missing minus, the %f text, with a + if wanted, only needs the trailing zeros or the decimal point taking off
+        self.simple = self.add_leading_zeros <= 1 and not self.no_minus
+        self.simple_format = '%' + self.plus + '.' + str(self.number_of_decimal_places) + 'f'
+        self.strip_zeros = self.number_of_decimal_places > 0 and not self.add_trailing_zeros
+        self.remove_dp = self.number_of_decimal_places > 0 and not self.dp_wanted
+        # the default settings, used for the coordinates, give the text str() gives for the rounded value, without a ".0" on the end
+        self.plain = self.simple and self.strip_zeros and self.dp_wanted and not self.add_plus
+        # if different rounded values always give different text, numbers can be compared without making the text
+        self.rounded_is_unique = (self.no_minus == False) and (self.dp_wanted or self.add_trailing_zeros or self.number_of_decimal_places == 0)
+        self.cache = {}
+        self.old_cache = {}
+        self.compiled = True
 
     def string(self, number):
-        if number == None:
+        s = self.cache.get(number)
+        if s is not None:
+            return s
+        if number is None:
             return 'None'
+        if self.compiled == False:
+            self.compile()
+
+        s = self.old_cache.get(number)
+        if s is None:
+            f = float(number) * self.multiplier
+            if f < 0: n = int(f - self.rounding)
+            else: n = int(f + self.rounding)
+            if not -self.fast_limit < n < self.fast_limit:
+                s = self.string_exact(number)
+            elif self.plain:
+                s = str(n / self.multiplier)
+                if s[-2:] == '.0': s = s[:-2]
+            elif self.simple:
+                s = self.simple_format % (n / self.multiplier)
+                if self.strip_zeros: s = s.rstrip('0').rstrip('.')
+                if self.remove_dp: s = s.replace('.', '')
+            else:
+                s = self.string_from_int(n)
+
+        # keep two generations of values; when the newer one fills up, the values not used since are forgotten
+        cache = self.cache
+        if len(cache) >= self.cache_size:
+            self.old_cache = cache
+            cache = self.cache = {}
+        cache[number] = s
+        return s
+
+    def rounded(self, number):
+        # the number in units of the last decimal place, rounded in the same way as string() does it
+        f = float(number) * self.multiplier
+        if f < 0: return int(f - self.rounding)
+        return int(f + self.rounding)
+
+    def same(self, a, b):
+        # returns True if string() would give the same text for both numbers
+        if a == None or b == None:
+            return a == b
+        if self.compiled == False:
+            self.compile()
+        if self.rounded_is_unique:
+            na = self.rounded(a)
+            nb = self.rounded(b)
+            if -self.fast_limit < na < self.fast_limit and -self.fast_limit < nb < self.fast_limit:
+                return na == nb
+        return self.string(a) == self.string(b)
+
+    def string_from_int(self, n):
+        # n is the number in units of the last decimal place, already rounded
+        before_dp, dot, after_dp = (self.fixed_format % (n / self.multiplier)).partition('.')
+        if n < 0:
+            if self.no_minus: before_dp = before_dp[1:]
+            sign = ''
+        else:
+            sign = self.plus
+        if len(before_dp) < self.add_leading_zeros:
+            before_dp = before_dp.zfill(self.add_leading_zeros)
+        if not self.add_trailing_zeros:
+            after_dp = after_dp.rstrip('0')
+        if len(after_dp):
+            return sign + before_dp + self.dp + after_dp
+        return sign + before_dp
+
+    def string_exact(self, number):
         multiplier = math.pow(10, self.number_of_decimal_places)
         
         f = float(number) * multiplier
@@ -0,0 +1,322 @@
+################################################################################
+# hbin_writer.py
+#
+# A compact binary alternative to hxml_writer.py for backplotting.
+# The same writer calls are turned into typed records, which are buffered and
+# written out in chunks, so memory use doesn't grow with the size of the program.
+#
+# File layout:
+#   header: 'HBPL', version (uint16)
+#   records: record type (uint8) followed by its fields, all little endian
+#   an INDEX record is written every index_interval moves, followed by the colour names again,
+#   and an END record at the end
+#   trailer: offset of the END record (uint64), 'LPBH'
+#
+# The INDEX and END records hold the number of moves and blocks written before them and
+# the offset of the previous INDEX record, so a reader can start from the
+# trailer and walk back through the file to find a position in the program.
+
+import tempfile
+import struct
+
+MAGIC = 'HBPL'
+TRAILER_MAGIC = 'LPBH'
+VERSION = 1
+
+# record types
+BLOCK_BEGIN = 1
+BLOCK_END = 2
+NAME = 3 # defines a colour name; id (uint8), length (uint16), name
+TEXT = 4 # colour id (uint8), cdata (uint8), length (uint8), text
+MODE = 5 # units (double)
+PATH_BEGIN = 6 # colour id (uint8)
+PATH_END = 7
+LINE = 8 # mask (uint8), then a double for each of x, y, z, a, b, c in the mask
+ARC = 9 # mask (uint8), direction (int8), then a double for each of x, y, z, i, j, k, r in the mask
+TOOL = 10 # has number (uint8), number (int32)
+INDEX = 11 # moves (uint64), blocks (uint64), offset of previous INDEX or 0 (uint64)
+END = 12 # same fields as INDEX, the last record before the trailer
+LONG_TEXT = 13 # like TEXT, but with a uint32 length
+
+# the i, j, k of arcs are stored relative to the start point, like hxml_writer does
+LINE_FIELDS = ('x', 'y', 'z', 'a', 'b', 'c')
+ARC_FIELDS = ('x', 'y', 'z', 'i', 'j', 'k', 'r')
+
+long_text_struct = struct.Struct('<BBBI')
+index_struct = struct.Struct('<BQQQ')
+line_xyz_struct = struct.Struct('<BBddd')
+line_xy_struct = struct.Struct('<BBdd')
+line_structs = {} # mask to struct.Struct
+arc_structs = {}
+block_begin_record = chr(BLOCK_BEGIN)
+block_end_record = chr(BLOCK_END)
+path_end_record = chr(PATH_END)
+
+def field_values(values, structs, format):
+    # gives the mask of the values which are not None, the values themselves and a struct.Struct to pack them with
+    mask = 0
+    given = []
+    bit = 1
+    for v in values:
+        if v != None:
+            mask |= bit
+            given.append(v)
+        bit <<= 1
+    s = structs.get(mask)
+    if s == None:
+        s = struct.Struct(format % len(given))
+        structs[mask] = s
+    return mask, given, s
+
+class HbinWriter:
+    def __init__(self, file_path = None, chunk_size = 262144, index_interval = 65536):
+        if file_path == None: file_path = tempfile.gettempdir()+'/backplot.hbp'
+        self.file_out = open(file_path, 'wb', chunk_size) # chunk_size is the number of bytes buffered before they are written to the file
+        self.put = self.file_out.write
+        self.index_interval = index_interval # moves between INDEX records
+        self.last_index = 0
+        self.moves = 0
+        self.blocks = 0
+        self.names = {None:0}
+        self.text_heads = {} # (colour, cdata) to the start of their TEXT records
+        self.path_heads = {} # colour to its PATH_BEGIN record
+        self.t = None
+        self.oldx = None
+        self.oldy = None
+        self.oldz = None
+        self.closed = False
+        self.put(MAGIC + struct.pack('<H', VERSION))
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.closed: return
+        self.add_index(END)
+        self.put(struct.pack('<Q', self.last_index) + TRAILER_MAGIC)
+        self.file_out.close()
+        self.closed = True
+
+    def add_index(self, type = INDEX):
+        offset = self.file_out.tell()
+        self.put(index_struct.pack(type, self.moves, self.blocks, self.last_index))
+        self.last_index = offset
+        if type == INDEX:
+            # repeat the colour names, so the file can be read from here on its own
+            for col, id in self.names.items():
+                if col != None: self.put_name(col, id)
+
+    def add_move(self, record):
+        self.put(record)
+        self.moves += 1
+        if self.moves % self.index_interval == 0:
+            self.add_index()
+
+    def add_name(self, col):
+        id = len(self.names)
+        if id > 255: raise ValueError('too many different colours for the backplot file')
+        self.names[col] = id
+        self.put_name(col, id)
+        return id
+
+    def put_name(self, col, id):
+        self.put(struct.pack('<BBH', NAME, id, len(col)) + col)
+
+    def write(self, s):
+        self.add_text(s, None, False)
+
+############################################
+
+    def begin_ncblock(self):
+        self.put(block_begin_record)
+
+    def end_ncblock(self):
+        self.put(block_end_record)
+        self.blocks += 1
+
+    def add_text(self, s, col, cdata):
+        # the parsers give every word of the program to this, so the start of the record is only made once for each colour
+        if type(s) == unicode: s = s.encode('utf-8')
+        head = self.text_heads.get((col, cdata))
+        if head == None:
+            id = self.names.get(col)
+            if id == None: id = self.add_name(col)
+            head = self.text_heads[(col, cdata)] = chr(TEXT) + chr(id) + chr(cdata == True)
+        n = len(s)
+        if n < 256: self.put(head + chr(n) + s)
+        else: self.put(long_text_struct.pack(LONG_TEXT, self.names[col], cdata == True, n) + s)
+
+    def set_mode(self, units):
+        if units == None: return
+        self.put(struct.pack('<Bd', MODE, units))
+
+    def metric(self):
+        self.set_mode(units = 1.0)
+
+    def imperial(self):
+        self.set_mode(units = 25.4)
+
+    def begin_path(self, col):
+        head = self.path_heads.get(col)
+        if head == None:
+            id = self.names.get(col)
+            if id == None: id = self.add_name(col)
+            head = self.path_heads[col] = chr(PATH_BEGIN) + chr(id)
+        self.put(head)
+
+    def end_path(self):
+        self.put(path_end_record)
+
+    def rapid(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        self.begin_path("rapid")
+        self.add_line(x, y, z, a, b, c)
+        self.end_path()
+
+    def feed(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        self.begin_path("feed")
+        self.add_line(x, y, z, a, b, c)
+        self.end_path()
+
+    def arc_cw(self, x=None, y=None, z=None, i=None, j=None, k=None, r=None):
+        self.begin_path("feed")
+        self.add_arc(x, y, z, i, j, k, r, -1)
+        self.end_path()
+
+    def arc_ccw(self, x=None, y=None, z=None, i=None, j=None, k=None, r=None):
+        self.begin_path("feed")
+        self.add_arc(x, y, z, i, j, k, r, 1)
+        self.end_path()
+
+    def tool_change(self, id):
+        if id == None: self.put(struct.pack('<BBi', TOOL, 0, 0))
+        else: self.put(struct.pack('<BBi', TOOL, 1, int(id)))
+        self.t = id
+
+    def current_tool(self):
+        return self.t
+
+    def spindle(self, s, clockwise):
+        pass
+
+    def feedrate(self, f):
+        pass
+
+    def add_line(self, x, y, z, a = None, b = None, c = None):
+        if x != None and y != None and a == None and b == None and c == None:
+            # the usual moves, which the parsers give without z when it doesn't change
+            if z != None: self.add_move(line_xyz_struct.pack(LINE, 7, x, y, z))
+            else: self.add_move(line_xy_struct.pack(LINE, 3, x, y))
+        else:
+            mask, values, s = field_values((x, y, z, a, b, c), line_structs, '<BB%dd')
+            self.add_move(s.pack(LINE, mask, *values))
+        if x != None: self.oldx = x
+        if y != None: self.oldy = y
+        if z != None: self.oldz = z
+
+    def add_arc(self, x, y, z, i, j, k, r = None, d = None):
+        if (i != None) and (self.oldx == None):
+            print('arc move "i" without x set!')
+            i = None
+        if (j != None) and (self.oldy == None):
+            print('arc move "j" without y set!')
+            j = None
+        if (k != None) and (self.oldz == None):
+            print('arc move "k" without z set!')
+            k = None
+        if i != None: i = i - self.oldx
+        if j != None: j = j - self.oldy
+        if k != None: k = k - self.oldz
+        if d == None: d = 0
+        mask, values, s = field_values((x, y, z, i, j, k, r), arc_structs, '<BBb%dd')
+        self.add_move(s.pack(ARC, mask, d, *values))
+        if x != None: self.oldx = x
+        if y != None: self.oldy = y
+        if z != None: self.oldz = z
+
+############################################
+
+def open_file(file_path):
+    f = open(file_path, 'rb')
+    if f.read(4) != MAGIC:
+        f.close()
+        raise ValueError('not a binary backplot file: ' + file_path)
+    version = struct.unpack('<H', f.read(2))[0]
+    if version != VERSION:
+        f.close()
+        raise ValueError('unknown binary backplot file version: ' + str(version))
+    return f
+
+def read_index(file_path):
+    # gives a list of (offset, moves, blocks) for each INDEX record and the END record, in file order
+    # reading can be started at any of these with read_records(file_path, offset)
+    f = open_file(file_path)
+    try:
+        f.seek(-12, 2)
+        offset, magic = struct.unpack('<Q4s', f.read(12))
+        if magic != TRAILER_MAGIC: raise ValueError('binary backplot file is truncated: ' + file_path)
+        index = []
+        while offset != 0:
+            f.seek(offset)
+            type, moves, blocks, previous = index_struct.unpack(f.read(index_struct.size))
+            index.append((offset, moves, blocks))
+            offset = previous
+        index.reverse()
+        return index
+    finally:
+        f.close()
+
+def read_records(file_path, offset = None):
+    # generator giving (record type, fields) for each record in a backplot file written by HbinWriter
+    # LINE and ARC fields are dictionaries of the values that were given
+    f = open_file(file_path)
+    try:
+        if offset != None: f.seek(offset)
+        names = {0:None}
+        while True:
+            type = f.read(1)
+            if type == '': raise ValueError('binary backplot file is truncated: ' + file_path)
+            type = ord(type)
+            if type == BLOCK_BEGIN or type == BLOCK_END or type == PATH_END:
+                yield (type, None)
+            elif type == NAME:
+                id, length = struct.unpack('<BH', f.read(3))
+                names[id] = f.read(length)
+            elif type == TEXT:
+                id, cdata, length = struct.unpack('<BBB', f.read(3))
+                yield (TEXT, (f.read(length), names[id], cdata == 1))
+            elif type == LONG_TEXT:
+                id, cdata, length = struct.unpack('<BBI', f.read(6))
+                yield (TEXT, (f.read(length), names[id], cdata == 1))
+            elif type == MODE:
+                yield (type, struct.unpack('<d', f.read(8))[0])
+            elif type == PATH_BEGIN:
+                yield (type, names[ord(f.read(1))])
+            elif type == LINE:
+                yield (type, read_values(f, ord(f.read(1)), LINE_FIELDS))
+            elif type == ARC:
+                mask, d = struct.unpack('<Bb', f.read(2))
+                values = read_values(f, mask, ARC_FIELDS)
+                values['d'] = d
+                yield (type, values)
+            elif type == TOOL:
+                has_number, number = struct.unpack('<Bi', f.read(5))
+                if has_number: yield (type, number)
+                else: yield (type, None)
+            elif type == INDEX:
+                yield (type, struct.unpack('<QQQ', f.read(24)))
+            elif type == END:
+                yield (type, struct.unpack('<QQQ', f.read(24)))
+                break
+            else:
+                raise ValueError('unknown record type %d in binary backplot file' % type)
+    finally:
+        f.close()
+
+def read_values(f, mask, fields):
+    values = {}
+    bit = 1
+    for name in fields:
+        if mask & bit:
+            values[name] = struct.unpack('<d', f.read(8))[0]
+        bit <<= 1
+    return values
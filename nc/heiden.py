@@ -36,6 +36,7 @@ class Creator(iso.Creator):
         self.s = Address('S', fmt = Format(number_of_decimal_places = 2))
         self.spindle_dir_for_next_move = None
         self.output_arcs_as_lines = False
+        self.can_do_plane_arcs = False # set_plane writes nothing
         
     def BLOCK(self): return('%i')
     def SPACE_STR(self): return ' '
@@ -1,8 +1,9 @@
 import tempfile
 
 class HxmlWriter:
-    def __init__(self):
-        self.file_out = open(tempfile.gettempdir()+'/backplot.xml', 'w')
+    def __init__(self, file_path = None):
+        if file_path == None: file_path = tempfile.gettempdir()+'/backplot.xml'
+        self.file_out = open(file_path, 'w')
         self.file_out.write('<?xml version="1.0" ?>\n')
         self.file_out.write('<nccode>\n')
         self.t = None
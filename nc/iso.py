@@ -73,6 +73,10 @@ class Creator(nc.Creator):
             self.fixture_order.append('54.' + str(i))
         self.output_disabled = False
         self.z_for_g43 = None
+        self.block = [] # the words of the current block, joined and written when the block ends
+        self.block_number = None # the number for the next line of the file, if block numbers are wanted
+        self.at_start_of_file_line = True
+        self.number_this_file = True # subroutines written to the temporary file get numbered when appended to the program
 
         # optional settings
         self.arc_centre_absolute = False
@@ -80,6 +84,7 @@ class Creator(nc.Creator):
         self.drillExpanded = False
         self.dwell_allowed_in_G83 = False
         self.can_do_helical_arcs = True
+        self.can_do_plane_arcs = True # arcs in the XZ and YZ planes, after set_plane, are written as they are given
         self.z_for_g53 = None # set this to a value to output G53 Zvalue in tool change and at program end
         self.output_h_and_d_at_tool_change = False
         self.output_block_numbers = True
@@ -201,10 +206,55 @@ class Creator(nc.Creator):
     ##  Internals
     def write(self, s):
         if self.output_disabled == False:
-            nc.Creator.write(self, s)
+            self.block.append(s)
         if '\n' in s:
+            self.flush_block()
             self.start_of_line = s[-1] == '\n'
 
+    def flush_block(self):
+        if len(self.block):
+            s = ''.join(self.block)
+            if self.output_block_numbers and self.number_this_file:
+                s = self.add_block_numbers(s)
+            nc.Creator.write(self, s)
+            self.block = []
+
+    def add_block_numbers(self, s):
+        # put a block number at the start of every line of the file, as the lines are written
+        if self.block_number == None:
+            self.block_number = self.start_block_number
+        if self.at_start_of_file_line and s.find('\n') == len(s) - 1:
+            # usual case; one whole line
+            n = self.block_number
+            self.block_number += self.block_number_increment
+            if self.block_number_restart_after != None:
+                if self.block_number >= self.block_number_restart_after:
+                    self.block_number = self.start_block_number
+            return self.BLOCK() % n + self.SPACE_STR() + s
+        lines = s.split('\n')
+        last = len(lines) - 1
+        s = ''
+        for i in range(0, len(lines)):
+            if i == last and len(lines[i]) == 0:
+                break # the text ended with a new line
+            if self.at_start_of_file_line:
+                s += self.BLOCK() % self.block_number + self.SPACE_STR()
+                self.block_number += self.block_number_increment
+                if self.block_number_restart_after != None:
+                    if self.block_number >= self.block_number_restart_after:
+                        self.block_number = self.start_block_number
+            s += lines[i]
+            if i < last:
+                s += '\n'
+                self.at_start_of_file_line = True
+            else:
+                self.at_start_of_file_line = False
+        return s
+
+    def file_close(self):
+        self.flush_block()
+        nc.Creator.file_close(self)
+
     def write_feedrate(self):
         self.write(self.SPACE())
         self.f.write(self)
@@ -278,36 +328,6 @@ class Creator(nc.Creator):
             self.write(self.STOP() + '\n')
             self.prev_g0123 = ''
             
-    def number_file(self, filename):
-        import tempfile
-        temp_filename = tempfile.gettempdir()+'/renumbering.txt'
-        
-        # make a copy of file
-        f_in = open(filename, 'r')
-        f_out = open(temp_filename, 'w')
-        while (True):
-            line = f_in.readline()
-            if (len(line) == 0) : break
-            f_out.write(line)
-        f_in.close()
-        f_out.close()
-                
-        # read copy
-        f_in = open(temp_filename, 'r')
-        f_out = open(filename, 'w')
-        n = self.start_block_number
-        while (True):
-            line = f_in.readline()
-           
-            if (len(line) == 0) : break
-            f_out.write(self.BLOCK() % n + self.SPACE_STR() + line)
-            n += self.block_number_increment
-            if self.block_number_restart_after != None:
-                if n >= self.block_number_restart_after:
-                    n = self.start_block_number
-        f_in.close()
-        f_out.close()
-
     def program_end(self):
         if self.z_for_g53 != None:
             self.write(self.SPACE() + self.MACHINE_COORDINATES() + self.SPACE() + 'Z' + self.fmt.string(self.z_for_g53) + '\n')
@@ -322,13 +342,6 @@ class Creator(nc.Creator):
             f_in.close()
             
         self.file_close()
-            
-        if self.output_block_numbers:
-            # number every line of the file afterwards
-            self.number_file(self.filename)
-            
-            for f in self.subroutine_files:
-                self.number_file(f)
 
     def flush_nc(self):
         if len(self.g_list) == 0 and len(self.m) == 0: return
@@ -357,13 +370,19 @@ class Creator(nc.Creator):
             
         if name == None:
             name = self.program_name + ' subroutine ' + str(id)
-            
+
+        self.flush_block()
         self.save_file = self.file
+        self.save_block_numbering = (self.block_number, self.at_start_of_file_line, self.number_this_file)
         if self.subroutines_in_own_files:
             new_name = self.make_subroutine_name(id)
             self.file = open(new_name, 'w')
             self.subroutine_files.append(new_name)
+            # each subroutine file is numbered from the start
+            self.block_number = None
+            self.at_start_of_file_line = True
         else:
+            self.number_this_file = False
             ## use temporary file
             import tempfile
             temp_filename = tempfile.gettempdir()+'/subroutines.txt'
@@ -385,8 +404,10 @@ class Creator(nc.Creator):
     def sub_end(self):
         self.write(self.SPACE() + self.SUBPROG_END() + '\n')
 
+        self.flush_block()
         self.file.close()
         self.file = self.save_file
+        self.block_number, self.at_start_of_file_line, self.number_this_file = self.save_block_numbering
         
     def disable_output(self):
         self.output_disabled = True
@@ -676,23 +697,24 @@ class Creator(nc.Creator):
         self.write('\n')
 
     def same_xyz(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        # compares the positions rounded to the output resolution, rather than the text that would be output for them
         if (x != None):
-            if (self.fmt.string(x + self.shift_x)) != (self.fmt.string(self.x)):
+            if not self.fmt.same(x + self.shift_x, self.x):
                 return False
         if (y != None):
-            if (self.fmt.string(y + self.shift_y)) != (self.fmt.string(self.y)):
+            if not self.fmt.same(y + self.shift_y, self.y):
                 return False
         if (z != None):
-            if (self.fmt.string(z + self.shift_z)) != (self.fmt.string(self.z)):
+            if not self.fmt.same(z + self.shift_z, self.z):
                 return False
         if (a != None):
-            if (self.fmt.string(a)) != (self.fmt.string(self.a)):
+            if not self.fmt.same(a, self.a):
                 return False
         if (b != None):
-            if (self.fmt.string(b)) != (self.fmt.string(self.b)):
+            if not self.fmt.same(b, self.b):
                 return False
         if (c != None):
-            if (self.fmt.string(c)) != (self.fmt.string(self.c)):
+            if not self.fmt.same(c, self.c):
                 return False
         return True
 
@@ -735,12 +757,12 @@ class Creator(nc.Creator):
     def arc(self, cw, x=None, y=None, z=None, i=None, j=None, k=None, r=None):
         if self.same_xyz(x, y, z): return
         
-        if (self.fmt.string(i) == self.fmt.string(self.x) and self.fmt.string(j) == self.fmt.string(self.y)) or (self.fmt.string(i) == self.fmt.string(x if x != None else self.x) and self.fmt.string(j) == self.fmt.string(y if y != None else self.y)):
+        if (self.fmt.same(i, self.x) and self.fmt.same(j, self.y)) or (self.fmt.same(i, x if x != None else self.x) and self.fmt.same(j, y if y != None else self.y)):
             # if arc has zero radius, output an line instead
             self.feed(x, y, z)
             return
         
-        if self.output_arcs_as_lines or (self.can_do_helical_arcs == False and self.in_quadrant_splitting == False and (z != None) and (math.fabs(z - self.z) > 0.000001) and (self.fmt.string(z) != self.fmt.string(self.z))):
+        if self.output_arcs_as_lines or (self.can_do_helical_arcs == False and self.in_quadrant_splitting == False and (z != None) and (math.fabs(z - self.z) > 0.000001) and not self.fmt.same(z, self.z)):
             # split the helical arc into little line feed moves
             
             if x == None: x = self.x
@@ -814,7 +836,7 @@ class Creator(nc.Creator):
                         else:
                             x1, y1 = self.quadrant_end(q, i, j, rad)
                             
-                    if (self.fmt.string(x1) != self.fmt.string(self.x)) or (self.fmt.string(y1) != self.fmt.string(self.y)):
+                    if not self.fmt.same(x1, self.x) or not self.fmt.same(y1, self.y):
                         if (math.fabs(x1 - self.x) > 0.01) or (math.fabs(y1 - self.y) > 0.01):
                             self.arc(cw, x1, y1, z, i, j, k, r)
                         else:
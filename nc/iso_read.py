@@ -18,140 +18,178 @@ class Parser(nc.Parser):
         #if ( or ! or ; at least one space or a letter followed by some character or not followed by a +/- followed by decimal, with a possible decimal point
          #  followed by a possible deimcal, or a letter followed by # with a decimal . deimcal
         # add your character here > [(!;] for comments char
-        # then look for the 'comment' function towards the end of the file and add another elif
-        
+        # then add it to the letter_handlers table below, with ParseComment
+
     def ParseWord(self, word):
         word = word.upper()
-        if (word[0] == 'A'):
-            self.col = "axis"
-            self.a = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'B'):
-            self.col = "axis"
-            self.b = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'C'):
-            self.col = "axis"
-            self.c = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'F'):
-            self.col = "axis"
-            self.writer.feedrate(word[1:])
-        elif (word[0] == 'H'):
-            self.col = "axis"
-            self.h = eval(word[1:])
-            self.move = True
-        elif (word == 'G0' or word == 'G00'):
-            self.path_col = "rapid"
-            self.col = "rapid"
-            self.arc = 0
-        elif (word == 'G1' or word == 'G01'):
-            self.path_col = "feed"
-            self.col = "feed"
-            self.arc = 0
-        elif (word == 'G2' or word == 'G02' or word == 'G12'):
-            self.path_col = "feed"
-            self.col = "feed"
-            self.arc = -1
-        elif (word == 'G3' or word == 'G03' or word == 'G13'):
-            self.path_col = "feed"
-            self.col = "feed"
-            self.arc = +1
-        elif (word == 'G10'):
-            self.no_move = True
-        elif (word == 'G53'):
-            self.no_move = True
-        elif (word == 'L1'):
-            self.no_move = True
-        elif (word == 'G61.1' or word == 'G61' or word == 'G64'):
-            self.no_move = True
-        elif (word == 'G20' or word == 'G70'):
-            self.col = "prep"
-            self.writer.imperial()
-        elif (word == 'G21' or word == 'G71'):
-            self.col = "prep"
-            self.writer.metric()
-        elif (word == 'G43'):
-            self.height_offset = True
-            self.move = True
-            self.path_col = "rapid"
-            self.col = "rapid"
-        elif (word == 'G80'):
-            self.drill_off = True
-        elif (word == 'G81'):
-            self.drill = True
-            self.no_move = True
-            self.path_col = "feed"
-            self.col = "feed"
-        elif (word == 'G82'):
-            self.drill = True;
-            self.no_move = True
-            self.path_col = "feed"
-            self.col = "feed"
-        elif (word == 'G83'):
-            self.drill = True
-            self.no_move = True
-            self.path_col = "feed"
-            self.col = "feed"
-        elif (word == 'G90'):
-            self.absolute()
-        elif (word == 'G91'):
-            self.incremental()
-        elif (word == 'G98'):
-            self.drilling_uses_clearance = True
-        elif (word == 'G99'):
-            self.drilling_uses_clearance = False
-        elif (word[0] == 'G') : col = "prep"
-        elif (word[0] == 'I'):
-            self.col = "axis"
-            self.i = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'J'):
-            self.col = "axis"
-            self.j = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'K'):
-            self.col = "axis"
-            self.k = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'M') : self.col = "misc"
-        elif (word[0] == 'N') : self.col = "blocknum"
-        elif (word[0] == 'O') : self.col = "program"
-        elif (word[0] == 'P'):
-             if (self.no_move != True):
-                 self.col = "axis"
-                 self.p = eval(word[1:])
-                 self.move = True
-        elif (word[0] == 'Q'):
-             if (self.no_move != True):
-                 self.col = "axis"
-                 self.q = eval(word[1:])
-                 self.move = True
-        elif (word[0] == 'R'):
-            self.col = "axis"
-            self.r = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'S'):
-            self.col = "axis"
-            self.writer.spindle(word[1:], (float(word[1:]) >= 0.0))
-        elif (word[0] == 'T') :
-            self.col = "tool"
-            self.writer.tool_change( eval(word[1:]) )
-        elif (word[0] == 'X'):
-            self.col = "axis"
-            self.x = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'Y'):
-            self.col = "axis"
-            self.y = eval(word[1:])
-            self.move = True
-        elif (word[0] == 'Z'):
-            self.col = "axis"
-            self.z = eval(word[1:])
-            self.move = True
-        elif (word[0] == '(') : (self.col, self.cdata) = ("comment", True)
-        elif (word[0] == '!') : (self.col, self.cdata) = ("comment", True)
-        elif (word[0] == ';') : (self.col, self.cdata) = ("comment", True)
-        elif (word[0] == '#') : self.col = "variable"
-        elif (word[0] == ':') : self.col = "blocknum"
-        elif (ord(word[0]) <= 32) : self.cdata = True
+        handler = self.word_handlers.get(word)
+        if handler == None:
+            handler = self.letter_handlers.get(word[0])
+            if handler == None:
+                if (ord(word[0]) <= 32) : self.cdata = True
+                return
+        handler(self, word)
+
+    def Number(self, s):
+        # whole numbers stay as int, like they were when this used eval()
+        # but a leading zero doesn't make them octal any more, so X010 is 10, not 8, and X08 is 8, not a syntax error
+        if '.' in s: return float(s)
+        return int(s)
+
+    def ParseRapid(self, word):
+        self.path_col = "rapid"
+        self.col = "rapid"
+        self.arc = 0
+
+    def ParseFeed(self, word):
+        self.path_col = "feed"
+        self.col = "feed"
+        self.arc = 0
+
+    def ParseArcCW(self, word):
+        self.path_col = "feed"
+        self.col = "feed"
+        self.arc = -1
+
+    def ParseArcCCW(self, word):
+        self.path_col = "feed"
+        self.col = "feed"
+        self.arc = +1
+
+    def ParseNoMove(self, word):
+        self.no_move = True
+
+    def ParseImperial(self, word):
+        self.col = "prep"
+        self.writer.imperial()
+
+    def ParseMetric(self, word):
+        self.col = "prep"
+        self.writer.metric()
+
+    def ParseHeightOffset(self, word):
+        self.height_offset = True
+        self.move = True
+        self.path_col = "rapid"
+        self.col = "rapid"
+
+    def ParseDrillOff(self, word):
+        self.drill_off = True
+
+    def ParseDrill(self, word):
+        self.drill = True
+        self.no_move = True
+        self.path_col = "feed"
+        self.col = "feed"
+
+    def ParseAbsolute(self, word):
+        self.absolute()
+
+    def ParseIncremental(self, word):
+        self.incremental()
+
+    def ParseDrillClearance(self, word):
+        self.drilling_uses_clearance = True
+
+    def ParseDrillNoClearance(self, word):
+        self.drilling_uses_clearance = False
+
+    def ParseAxis(self, word):
+        # sets self.a, self.b, self.c, self.h, self.i, self.j, self.k or self.r
+        self.col = "axis"
+        setattr(self, word[0].lower(), self.Number(word[1:]))
+        self.move = True
+
+    def ParseX(self, word):
+        self.col = "axis"
+        self.x = self.Number(word[1:])
+        self.move = True
+
+    def ParseY(self, word):
+        self.col = "axis"
+        self.y = self.Number(word[1:])
+        self.move = True
+
+    def ParseZ(self, word):
+        self.col = "axis"
+        self.z = self.Number(word[1:])
+        self.move = True
+
+    def ParseAxisIfMove(self, word):
+        # P and Q are parameters of G10 and the drilling cycles, not positions
+        if (self.no_move != True):
+            self.ParseAxis(word)
+
+    def ParseFeedrate(self, word):
+        self.col = "axis"
+        self.writer.feedrate(word[1:])
+
+    def ParseSpindle(self, word):
+        self.col = "axis"
+        self.writer.spindle(word[1:], (float(word[1:]) >= 0.0))
+
+    def ParseTool(self, word):
+        self.col = "tool"
+        self.writer.tool_change( self.Number(word[1:]) )
+
+    def ParseMisc(self, word):
+        self.col = "misc"
+
+    def ParseBlockNumber(self, word):
+        self.col = "blocknum"
+
+    def ParseProgram(self, word):
+        self.col = "program"
+
+    def ParseComment(self, word):
+        (self.col, self.cdata) = ("comment", True)
+
+    def ParseVariable(self, word):
+        self.col = "variable"
+
+
+################################################################################
+# the handlers of the words, looked up by ParseWord and called as handler(self, word)
+# the class keeps the plain functions of the methods, made once here; bound methods kept in each parser would make a
+# reference cycle, which keeps the writer from being closed
+
+def handler_functions(names):
+    functions = {}
+    for key, name in names.items():
+        functions[key] = Parser.__dict__[name]
+    return functions
+
+# words which have a meaning of their own, looked up before the first letter
+Parser.word_handlers = handler_functions({
+    'G0':'ParseRapid', 'G00':'ParseRapid',
+    'G1':'ParseFeed', 'G01':'ParseFeed',
+    'G2':'ParseArcCW', 'G02':'ParseArcCW', 'G12':'ParseArcCW',
+    'G3':'ParseArcCCW', 'G03':'ParseArcCCW', 'G13':'ParseArcCCW',
+    'G10':'ParseNoMove', 'G53':'ParseNoMove', 'L1':'ParseNoMove',
+    'G61.1':'ParseNoMove', 'G61':'ParseNoMove', 'G64':'ParseNoMove',
+    'G20':'ParseImperial', 'G70':'ParseImperial',
+    'G21':'ParseMetric', 'G71':'ParseMetric',
+    'G43':'ParseHeightOffset',
+    'G80':'ParseDrillOff',
+    'G81':'ParseDrill', 'G82':'ParseDrill', 'G83':'ParseDrill',
+    'G90':'ParseAbsolute',
+    'G91':'ParseIncremental',
+    'G98':'ParseDrillClearance',
+    'G99':'ParseDrillNoClearance',
+})
+
+# the other words, by their first letter
+Parser.letter_handlers = handler_functions({
+    'A':'ParseAxis', 'B':'ParseAxis', 'C':'ParseAxis', 'H':'ParseAxis',
+    'I':'ParseAxis', 'J':'ParseAxis', 'K':'ParseAxis', 'R':'ParseAxis',
+    'X':'ParseX', 'Y':'ParseY', 'Z':'ParseZ',
+    'P':'ParseAxisIfMove', 'Q':'ParseAxisIfMove',
+    'F':'ParseFeedrate',
+    'S':'ParseSpindle',
+    'T':'ParseTool',
+    'M':'ParseMisc',
+    'N':'ParseBlockNumber', ':':'ParseBlockNumber',
+    'O':'ParseProgram',
+    '(':'ParseComment', '!':'ParseComment', ';':'ParseComment',
+    '#':'ParseVariable',
+})
@@ -13,6 +13,7 @@ class CreatorMakerbotHBP(iso_modal.CreatorIsoModal):
         iso_modal.CreatorIsoModal.__init__(self)
 
         self.absolute_flag = True
+        self.can_do_plane_arcs = False # set_plane writes nothing
         self.prev_g91 = ''
 
 
@@ -12,6 +12,7 @@ class Creator(iso_modal.Creator):
         #self.output_block_numbers = False
         self.output_tool_definitions = False
         self.output_h_and_d_at_tool_change=True
+        self.can_do_plane_arcs = False # set_plane writes nothing
 
     def SPACE(self):
         return ''
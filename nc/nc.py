@@ -24,13 +24,13 @@ ncFLOOD = 2
 class Creator:
 
     def __init__(self):
-        pass
+        self.write_buffer_size = 1048576 # bytes held in memory before the output file is written to
 
     ############################################################################
     ##  Internals
 
     def file_open(self, name):
-        self.file = open(name, 'w')
+        self.file = open(name, 'w', self.write_buffer_size)
         self.filename = name
 
     def file_close(self):
@@ -0,0 +1,194 @@
+################################################################################
+# parallel_backplot.py
+#
+# Backplots a large NC file to backplot.xml using several processes.
+#
+# The file is split into parts at line boundaries, preferably just after a
+# G0 or G1 line which gives X, Y and Z, because the position and motion mode
+# are set again there. Each process parses the first lines of the program and
+# a few lines before its part without keeping the output, to set up the modal
+# state, then parses its part to a file of its own. The parts are joined in
+# order.
+#
+# The state each part started with is checked against the state the part before
+# it ended with. A part which started with the wrong state is parsed again with
+# the right one, so the result is always the same as parsing the whole file.
+
+import os
+import re
+import mmap
+import tempfile
+import multiprocessing
+from hxml_writer import HxmlWriter
+
+header_lines = 50 # lines at the start of the program, which are parsed by every process
+warm_up_lines = 20 # lines parsed before each part
+anchor_search_lines = 2000 # lines searched for a good place to split a part
+parts_per_process = 2
+
+anchor_pattern = re.compile('[gG]0*[01](?![0-9.])')
+anchor_axes_pattern = re.compile('(?=.*[xX][-+.0-9])(?=.*[yY][-+.0-9])(?=.*[zZ][-+.0-9])')
+blank_line_pattern = re.compile('(?m)^[ \t\r\f\v]*$')
+footer = '</nccode>\n' # written by HxmlWriter.__del__
+
+def can_parse_in_parts(parser_class):
+    # only parsers which use nc_read's Parse, line by line, can be split up
+    import nc_read
+    parse = getattr(parser_class, 'Parse', None)
+    return parse != None and parse.im_func == nc_read.Parser.Parse.im_func
+
+def end_of_program(nc_file):
+    # the parser stops at the first blank line, so nothing after it is split up
+    if os.path.getsize(nc_file) == 0: return 0
+    f = open(nc_file, 'rb')
+    data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    try:
+        m = blank_line_pattern.search(data)
+        if m == None: return len(data)
+        return m.start()
+    finally:
+        data.close()
+        f.close()
+
+def skip_lines(f, n, end):
+    # reads n lines, or up to end, and returns the offset after them
+    for i in range(0, n):
+        if f.tell() >= end: break
+        f.readline()
+    return min(f.tell(), end)
+
+def find_split(f, offset, end):
+    # returns the start of the line after a good place to split, at or after offset
+    f.seek(offset)
+    if offset > 0: f.readline() # go to the start of the next line
+    first = f.tell()
+    for i in range(0, anchor_search_lines):
+        if f.tell() >= end: break
+        line = f.readline()
+        if anchor_pattern.search(line) and anchor_axes_pattern.match(line):
+            return f.tell()
+    return min(first, end)
+
+def split_file(nc_file, parts):
+    # returns the offset at the end of the header lines and a list of (warm up, start, end) offsets for each part
+    end = end_of_program(nc_file)
+    f = open(nc_file, 'rb')
+    try:
+        header_end = skip_lines(f, header_lines, end)
+        starts = [0]
+        for i in range(1, parts):
+            start = find_split(f, max(header_end, end * i / parts), end)
+            if start > starts[-1] and start < end: starts.append(start)
+        ranges = []
+        for i in range(0, len(starts)):
+            start = starts[i]
+            if i + 1 < len(starts): part_end = starts[i + 1]
+            else: part_end = end
+            warm_up = start
+            if start > header_end:
+                warm_up = find_warm_up(f, max(header_end, start - 200 * warm_up_lines), start)
+            ranges.append((warm_up, start, part_end))
+        return header_end, ranges
+    finally:
+        f.close()
+
+def find_warm_up(f, search_from, start):
+    # returns the offset warm_up_lines lines before start, or search_from if that is nearer
+    f.seek(search_from)
+    if search_from > 0: f.readline()
+    line_starts = []
+    while f.tell() < start:
+        line_starts.append(f.tell())
+        f.readline()
+    if len(line_starts) == 0: return start
+    return line_starts[max(0, len(line_starts) - warm_up_lines)]
+
+def get_state(obj):
+    # the modal state of a parser or writer, everything but files, patterns and other objects
+    state = {}
+    for name, value in obj.__dict__.items():
+        if value == None or isinstance(value, (bool, int, long, float, str, unicode)):
+            state[name] = value
+    return state
+
+def set_state(obj, state):
+    for name, value in state.items():
+        setattr(obj, name, value)
+
+def parse_lines(parser, end):
+    while parser.file_in.tell() < end and parser.readline():
+        parser.ParseLine()
+
+def parse_part(args):
+    # parses one part to part_file, returns the states before and after it and where its output is in part_file
+    reader, nc_file, header_end, warm_up, start, end, part_file, start_state = args
+    machine_module = __import__('nc.' + reader, fromlist = ['dummy'])
+    writer = HxmlWriter(part_file)
+    parser = machine_module.Parser(writer)
+    parser.file_in = open(nc_file, 'rb') # binary, so that tell() and seek() use the offsets found by split_file
+    parser.StartParse()
+    if start_state != None:
+        set_state(parser, start_state[0])
+        set_state(writer, start_state[1])
+        parser.file_in.seek(start)
+    elif start > 0:
+        parse_lines(parser, header_end)
+        if parser.file_in.tell() < warm_up: parser.file_in.seek(warm_up)
+        parse_lines(parser, start)
+        if parser.file_in.tell() != start: parser.file_in.seek(start) # header lines overlap the part
+    before = (get_state(parser), get_state(writer))
+    output_start = writer.file_out.tell()
+    parse_lines(parser, end)
+    after = (get_state(parser), get_state(writer))
+    del parser, writer # finishes part_file
+    return (before, after, output_start)
+
+def copy_part(part_file, output_start, writer):
+    # copies the output of a part to writer, leaving out the end of the xml, which every part file has
+    f = open(part_file, 'r')
+    f.seek(output_start)
+    data = ''
+    while True:
+        more = f.read(1048576)
+        if len(more) == 0: break
+        data += more
+        if len(data) > len(footer):
+            writer.write(data[:-len(footer)])
+            data = data[-len(footer):]
+    f.close()
+    if data != footer: raise ValueError('unexpected end of backplot part file: ' + part_file)
+
+def backplot(reader, nc_file, processes = None):
+    # writes backplot.xml for nc_file, the same as backplot.py does with HxmlWriter
+    if processes == None: processes = multiprocessing.cpu_count()
+    header_end, ranges = split_file(nc_file, processes * parts_per_process)
+    part_files = []
+    jobs = []
+    for warm_up, start, end in ranges:
+        handle, part_file = tempfile.mkstemp(suffix = '.xml')
+        os.close(handle)
+        part_files.append(part_file)
+        jobs.append((reader, nc_file, header_end, warm_up, start, end, part_file, None))
+
+    try:
+        if processes > 1 and len(jobs) > 1:
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(parse_part, jobs, 1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = map(parse_part, jobs)
+
+        writer = HxmlWriter()
+        for i in range(0, len(jobs)):
+            if i > 0 and results[i][0] != results[i - 1][1]:
+                # this part didn't start in the same state as the serial parse would have, so parse it again
+                job = jobs[i][:-1] + (results[i - 1][1],)
+                results[i] = parse_part(job)
+            copy_part(part_files[i], results[i][2], writer)
+        del writer # finishes backplot.xml
+    finally:
+        for part_file in part_files:
+            os.remove(part_file)
@@ -12,6 +12,7 @@ class CreatorPrintbot(iso_modal.CreatorIsoModal):
 
     def __init__(self):
         iso_modal.CreatorIsoModal.__init__(self)
+        self.can_do_plane_arcs = False # set_plane writes nothing
 
     def tool_defn(self, id, name='', params=None):
         pass
@@ -0,0 +1,237 @@
+################################################################################
+# simplify.py
+#
+# NC code creator for joining feeds which are in line into one feed, and
+# optionally fitting arcs to them
+#
+# Put it in front of the creator with simplify_begin(), before the moves from
+# ocl_funcs, attach or actp_funcs, and take it away with simplify_end().
+# The feeds are kept until one can't be joined to the ones before it, or until
+# any other command, so only one move is waiting at a time.
+#
+# Arcs in the XZ and YZ planes are written between set_plane() calls, which
+# not every post processor can output; XY arcs are the only ones fitted by default,
+# and arcs in the other planes are only fitted for creators which write them as
+# they are, see writes_plane_arcs().
+
+import math
+import recreator
+import nc
+import iso
+
+simplified = False
+
+PLANE_XY = 0 # the same numbers that set_plane() takes
+PLANE_XZ = 1
+PLANE_YZ = 2
+
+# for each plane, the indexes of its horizontal and vertical coordinates and of the coordinate along its normal
+# the directions of arcs are counter-clockwise when looking down the normal, as for G17, G18 and G19
+plane_axes = {PLANE_XY:(0, 1, 2), PLANE_XZ:(2, 0, 1), PLANE_YZ:(1, 2, 0)}
+
+max_points = 200 # feeds joined into one move at most, so that the time to try each feed stays short
+min_arc_points = 3 # feeds needed for an arc, fewer are left as lines
+
+################################################################################
+class Creator(recreator.Redirector):
+
+    def __init__(self, original, tolerance, arc_planes):
+        recreator.Redirector.__init__(self, original)
+        self.tolerance = tolerance
+        self.arc_planes = arc_planes
+        # positions are kept in the units they are given in
+        self.x = original.x
+        self.y = original.y
+        self.z = original.z
+        self.start = None # the position the feeds in self.points start from
+        self.points = []
+        self.fitted_arc = None # (plane, ccw, cu, cv) while the points fit an arc, but not a line
+        self.plane = PLANE_XY
+
+    ############################################################################
+    ##  Fitting
+
+    def in_line(self, points):
+        # whether all the points are within tolerance of the line from self.start to the last of them
+        sx, sy, sz = self.start
+        ex, ey, ez = points[-1]
+        dx = ex - sx
+        dy = ey - sy
+        dz = ez - sz
+        length2 = float(dx * dx + dy * dy + dz * dz) # the positions may be given as ints
+        tolerance2 = self.tolerance * self.tolerance
+        for x, y, z in points[:-1]:
+            px = x - sx
+            py = y - sy
+            pz = z - sz
+            t = 0.0
+            if length2 > 0.0: t = (px * dx + py * dy + pz * dz) / length2
+            if t < 0.0: t = 0.0
+            elif t > 1.0: t = 1.0
+            px -= dx * t
+            py -= dy * t
+            pz -= dz * t
+            if px * px + py * py + pz * pz > tolerance2: return False
+        return True
+
+    def fit_arc(self, points, plane):
+        # returns (plane, ccw, cu, cv) for an arc from self.start through all the points, or None
+        u, v, n = plane_axes[plane]
+        s = self.start
+        for p in points:
+            if p[n] != s[n]: return None
+        m = points[len(points) / 2]
+        e = points[-1]
+
+        # the centre of the circle through the start, middle and end points
+        ax = m[u] - s[u]
+        ay = m[v] - s[v]
+        bx = e[u] - s[u]
+        by = e[v] - s[v]
+        d = 2.0 * (ax * by - ay * bx)
+        if math.fabs(d) < 0.000000001: return None
+        a2 = ax * ax + ay * ay
+        b2 = bx * bx + by * by
+        cu = s[u] + (by * a2 - ay * b2) / d
+        cv = s[v] + (ax * b2 - bx * a2) / d
+        r = math.hypot(s[u] - cu, s[v] - cv)
+        ccw = d > 0.0
+
+        # all the points must be on the circle, in order around it, with the lines between them close to it
+        sweep = 0.0
+        prev_angle = math.atan2(s[v] - cv, s[u] - cu)
+        prev = s
+        for p in points:
+            if math.fabs(math.hypot(p[u] - cu, p[v] - cv) - r) > self.tolerance: return None
+            angle = math.atan2(p[v] - cv, p[u] - cu)
+            step = angle - prev_angle
+            if step > math.pi: step -= 2 * math.pi
+            elif step <= -math.pi: step += 2 * math.pi
+            if ccw != (step > 0.0): return None
+            sweep += math.fabs(step)
+            half_chord = math.hypot(p[u] - prev[u], p[v] - prev[v]) * 0.5
+            if half_chord > r or r - math.sqrt(r * r - half_chord * half_chord) > self.tolerance: return None
+            prev_angle = angle
+            prev = p
+        if sweep >= 2 * math.pi: return None
+        return (plane, ccw, cu, cv)
+
+    def add_point(self, p):
+        points = self.points + [p]
+        if len(points) <= max_points:
+            if self.in_line(points):
+                self.points = points
+                self.fitted_arc = None
+                return
+            if len(points) >= min_arc_points:
+                for plane in self.arc_planes:
+                    fitted_arc = self.fit_arc(points, plane)
+                    if fitted_arc != None:
+                        self.points = points
+                        self.fitted_arc = fitted_arc
+                        return
+        self.write_move()
+        self.points = [p]
+
+    def write_move(self):
+        # writes the feeds waiting as one line or arc, from self.start
+        if len(self.points) == 0: return
+        e = self.points[-1]
+        s = self.start
+        x, y, z = e
+        if x == s[0]: x = None
+        if y == s[1]: y = None
+        if z == s[2]: z = None
+        if self.fitted_arc == None:
+            self.original.feed(x, y, z)
+        else:
+            plane, ccw, cu, cv = self.fitted_arc
+            if plane != self.plane:
+                self.original.set_plane(plane)
+                self.plane = plane
+            centre = [None, None, None]
+            u, v, n = plane_axes[plane]
+            centre[u] = cu
+            centre[v] = cv
+            if ccw: self.original.arc_ccw(x, y, z, centre[0], centre[1], centre[2])
+            else: self.original.arc_cw(x, y, z, centre[0], centre[1], centre[2])
+        self.start = e
+        self.points = []
+        self.fitted_arc = None
+
+    def cut_path(self):
+        self.write_move()
+        self.start = None
+        if self.plane != PLANE_XY:
+            self.original.set_plane(PLANE_XY)
+            self.plane = PLANE_XY
+
+    def write(self, s):
+        # the waiting feeds are written first, so they come before the text, and before output is turned off or on
+        self.cut_path()
+        recreator.Redirector.write(self, s)
+
+    def disable_output(self):
+        self.cut_path()
+        recreator.Redirector.disable_output(self)
+
+    def enable_output(self):
+        self.cut_path()
+        recreator.Redirector.enable_output(self)
+
+    ############################################################################
+    ##  Moves
+
+    def rapid(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        self.cut_path()
+        self.original.rapid(x, y, z, a, b, c)
+        if x != None: self.x = x
+        if y != None: self.y = y
+        if z != None: self.z = z
+
+    def feed(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        p = (self.x, self.y, self.z)
+        if x != None: self.x = x
+        if y != None: self.y = y
+        if z != None: self.z = z
+        if None in p or self.x == None or self.y == None or self.z == None or a != None or b != None or c != None:
+            # where the move starts or ends isn't known, or it moves other axes, so it is written as it is
+            self.cut_path()
+            self.original.feed(x, y, z, a, b, c)
+            return
+        if self.start == None: self.start = p
+        self.add_point((self.x, self.y, self.z))
+
+    def arc(self, x=None, y=None, z=None, i=None, j=None, k=None, r=None, ccw = True):
+        self.cut_path()
+        if ccw: self.original.arc_ccw(x, y, z, i, j, k, r)
+        else: self.original.arc_cw(x, y, z, i, j, k, r)
+        if x != None: self.x = x
+        if y != None: self.y = y
+        if z != None: self.z = z
+
+################################################################################
+
+def writes_plane_arcs(creator):
+    # whether the creator writes arcs in the XZ and YZ planes as they are given
+    # iso creators which split arcs into lines or quadrants work the pieces out in the XY plane, so they can't have them
+    if not isinstance(creator, iso.Creator): return False
+    if creator.output_arcs_as_lines or creator.arc_centre_positive or creator.can_do_helical_arcs == False: return False
+    return creator.can_do_plane_arcs
+
+def simplify_begin(tolerance = 0.01, arc_planes = ()):
+    # tolerance is in the units of the program; arc_planes is a list of PLANE_XY, PLANE_XZ and PLANE_YZ to fit arcs in
+    # PLANE_XZ and PLANE_YZ are left out if the creator can't write arcs in them
+    global simplified
+    if simplified == True:
+        simplify_end()
+    if not writes_plane_arcs(nc.creator):
+        arc_planes = [plane for plane in arc_planes if plane == PLANE_XY]
+    nc.creator = Creator(nc.creator, tolerance, arc_planes)
+    simplified = True
+
+def simplify_end():
+    global simplified
+    nc.creator.cut_path()
+    nc.creator = nc.creator.original
+    simplified = False
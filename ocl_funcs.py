@@ -1,14 +1,134 @@
 import ocl
 import math
 from nc.nc import *
-import tempfile
+import os
+import hashlib
+import collections
+import disk_cache
+import worker_processes
+
+# surfaces read by STLSurfFromFile are kept, so that operations on the same surface don't read it again
+# HeeksCNC writes a new stl file for each operation, so they are found by the contents of the file
+stl_cache = collections.OrderedDict() # digest of the file to (surface, estimated bytes), the most recently used last
+stl_digests = {} # (path, modification time, size) to digest of the file
+stl_cache_limit = 256 * 1024 * 1024 # bytes of surfaces kept, the least recently used are removed past this
+stl_cache_bytes = 0
+stl_cache_hits = 0
+stl_cache_misses = 0
+bytes_per_triangle = 200 # estimated memory used by ocl for each triangle
+
+def STLFileDigest(filepath):
+    path = os.path.abspath(filepath)
+    st = os.stat(path)
+    key = (path, st.st_mtime, st.st_size)
+    digest = stl_digests.get(key)
+    if digest == None:
+        h = hashlib.md5()
+        f = open(path, 'rb')
+        while True:
+            data = f.read(1048576)
+            if len(data) == 0: break
+            h.update(data)
+        f.close()
+        digest = h.hexdigest()
+        stl_digests[key] = digest
+    return digest
 
 def STLSurfFromFile(filepath):
+    global stl_cache_bytes, stl_cache_hits, stl_cache_misses
+    digest = STLFileDigest(filepath)
+    if digest in stl_cache:
+        s, size = stl_cache.pop(digest)
+        stl_cache[digest] = (s, size)
+        stl_cache_hits += 1
+        return s
+
     s = ocl.STLSurf()
     ocl.STLReader(filepath, s)
+    stl_cache_misses += 1
+    if hasattr(s, 'size'): size = s.size() * bytes_per_triangle
+    else: size = os.path.getsize(filepath)
+    stl_cache[digest] = (s, size)
+    stl_cache_bytes += size
+    # a surface which is still used elsewhere stays in memory after it is removed, it just won't be found here again
+    while stl_cache_bytes > stl_cache_limit and len(stl_cache) > 1:
+        old_digest, (old_s, old_size) = stl_cache.popitem(last = False)
+        stl_cache_bytes -= old_size
     return s
 
-def cut_path(path, dcf, z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to):
+def STLCacheReport():
+    # a line about the surfaces kept by STLSurfFromFile
+    return '%d surfaces kept, about %.1f MB of %.1f MB, %d reused, %d read' % (len(stl_cache), stl_cache_bytes / 1048576.0, stl_cache_limit / 1048576.0, stl_cache_hits, stl_cache_misses)
+
+def ClearSTLCache():
+    global stl_cache_bytes
+    stl_cache.clear()
+    stl_digests.clear()
+    stl_cache_bytes = 0
+
+# layers of zigzag and waterline calculated at the same time, each in a process of its own
+# set this in the program, for example ocl_funcs.processes = 4; the moves written are the same
+processes = 1
+
+# adaptive sampling of zigzag and attach, set in the program, for example ocl_funcs.chordal_tolerance = 0.01
+# the paths are sampled max_sampling apart, then each gap is halved, down to min_sampling, while the point in the
+# middle of it is further than chordal_tolerance from the straight move across it; None samples every 0.1mm
+chordal_tolerance = None
+max_sampling = 1.0
+min_sampling = 0.02
+
+# drop cutter results of zigzag and waterline are kept in a disk_cache, so posting the same operation again doesn't calculate them again
+# set the size limit in the program, for example ocl_funcs.cl_cache.size_limit = 0 to keep nothing
+cl_cache = disk_cache.DiskCache('cl', 2, 256 * 1024 * 1024)
+
+class CLCache:
+    # the results for one operation, each a list of (x, y, z) or a list of them
+    def __init__(self, *key):
+        self.file_path = cl_cache.file_path(key)
+        self.results = cl_cache.load(self.file_path)
+        self.hit = (self.results != None)
+        if not self.hit: self.results = []
+        self.calculated = False
+        self.index = 0
+
+    def set_results(self, results):
+        # results calculated all at once, rather than one by one with add
+        self.results = results
+        self.calculated = True
+
+    def has_results(self):
+        return self.hit or self.calculated
+
+    def get(self):
+        # the next result from the file or set_results, or None if they are being calculated one by one
+        if not self.has_results(): return None
+        result = self.results[self.index]
+        self.index += 1
+        return result
+
+    def add(self, result):
+        self.results.append(result)
+        return result
+
+    def save(self):
+        if self.hit: return
+        cl_cache.save(self.file_path, self.results)
+
+def ClearCLCache():
+    cl_cache.clear()
+
+def CLCacheReport():
+    return cl_cache.report('toolpath cache')
+
+def ocl_path(lines):
+    # makes an ocl.Path from a list of ((x, y), (x, y)) lines at z = 0
+    path = ocl.Path()
+    for p0, p1 in lines:
+        path.append(ocl.Line(ocl.Point(p0[0], p0[1], 0), ocl.Point(p1[0], p1[1], 0)))
+    return path
+
+def drop_path(path, dcf):
+    # returns the cutter location points along path as a list of (x, y, z)
     dcf.setPath(path)
     dcf.setSampling(0.1) # FIXME: this should be adjustable by the (advanced) user
     dcf.run()
@@ -18,26 +138,155 @@ def cut_path(path, dcf, z1, mat_allowance, mm, units, rapid_to, incremental_rapi
     for p in plist:
         f.addCLPoint(p)
     f.run()
-    plist = f.getCLPoints()
+    return [(p.x, p.y, p.z) for p in f.getCLPoints()]
+
+def filter_points(plist, tolerance):
+   # removes the points of a list of (x, y, z) which are in line with their neighbours
+   f = ocl.LineCLFilter()
+   f.setTolerance(tolerance)
+   for x, y, z in plist:
+      f.addCLPoint(ocl.CLPoint(x, y, z))
+   f.run()
+   return [(p.x, p.y, p.z) for p in f.getCLPoints()]
+
+def span_sampler(span):
+   # gives the length of a line ((x, y), (x, y)) or arc ((x, y), (x, y), (cx, cy), ccw) and a function giving (x, y) at t from 0 to 1
+   p0 = span[0]
+   p1 = span[1]
+   if len(span) == 2:
+      def point(t):
+         if t == 1.0: return p1
+         return (p0[0] + (p1[0] - p0[0]) * t, p0[1] + (p1[1] - p0[1]) * t)
+      return math.hypot(p1[0] - p0[0], p1[1] - p0[1]), point
+   c = span[2]
+   r = math.hypot(p0[0] - c[0], p0[1] - c[1])
+   a0 = math.atan2(p0[1] - c[1], p0[0] - c[0])
+   sweep = math.atan2(p1[1] - c[1], p1[0] - c[0]) - a0
+   if span[3]:
+      if sweep <= 0.0: sweep += 2 * math.pi
+   else:
+      if sweep >= 0.0: sweep -= 2 * math.pi
+   def point(t):
+      if t == 1.0: return p1
+      a = a0 + sweep * t
+      return (c[0] + r * math.cos(a), c[1] + r * math.sin(a))
+   return math.fabs(sweep) * r, point
+
+def drop_points(points, surface, cutter):
+   # the heights of the cutter, dropped from each of a list of (x, y, z) onto surface
+   bdc = ocl.BatchDropCutter()
+   bdc.setSTL(surface)
+   bdc.setCutter(cutter)
+   for x, y, z in points:
+      bdc.appendPoint(ocl.CLPoint(x, y, z))
+   bdc.run()
+   return [p.z for p in bdc.getCLPoints()]
+
+def adaptive_drop_paths(paths, surface, cutter, heights):
+   # returns the cutter location points along each of paths as lists of (x, y, z), sampled as chordal_tolerance says
+   # a path is a list of lines and arcs, as span_sampler takes, joined end to end; heights has the lowest z for each path
+   # the points to try in each round, for all the paths, are dropped together with one batch drop cutter
+   samplers = []
+   points = [] # for each path, a list of [x, y, z, span, t]
+   gaps = [] # for each path, whether each gap between its points is still to be tried
+   for spans in paths:
+      path_samplers = [span_sampler(span) for span in spans]
+      samplers.append(path_samplers)
+      path_points = []
+      if len(spans) > 0:
+         x, y = spans[0][0]
+         path_points.append([x, y, None, 0, 0.0])
+      for s in range(0, len(spans)):
+         length, point = path_samplers[s]
+         n = max(1, int(math.ceil(length / max_sampling)))
+         for i in range(1, n + 1):
+            t = float(i) / n
+            x, y = point(t)
+            path_points.append([x, y, None, s, t])
+      points.append(path_points)
+      gaps.append([True] * max(0, len(path_points) - 1))
+
+   drop = []
+   for i in range(0, len(points)):
+      for p in points[i]: drop.append((p[0], p[1], heights[i]))
+   zs = drop_points(drop, surface, cutter)
+   n = 0
+   for path_points in points:
+      for p in path_points:
+         p[2] = zs[n]
+         n = n + 1
+
+   while True:
+      tries = [] # (path, gap, [x, y, z, span, t])
+      for i in range(0, len(points)):
+         path_points = points[i]
+         for g in range(0, len(gaps[i])):
+            if not gaps[i][g]: continue
+            s0, t0 = path_points[g][3:5]
+            s, t1 = path_points[g + 1][3:5]
+            if s0 != s: t0 = 0.0
+            length, point = samplers[i][s]
+            if length * (t1 - t0) < 2 * min_sampling:
+               gaps[i][g] = False
+               continue
+            t = (t0 + t1) * 0.5
+            x, y = point(t)
+            tries.append((i, g, [x, y, heights[i], s, t]))
+      if len(tries) == 0: break
+      zs = drop_points([tuple(p[0:3]) for i, g, p in tries], surface, cutter)
+
+      split = {} # (path, gap) to the point in the middle of the gap, for the gaps to be halved
+      for n in range(0, len(tries)):
+         i, g, p = tries[n]
+         p[2] = zs[n]
+         a = points[i][g]
+         b = points[i][g + 1]
+         dx = p[0] - (a[0] + b[0]) * 0.5
+         dy = p[1] - (a[1] + b[1]) * 0.5
+         dz = p[2] - (a[2] + b[2]) * 0.5
+         if dx * dx + dy * dy + dz * dz > chordal_tolerance * chordal_tolerance: split[(i, g)] = p
+         else: gaps[i][g] = False
+
+      for i in range(0, len(points)):
+         path_points = [points[i][0]]
+         path_gaps = []
+         for g in range(0, len(gaps[i])):
+            p = split.get((i, g))
+            if p != None:
+               path_points.append(p)
+               path_gaps.append(True)
+               path_gaps.append(True)
+            else:
+               path_gaps.append(gaps[i][g])
+            path_points.append(points[i][g + 1])
+         points[i] = path_points
+         gaps[i] = path_gaps
+
+   return [[(p[0], p[1], p[2]) for p in path_points] for path_points in points]
+
+def cut_path(path, dcf, z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to):
+    cut_points(drop_path(path, dcf), z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to)
+
+def cut_points(plist, z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to):
     n = 0
-    for p in plist:
-       p.z = p.z + mat_allowance
+    for x, y, z in plist:
+       z = z + mat_allowance
        if n == 0:
-          if mm: rapid(p.x, p.y)
-          else: rapid(p.x / units, p.y / units)
+          if mm: rapid(x, y)
+          else: rapid(x / units, y / units)
           rz = rapid_to
-          if p.z > z1: rz = p.z + incremental_rapid_to
+          if z > z1: rz = z + incremental_rapid_to
           if mm:
              rapid(z = rz)
-             feed(z = p.z)
+             feed(z = z)
           else:
              rapid(z = rz / units)
-             feed(z = p.z / units)
+             feed(z = z / units)
        else:
           if mm:
-             feed(p.x, p.y, p.z)
+             feed(x, y, z)
           else:
-             feed(p.x / units, p.y / units, p.z / units)
+             feed(x / units, y / units, z / units)
        n = n + 1
        
 def zigzag( filepath, tool_diameter = 3.0, corner_radius = 0.0, step_over = 1.0, x0= -10.0, x1 = 10.0, y0 = -10.0, y1 = 10.0, direction = 'X', mat_allowance = 0.0, style = 0, clearance = 5.0, rapid_safety_space = 2.0, start_depth = 0.0, step_down = 2.0, final_depth = -10.0, units = 1.0):
@@ -58,15 +307,8 @@ def zigzag( filepath, tool_diameter = 3.0, corner_radius = 0.0, step_over = 1.0,
       start_depth *= units
       step_down *= units
       final_depth *= units
-      # read the stl file, we know it is an ascii file because HeeksCNC made it
-      s = STLSurfFromFile(filepath)
-   cutter = ocl.CylCutter(1.0,1.0) # a dummy-cutter for now
-   if corner_radius == 0.0:
-      cutter = ocl.CylCutter(tool_diameter + mat_allowance, 100.0)
-   elif corner_radius > tool_diameter / 2 - 0.000000001:
-      cutter = ocl.BallCutter(tool_diameter + mat_allowance, 100.0)
-   else:
-      cutter = ocl.BullCutter(tool_diameter + mat_allowance, corner_radius, 100.0)
+   cache = CLCache('zigzag', STLFileDigest(filepath), tool_diameter, corner_radius, step_over, x0, x1, y0, y1, direction, mat_allowance, style, start_depth, step_down, final_depth, chordal_tolerance, max_sampling, min_sampling)
+   cutter = zigzag_cutter(tool_diameter, corner_radius, mat_allowance)
    if final_depth > start_depth:
       raise Exception('final_depth > start_depth')
    height = start_depth - final_depth
@@ -74,56 +316,117 @@ def zigzag( filepath, tool_diameter = 3.0, corner_radius = 0.0, step_over = 1.0,
    zstep_down = height / zsteps
    incremental_rapid_to = rapid_safety_space - start_depth
    if incremental_rapid_to < 0: incremental_rapid_to = 0.1
-   dcf = ocl.PathDropCutter()
-   dcf.setSTL(s)
-   dcf.setCutter(cutter)
+   paths = zigzag_paths(x0, x1, y0, y1, step_over, direction, style)
+   if not cache.hit and processes > 1:
+      jobs = []
+      for k in range(0, zsteps):
+         jobs.append((filepath, tool_diameter, corner_radius, mat_allowance, start_depth - (k + 1) * zstep_down, paths))
+      results = []
+      for layer in worker_processes.map_jobs(zigzag_layer, jobs, processes): results += layer
+      cache.set_results(results)
+   s = None
+   dcf = None
+   if not cache.has_results():
+      # read the stl file, we know it is an ascii file because HeeksCNC made it
+      s = STLSurfFromFile(filepath)
+      if chordal_tolerance == None:
+         dcf = ocl.PathDropCutter()
+         dcf.setSTL(s)
+         dcf.setCutter(cutter)
    for k in range(0, zsteps):
       z1 = start_depth - k * zstep_down
       z0 = start_depth - (k + 1) * zstep_down
-      dcf.setZ(z0)
-      steps = int((y1 - y0)/step_over) + 1
-      if direction == 'Y': steps = int((x1 - x0)/step_over) + 1
-      sub_step_over = (y1 - y0)/ steps
-      if direction == 'Y': sub_step_over = (x1 - x0)/ steps
+      if dcf != None: dcf.setZ(z0)
+      layer = None
+      if s != None and dcf == None: layer = adaptive_layer(paths, s, cutter, z0)
       rapid_to = z1 + incremental_rapid_to
-      path = ocl.Path()
-      for i in range(0, steps + 1):
-         odd_numbered_pass = (i%2 == 1)
-         u = y0 + float(i) * sub_step_over
-         if direction == 'Y': u = x0 + float(i) * sub_step_over
-         if style == 0: # one way
-            if direction == 'Y': path.append(ocl.Line(ocl.Point(u, y0, 0), ocl.Point(u, y1, 0)))
-            else: path.append(ocl.Line(ocl.Point(x0, u, 0), ocl.Point(x1, u, 0)))
-            cut_path(path, dcf, z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to)
-            path = ocl.Path()
-            if mm:
-               rapid(z = clearance)
-            else:
-               rapid(z = clearance / units)
-               
-         else: # back and forth
-            if direction == 'Y':
-               if odd_numbered_pass:
-                  path.append(ocl.Line(ocl.Point(u, y1, 0), ocl.Point(u, y0, 0)))
-                  if i < steps: path.append(ocl.Line(ocl.Point(u, y0, 0), ocl.Point(u + sub_step_over, y0, 0))) # feed across to next pass
-               else:
-                  path.append(ocl.Line(ocl.Point(u, y0, 0), ocl.Point(u, y1, 0)))
-                  if i < steps: path.append(ocl.Line(ocl.Point(u, y1, 0), ocl.Point(u + sub_step_over, y1, 0))) # feed across to next pass
-            else: # 'X'
-               if odd_numbered_pass:
-                  path.append(ocl.Line(ocl.Point(x1, u, 0), ocl.Point(x0, u, 0)))
-                  if i < steps: path.append(ocl.Line(ocl.Point(x0, u, 0), ocl.Point(x0, u + sub_step_over, 0))) # feed across to next pass
-               else:
-                  path.append(ocl.Line(ocl.Point(x0, u, 0), ocl.Point(x1, u, 0)))
-                  if i < steps: path.append(ocl.Line(ocl.Point(x1, u, 0), ocl.Point(x1, u + sub_step_over, 0))) # feed across to next pass
-
-      if style != 0: # back and forth
-         cut_path(path, dcf, z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to)
+      for n in range(0, len(paths)):
+         plist = cache.get()
+         if plist == None:
+            if layer != None: plist = cache.add(layer[n])
+            else: plist = cache.add(drop_path(ocl_path(paths[n]), dcf))
+         cut_points(plist, z1, mat_allowance, mm, units, rapid_to, incremental_rapid_to)
          if mm:
             rapid(z = clearance)
          else:
             rapid(z = clearance / units)
 
+   cache.save()
+   print(CLCacheReport())
+   print(STLCacheReport())
+
+def zigzag_cutter(tool_diameter, corner_radius, mat_allowance):
+   cutter = ocl.CylCutter(1.0,1.0) # a dummy-cutter for now
+   if corner_radius == 0.0:
+      cutter = ocl.CylCutter(tool_diameter + mat_allowance, 100.0)
+   elif corner_radius > tool_diameter / 2 - 0.000000001:
+      cutter = ocl.BallCutter(tool_diameter + mat_allowance, 100.0)
+   else:
+      cutter = ocl.BullCutter(tool_diameter + mat_allowance, corner_radius, 100.0)
+   return cutter
+
+def zigzag_paths(x0, x1, y0, y1, step_over, direction, style):
+   # the passes of one layer, as lists of ((x, y), (x, y)) lines, each of which is cut then followed by a rapid up
+   # one way makes a list for each pass, back and forth makes one list joining all the passes
+   paths = []
+   steps = int((y1 - y0)/step_over) + 1
+   if direction == 'Y': steps = int((x1 - x0)/step_over) + 1
+   sub_step_over = (y1 - y0)/ steps
+   if direction == 'Y': sub_step_over = (x1 - x0)/ steps
+   lines = []
+   for i in range(0, steps + 1):
+      odd_numbered_pass = (i%2 == 1)
+      u = y0 + float(i) * sub_step_over
+      if direction == 'Y': u = x0 + float(i) * sub_step_over
+      if style == 0: # one way
+         if direction == 'Y': paths.append([((u, y0), (u, y1))])
+         else: paths.append([((x0, u), (x1, u))])
+
+      else: # back and forth
+         if direction == 'Y':
+            if odd_numbered_pass:
+               lines.append(((u, y1), (u, y0)))
+               if i < steps: lines.append(((u, y0), (u + sub_step_over, y0))) # feed across to next pass
+            else:
+               lines.append(((u, y0), (u, y1)))
+               if i < steps: lines.append(((u, y1), (u + sub_step_over, y1))) # feed across to next pass
+         else: # 'X'
+            if odd_numbered_pass:
+               lines.append(((x1, u), (x0, u)))
+               if i < steps: lines.append(((x0, u), (x0, u + sub_step_over))) # feed across to next pass
+            else:
+               lines.append(((x0, u), (x1, u)))
+               if i < steps: lines.append(((x1, u), (x1, u + sub_step_over))) # feed across to next pass
+
+   if style != 0: paths.append(lines)
+   return paths
+
+def zigzag_layer(job):
+   # the drop cutter results for each path of one layer of zigzag, for map_jobs
+   filepath, tool_diameter, corner_radius, mat_allowance, z, paths = job
+   s = STLSurfFromFile(filepath)
+   cutter = zigzag_cutter(tool_diameter, corner_radius, mat_allowance)
+   if chordal_tolerance != None: return adaptive_layer(paths, s, cutter, z)
+   dcf = ocl.PathDropCutter()
+   dcf.setSTL(s)
+   dcf.setCutter(cutter)
+   dcf.setZ(z)
+   return [drop_path(ocl_path(lines), dcf) for lines in paths]
+
+def adaptive_layer(paths, s, cutter, z):
+   # the adaptively sampled points for each path of one layer of zigzag, filtered like drop_path does
+   return [filter_points(plist, 0.01) for plist in adaptive_drop_paths(paths, s, cutter, [z] * len(paths))]
+
+def waterline_layer(job):
+   # the loops of one layer of waterline, as lists of (x, y, z), for map_jobs
+   filepath, working_diameter, corner_radius, tolerance, z = job
+   waterline = ocl.Waterline()
+   waterline.setSTL(STLSurfFromFile(filepath))
+   waterline.setSampling(tolerance)
+   waterline.setCutter(cutting_tool(working_diameter, corner_radius, 10))
+   waterline.setZ(z)
+   waterline.run()
+   return [[(p.x, p.y, p.z) for p in loop] for loop in waterline.getLoops()]
 
 def cutting_tool( diameter, corner_radius, length ):
    cutter = ocl.CylCutter(1.0, length) # dummy cutter
@@ -157,14 +460,22 @@ def waterline( filepath, tool_diameter = 3.0, corner_radius = 0.0, step_over = 1
       final_depth *= units
       tolerance *= units
 
-   # read the stl file, we know it is an ascii file because HeeksCNC made it
-   s = STLSurfFromFile(filepath)
+   cache = CLCache('waterline', STLFileDigest(filepath), tool_diameter, corner_radius, step_over, x0, x1, y0, y1, mat_allowance, start_depth, step_down, final_depth, tolerance)
 
    if final_depth > start_depth:
       raise Exception('final_depth > start_depth')
    height = start_depth - final_depth
    zsteps = int( height / math.fabs(step_down) + 0.999999 )
    zstep_down = height / zsteps
+
+   if not cache.hit and processes > 1:
+      jobs = []
+      for k in range(0, zsteps):
+         jobs.append((filepath, tool_diameter + mat_allowance, corner_radius, tolerance, start_depth - k * zstep_down))
+      cache.set_results(worker_processes.map_jobs(waterline_layer, jobs, processes))
+   if not cache.has_results():
+      # read the stl file, we know it is an ascii file because HeeksCNC made it
+      s = STLSurfFromFile(filepath)
    incremental_rapid_to = rapid_safety_space - start_depth
    if incremental_rapid_to < 0: incremental_rapid_to = 0.1
 
@@ -178,13 +489,16 @@ def waterline( filepath, tool_diameter = 3.0, corner_radius = 0.0, step_over = 1
       # while (room_to_expand == True):
       cutter = cutting_tool(working_diameter, corner_radius, 10)
 
-      waterline = ocl.Waterline()
-      waterline.setSTL(s)
-      waterline.setSampling(tolerance)
-      waterline.setCutter(cutter)
-      waterline.setZ(z)
-      waterline.run()
-      cutter_loops = waterline.getLoops()
+      loops = cache.get()
+      if loops == None:
+         waterline = ocl.Waterline()
+         waterline.setSTL(s)
+         waterline.setSampling(tolerance)
+         waterline.setCutter(cutter)
+         waterline.setZ(z)
+         waterline.run()
+         loops = cache.add([[(p.x, p.y, p.z) for p in loop] for loop in waterline.getLoops()])
+      cutter_loops = [[ocl.Point(px, py, pz) for px, py, pz in loop] for loop in loops]
 
       for cutter_loop in cutter_loops:
          if ((cutter_loop[0].z != tool_location.z) or (tool_location.distance(cutter_loop[0]) > (tool_diameter / 2.0))):
@@ -212,3 +526,7 @@ def waterline( filepath, tool_diameter = 3.0, corner_radius = 0.0, step_over = 1
          tool_location.z = clearance / units
 
          #working_diameter += step_over
+
+   cache.save()
+   print(CLCacheReport())
+   print(STLCacheReport())
@@ -0,0 +1,125 @@
+# times attach finding the surface heights of the plunges and retracts of an engraving-like program, each with a path
+# drop cutter on a path of one point, as attach used to, against all of them together with one batch drop cutter,
+# on a generated stl file of a dome, and checks that the moves written are the same
+# run with python 2 from the HeeksCNC folder, with the ocl module HeeksCNC uses on the path:
+#     python test/attach_bench.py [number of letters]
+
+import sys
+import os
+import math
+import time
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+try:
+    import ocl
+except ImportError:
+    print 'ocl can not be imported, so there is nothing to time'
+    sys.exit(0)
+import nc.nc
+nc.nc.nc = nc.nc # recreator's "from nc import *" takes the name nc from nc.nc, as it does in the programs HeeksCNC runs
+import nc.attach as attach
+import nc.recreator as recreator
+
+class Recorder:
+    # keeps the moves it is given
+    def __init__(self):
+        self.x = None
+        self.y = None
+        self.z = None
+        self.moves = []
+
+    def rapid(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        self.moves.append(('rapid', x, y, z))
+
+    def feed(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        self.moves.append(('feed', x, y, z))
+
+class PerPointCreator(attach.Creator):
+    # writes each z only feed as it comes, at the height z2 finds for it on its own
+    def feed(self, x=None, y=None, z=None, a=None, b=None, c=None):
+        if x == None and y == None and z != None and self.x != None and self.y != None and self.z != None:
+            self.z = z * recreator.units
+            self.cut_path()
+            self.original.feed(self.x / attach.units, self.y / attach.units, self.z2(self.z) / attach.units)
+            return
+        attach.Creator.feed(self, x, y, z, a, b, c)
+
+def write_dome(path, radius, height, cells):
+    # an ascii stl file of a dome over a square, in cells by cells squares of two triangles each
+    def z(x, y):
+        return height * max(0.0, 1 - (x * x + y * y) / (radius * radius))
+    f = open(path, 'w')
+    f.write('solid dome\n')
+    step = 2.0 * radius / cells
+    for i in range(0, cells):
+        for j in range(0, cells):
+            x0 = -radius + i * step
+            y0 = -radius + j * step
+            x1 = x0 + step
+            y1 = y0 + step
+            for triangle in (((x0, y0), (x1, y0), (x1, y1)), ((x0, y0), (x1, y1), (x0, y1))):
+                f.write('facet normal 0 0 1\nouter loop\n')
+                for x, y in triangle: f.write('vertex %f %f %f\n' % (x, y, z(x, y)))
+                f.write('endloop\nendfacet\n')
+    f.write('endsolid dome\n')
+    f.close()
+
+def engrave(creator, letters):
+    # a short stroke for each letter, going down to cut it and up again after
+    for n in range(0, letters):
+        x = -40 + (n % 40) * 2.0
+        y = -40 + (n / 40 % 40) * 2.0
+        creator.rapid(x, y, 5)
+        creator.feed(z = -0.2)
+        creator.feed(x + 0.5, y + 0.8)
+        creator.feed(x + 1.0, y)
+        creator.feed(z = 1)
+        creator.feed(z = -0.2)
+        creator.feed(x + 0.25, y + 0.4)
+        creator.feed(z = 1)
+    creator.cut_path()
+
+def run(creator_class, surface, cutter, letters):
+    original = Recorder()
+    creator = creator_class(original)
+    creator.stl = surface
+    creator.set_ocl_cutter(cutter)
+    creator.minz = -10000.0
+    creator.material_allowance = 0.0
+    start = time.time()
+    engrave(creator, letters)
+    return original.moves, time.time() - start
+
+letters = 2000
+if len(sys.argv) > 1: letters = int(sys.argv[1])
+
+fd, stl_path = tempfile.mkstemp('.stl')
+os.close(fd)
+write_dome(stl_path, 50.0, 20.0, 100)
+surface = ocl.STLSurf()
+ocl.STLReader(stl_path, surface)
+os.remove(stl_path)
+cutter = ocl.BallCutter(1.0, 10.0)
+
+failures = 0
+per_point_moves, per_point_time = run(PerPointCreator, surface, cutter, letters)
+batch_moves, batch_time = run(attach.Creator, surface, cutter, letters)
+print '%d letters, %d plunges and retracts' % (letters, letters * 4)
+print 'per point %8.3fs' % per_point_time
+print 'batch     %8.3fs  %.1f times faster' % (batch_time, per_point_time / batch_time)
+
+worst = 0.0
+if len(batch_moves) != len(per_point_moves) or [m[0] for m in batch_moves] != [m[0] for m in per_point_moves]:
+    failures += 1
+    print 'the moves are DIFFERENT'
+else:
+    for m0, m1 in zip(per_point_moves, batch_moves):
+        for v0, v1 in zip(m0[1:], m1[1:]):
+            if (v0 == None) != (v1 == None): worst = float('inf')
+            elif v0 != None: worst = max(worst, math.fabs(v0 - v1))
+    print 'the furthest apart the moves are is %g' % worst
+    if worst > 0.000001:
+        failures += 1
+
+print '%d failures' % failures
+if failures: sys.exit(1)
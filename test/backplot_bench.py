@@ -0,0 +1,103 @@
+# reads a generated iso program with iso_read into the xml backplot file, as hxml_writer writes it, and into the binary
+# one, as hbin_writer writes it, and prints the size of each file and how long it took; checks that both have every move
+# then times each writer on its own, given the calls iso_read made to it again
+# run with python 2 from the HeeksCNC folder, with the area module HeeksCNC uses on the path:
+#     python test/backplot_bench.py [number of lines]
+
+import sys
+import os
+import math
+import time
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nc'))
+import iso_read
+import hbin_writer
+from hxml_writer import HxmlWriter
+from hbin_writer import HbinWriter
+
+def program(num_lines):
+    # moves and arcs like a post processor writes, with a comment now and then
+    lines = ['%', 'O0001', '(PROGRAM MADE FOR TIMING)', 'G21 G90 G17', 'T1 M06', 'S5000 M03', 'G0 X0. Y0. Z5.']
+    for i in range(0, num_lines):
+        a = i * 0.01
+        x = 50 * math.cos(a)
+        y = 50 * math.sin(a)
+        if i % 500 == 0: lines.append('(PASS %d)' % (i / 500))
+        elif i % 20 == 0: lines.append('G3 X%.3f Y%.3f I%.3f J%.3f' % (x, y, -x / 2, -y / 2))
+        elif i % 20 == 1: lines.append('G1 X%.3f Y%.3f' % (x, y))
+        elif i % 7 == 0: lines.append('N%d G1 X%.3f Y%.3f Z-%.3f F200.' % (i, x, y, (i % 13) * 0.1))
+        else: lines.append('X%.3f Y%.3f' % (x, y))
+    lines.append('M30')
+    return lines
+
+class Recorder:
+    # keeps the calls the parser makes to its writer
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name.startswith('__'): raise AttributeError(name)
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+def xml_moves(path):
+    moves = 0
+    f = open(path)
+    for line in f:
+        if line.startswith('\t\t\t<line') or line.startswith('\t\t\t<arc'): moves += 1
+    f.close()
+    return moves
+
+def binary_moves(path):
+    offset, moves, blocks = hbin_writer.read_index(path)[-1]
+    return moves
+
+num_lines = 200000
+if len(sys.argv) > 1: num_lines = int(sys.argv[1])
+
+fd, nc_path = tempfile.mkstemp('.nc')
+f = os.fdopen(fd, 'w')
+f.write('\n'.join(program(num_lines)) + '\n')
+f.close()
+nc_mb = os.path.getsize(nc_path) / 1048576.0
+print '%d lines, %.1f MB of nc code' % (num_lines, nc_mb)
+
+failures = 0
+results = []
+for name, writer_class, suffix, count_moves in (('xml', HxmlWriter, '.xml', xml_moves), ('binary', HbinWriter, '.hbp', binary_moves)):
+    fd, path = tempfile.mkstemp(suffix)
+    os.close(fd)
+    start = time.time()
+    parser = iso_read.Parser(writer_class(path))
+    parser.Parse(nc_path)
+    del parser # the writers finish their files when deleted
+    t = time.time() - start
+    size = os.path.getsize(path) / 1048576.0
+    print '%-7s %8.1f MB %8.3fs  %6.2f MB of nc code a second' % (name, size, t, nc_mb / t)
+    results.append((size, t, count_moves(path)))
+    os.remove(path)
+
+print 'binary is %.1f times smaller and %.2f times faster' % (results[0][0] / results[1][0], results[0][1] / results[1][1])
+
+recorder = Recorder()
+iso_read.Parser(recorder).Parse(nc_path)
+os.remove(nc_path)
+times = []
+for name, writer_class, suffix in (('xml', HxmlWriter, '.xml'), ('binary', HbinWriter, '.hbp')):
+    fd, path = tempfile.mkstemp(suffix)
+    os.close(fd)
+    start = time.time()
+    writer = writer_class(path)
+    for method, args, kwargs in recorder.calls: getattr(writer, method)(*args, **kwargs)
+    del writer
+    t = time.time() - start
+    size = os.path.getsize(path) / 1048576.0
+    print '%-7s writer only %8.3fs  %6.2f MB written a second, %d calls' % (name, t, size / t, len(recorder.calls))
+    times.append(t)
+    os.remove(path)
+print 'the binary writer is %.2f times faster' % (times[0] / times[1])
+if results[0][2] != results[1][2]:
+    failures += 1
+    print 'the xml file has %d moves, the binary one %d' % (results[0][2], results[1][2])
+
+print '%d failures' % failures
+if failures: sys.exit(1)
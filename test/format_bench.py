@@ -0,0 +1,34 @@
+# times Format.string against Format.string_exact, for coordinates which are all different and for ones which repeat,
+# with the default settings, which the coordinates use, and with two others which the fast path has to build the text for
+# run with python 2 from the HeeksCNC folder:
+#     python test/format_bench.py
+
+import sys
+import os
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nc'))
+from format import Format
+
+def timed(functions, numbers, clear):
+    # the best of seven runs of each function, taking turns so that they all see the same load on the machine,
+    # each run starting with an empty cache
+    best = [None] * len(functions)
+    for i in range(0, 7):
+        for k in range(0, len(functions)):
+            clear()
+            start = time.time()
+            for number in numbers: functions[k](number)
+            t = time.time() - start
+            if best[k] == None or t < best[k]: best[k] = t
+    return best
+
+random.seed(0)
+different = [random.uniform(-200, 200) for i in range(0, 200000)]
+repeated = [random.choice([100.0, 0.0, 5.0, -1.5, 12.7, -0.25]) for i in range(0, 200000)]
+
+for name, fmt in (('default', Format()), ('+, trailing zeros', Format(add_plus = True, add_trailing_zeros = True)),
+    ('no decimal point', Format(number_of_decimal_places = 4, dp_wanted = False, add_trailing_zeros = True))):
+    for numbers_name, numbers in (('different', different), ('repeated', repeated)):
+        exact_time, string_time = timed([fmt.string_exact, fmt.string], numbers, fmt.compile)
+        print '%-18s %-10s string_exact %6.3fs  string %6.3fs  %5.1f times faster' % (name, numbers_name, exact_time, string_time, exact_time / string_time)
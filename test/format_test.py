@@ -0,0 +1,61 @@
+# checks that Format.string makes the same text as Format.string_exact, and that Format.same agrees with comparing
+# the text, for random settings and numbers, including settings changed after the Format is made
+# run with python 2 from the HeeksCNC folder:
+#     python test/format_test.py [seed]
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nc'))
+from format import Format
+
+def random_format():
+    fmt = Format(number_of_decimal_places = random.choice([0, 1, 2, 3, 4, 5]), add_leading_zeros = random.choice([0, 1, 3, 5]),
+        add_trailing_zeros = random.random() < 0.5, dp_wanted = random.random() < 0.5, add_plus = random.random() < 0.5,
+        no_minus = random.random() < 0.5, round_down = random.random() < 0.5)
+    if random.random() < 0.3:
+        # as the post processors do in metric() and imperial()
+        fmt.number_of_decimal_places = random.choice([0, 2, 3, 4])
+    return fmt
+
+def random_number():
+    k = random.random()
+    if k < 0.3: return random.uniform(-1000, 1000)
+    if k < 0.5: return round(random.uniform(-100, 100), random.choice([0, 1, 2, 3, 4]))
+    if k < 0.6: return random.choice([0, 0.0, -0.0, 0.0005, -0.0005, 0.00049999, 1.0005, -2.5, 2.5, 0.05, -0.05, 1e-7, -1e-7, 99.9995])
+    if k < 0.7: return random.randint(-100000, 100000)
+    if k < 0.8: return random.uniform(-1e12, 1e12)
+    if k < 0.9: return str(round(random.uniform(-50, 50), 3))
+    return random.uniform(-1, 1) * 10 ** random.randint(-8, 14)
+
+def near_number(a):
+    # a number which may or may not give the same text as a
+    k = random.random()
+    if k < 0.3: return a
+    if k < 0.6: return float(a) + random.uniform(-1, 1) * 10 ** -random.randint(0, 6)
+    if k < 0.7: return -float(a)
+    if k < 0.8: return float(a) * 10
+    if k < 0.9: return None
+    return random.uniform(-100, 100)
+
+if len(sys.argv) > 1: random.seed(int(sys.argv[1]))
+else: random.seed(0)
+
+failures = 0
+for trial in range(0, 400):
+    fmt = random_format()
+    for i in range(0, 2000):
+        a = random_number()
+        for repeat in range(0, 2): # the second time comes from the cache
+            s = fmt.string(a)
+            exact = fmt.string_exact(a)
+            if s != exact:
+                failures += 1
+                if failures <= 10: print 'string(%r) gave %r, string_exact gave %r, with %r' % (a, s, exact, fmt.__dict__)
+        b = near_number(a)
+        if fmt.same(a, b) != (fmt.string(a) == fmt.string(b)):
+            failures += 1
+            if failures <= 10: print 'same(%r, %r) gave %r, with %r' % (a, b, fmt.same(a, b), fmt.__dict__)
+
+print '%d failures' % failures
+if failures: sys.exit(1)
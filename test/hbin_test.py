@@ -0,0 +1,160 @@
+# writes random blocks of text, tool changes, lines and arcs with hbin_writer, with an INDEX record every few moves,
+# reads them back from the start and from every INDEX record that read_index finds from the trailer, and checks that
+# they are what was written, that the INDEX and END records count the moves and blocks before them, and that a file
+# without its trailer is found to be truncated
+# run with python 2 from the HeeksCNC folder:
+#     python test/hbin_test.py [seed]
+
+import sys
+import os
+import random
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nc'))
+import hbin_writer
+
+def random_value():
+    if random.random() < 0.3: return None
+    return random.uniform(-1000, 1000)
+
+class Program:
+    # writes random blocks, keeping the records read_records should give back for them
+    # INDEX and END records are kept as (type, (moves, blocks)), as the offsets aren't known until the file is read
+    def __init__(self, writer, index_interval):
+        self.writer = writer
+        self.index_interval = index_interval
+        self.records = []
+        self.moves = 0
+        self.blocks = 0
+        self.old = {}
+
+    def path(self, col, type, values):
+        self.records.append((hbin_writer.PATH_BEGIN, col))
+        self.records.append((type, values))
+        self.moves += 1
+        if self.moves % self.index_interval == 0: self.records.append((hbin_writer.INDEX, (self.moves, self.blocks)))
+        self.records.append((hbin_writer.PATH_END, None))
+        for name in ('x', 'y', 'z'):
+            if name in values: self.old[name] = values[name]
+
+    def line(self):
+        x, y, z, a, b, c = random_value(), random_value(), random_value(), None, None, None
+        if random.random() < 0.2: a, b, c = random_value(), random_value(), random_value()
+        values = {}
+        for name, v in zip(hbin_writer.LINE_FIELDS, (x, y, z, a, b, c)):
+            if v != None: values[name] = v
+        if random.random() < 0.5:
+            self.writer.rapid(x, y, z, a, b, c)
+            self.path('rapid', hbin_writer.LINE, values)
+        else:
+            self.writer.feed(x, y, z, a, b, c)
+            self.path('feed', hbin_writer.LINE, values)
+
+    def arc(self):
+        x, y, z, i, j, r = random_value(), random_value(), random_value(), random_value(), random_value(), None
+        if random.random() < 0.2: r = random_value()
+        values = {}
+        for name, v in (('x', x), ('y', y), ('z', z), ('r', r)):
+            if v != None: values[name] = v
+        # i and j are kept relative to the start
+        if i != None: values['i'] = i - self.old['x']
+        if j != None: values['j'] = j - self.old['y']
+        if random.random() < 0.5:
+            self.writer.arc_cw(x, y, z, i, j, None, r)
+            values['d'] = -1
+        else:
+            self.writer.arc_ccw(x, y, z, i, j, None, r)
+            values['d'] = 1
+        self.path('feed', hbin_writer.ARC, values)
+
+    def block(self):
+        self.writer.begin_ncblock()
+        self.records.append((hbin_writer.BLOCK_BEGIN, None))
+        k = random.random()
+        if k < 0.05:
+            if random.random() < 0.5:
+                self.writer.metric()
+                self.records.append((hbin_writer.MODE, 1.0))
+            else:
+                self.writer.imperial()
+                self.records.append((hbin_writer.MODE, 25.4))
+        elif k < 0.1:
+            number = random.choice([None, 1, 2, 17, 100000])
+            self.writer.tool_change(number)
+            self.records.append((hbin_writer.TOOL, number))
+        elif k < 0.3:
+            text = random.choice(['(comment)', 'G1', '', 'X' * 300, u'(caf\xe9)'])
+            col = random.choice([None, 'comment', 'blocknum', 'prep', 'colour%d' % random.randint(0, 9)])
+            cdata = random.random() < 0.5
+            self.writer.add_text(text, col, cdata)
+            if isinstance(text, unicode): text = text.encode('utf-8')
+            self.records.append((hbin_writer.TEXT, (text, col, cdata)))
+        for m in range(0, random.randint(0, 3)):
+            if random.random() < 0.6 or 'x' not in self.old or 'y' not in self.old: self.line()
+            else: self.arc()
+        self.writer.end_ncblock()
+        self.blocks += 1
+        self.records.append((hbin_writer.BLOCK_END, None))
+
+    def close(self):
+        self.writer.close()
+        self.records.append((hbin_writer.END, (self.moves, self.blocks)))
+
+def read(path, offset = None):
+    # the records of the file, with the offsets left out of the INDEX and END records
+    records = []
+    for type, fields in hbin_writer.read_records(path, offset):
+        if type == hbin_writer.INDEX or type == hbin_writer.END: fields = fields[:2]
+        records.append((type, fields))
+    return records
+
+if len(sys.argv) > 1: random.seed(int(sys.argv[1]))
+else: random.seed(0)
+
+failures = 0
+for trial in range(0, 20):
+    fd, path = tempfile.mkstemp('.hbp')
+    os.close(fd)
+    index_interval = random.choice([1, 7, 50, 1000])
+    program = Program(hbin_writer.HbinWriter(path, random.choice([16, 4096, 262144]), index_interval), index_interval)
+    for n in range(0, random.randint(0, 2000)): program.block()
+    program.close()
+
+    records = read(path)
+    if records != program.records:
+        failures += 1
+        for n in range(0, min(len(records), len(program.records))):
+            if records[n] != program.records[n]: break
+        print 'trial %d: record %d read as %r, written as %r' % (trial, n, records[n:n + 1], program.records[n:n + 1])
+
+    # the index, read back from the trailer, has every INDEX record and the END record, each counting what came before it
+    index = hbin_writer.read_index(path)
+    expected = [fields for type, fields in program.records if type == hbin_writer.INDEX or type == hbin_writer.END]
+    if [(moves, blocks) for offset, moves, blocks in index] != expected:
+        failures += 1
+        print 'trial %d: read_index gave %r, not %r' % (trial, [(moves, blocks) for offset, moves, blocks in index][:5], expected[:5])
+    else:
+        # reading from each of them gives the rest of the file
+        starts = [n for n in range(0, len(program.records)) if program.records[n][0] in (hbin_writer.INDEX, hbin_writer.END)]
+        for (offset, moves, blocks), start in zip(index, starts):
+            if read(path, offset) != program.records[start:]:
+                failures += 1
+                print 'trial %d: reading from the index record at %d, after %d moves, gave different records' % (trial, offset, moves)
+                break
+
+    # without the trailer the file is truncated
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    f = open(path, 'wb')
+    f.write(data[:-12])
+    f.close()
+    try:
+        hbin_writer.read_index(path)
+        failures += 1
+        print 'trial %d: read_index read a file without its trailer' % trial
+    except ValueError:
+        pass
+    os.remove(path)
+
+print '%d failures' % failures
+if failures: sys.exit(1)
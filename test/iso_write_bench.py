@@ -0,0 +1,106 @@
+# times writing a generated program of rapids, feeds and arcs with iso.Creator, which joins the words of each block and
+# writes the block into a large file buffer, numbering the lines as they are written, against writing each word to the
+# file as it comes, with the file's default buffer, then numbering the lines by writing the file again, as it used to,
+# and checks that the files are the same
+# run with python 2 from the HeeksCNC folder:
+#     python test/iso_write_bench.py [number of moves]
+
+import sys
+import os
+import math
+import time
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import nc.nc
+nc.nc.nc = nc.nc # iso's "from nc import *" takes the name nc from nc.nc, as it does in the programs HeeksCNC runs
+import nc.iso as iso
+
+class WordCreator(iso.Creator):
+    # writes each word to the file as it comes, with the file's default buffer
+    def file_open(self, name):
+        self.file = open(name, 'w')
+        self.filename = name
+
+    def write(self, s):
+        if self.output_disabled == False:
+            nc.nc.Creator.write(self, s)
+        if '\n' in s:
+            self.start_of_line = s[-1] == '\n'
+
+def number_file(creator, filename):
+    # numbers the lines of the written file by copying it and writing it again
+    temp_filename = filename + '.renumbering'
+    f_in = open(filename, 'r')
+    f_out = open(temp_filename, 'w')
+    for line in f_in: f_out.write(line)
+    f_in.close()
+    f_out.close()
+    f_in = open(temp_filename, 'r')
+    f_out = open(filename, 'w')
+    n = creator.start_block_number
+    for line in f_in:
+        f_out.write(creator.BLOCK() % n + creator.SPACE_STR() + line)
+        n += creator.block_number_increment
+        if creator.block_number_restart_after != None:
+            if n >= creator.block_number_restart_after:
+                n = creator.start_block_number
+    f_in.close()
+    f_out.close()
+    os.remove(temp_filename)
+
+def write_program(creator, path, num_moves):
+    creator.file_open(path)
+    creator.program_begin(123, 'write test')
+    creator.absolute()
+    creator.metric()
+    creator.set_plane(0)
+    creator.tool_defn(1, 'mill', {'name': '3mm slot drill', 'diameter': 3.0, 'cutting edge height': 10.0})
+    creator.tool_change(1)
+    creator.spindle(5000, True)
+    creator.feedrate(200)
+    creator.rapid(0, 0, 5)
+    for i in range(0, num_moves):
+        a = i * 0.001
+        x = 50 * math.cos(a) + (i % 17) * 0.01
+        y = 50 * math.sin(a)
+        z = -(i % 13) * 0.1
+        k = i % 10
+        if k == 0: creator.rapid(x, y, 2)
+        elif k == 1: creator.feed(z = z)
+        elif k == 5: creator.arc_ccw(x, y, None, 0, 0)
+        elif k == 8: creator.arc_cw(x, y, z, x - 1, y)
+        else: creator.feed(x, y)
+    creator.program_end()
+
+def timed(creator_class, numbered, path, num_moves):
+    nc.nc.creator = creator = creator_class()
+    creator.output_block_numbers = numbered
+    start = time.time()
+    write_program(creator, path, num_moves)
+    if numbered and creator_class == WordCreator: number_file(creator, path)
+    return time.time() - start
+
+num_moves = 1000000
+if len(sys.argv) > 1: num_moves = int(sys.argv[1])
+
+failures = 0
+for numbered in (False, True):
+    results = []
+    for name, creator_class in (('words', WordCreator), ('blocks', iso.Creator)):
+        fd, path = tempfile.mkstemp('.tap')
+        os.close(fd)
+        t = timed(creator_class, numbered, path, num_moves)
+        f = open(path)
+        text = f.read()
+        f.close()
+        os.remove(path)
+        mb = len(text) / 1048576.0
+        print '%-12s %-7s %6.1f MB %8.3fs %6.2f MB/s' % (['not numbered', 'numbered'][numbered], name, mb, t, mb / t)
+        results.append((text, t))
+    if results[1][0] != results[0][0]:
+        failures += 1
+        print 'the files are DIFFERENT'
+    print '%-12s %.2f times faster' % ('', results[0][1] / results[1][1])
+
+print '%d failures' % failures
+if failures: sys.exit(1)
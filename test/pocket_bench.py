@@ -0,0 +1,194 @@
+# times area_funcs.zigzag on large and complicated pockets, against making the zigs by intersecting each band
+# between two zig lines with the area, as zigzag used to, and checks that every vertex of those zigs is on one of the
+# zigs zigzag makes along the same zig line; the pieces of a band may come in another order, and zigzag takes the zig
+# of a piece which stops below the next zig line over the top of it and back down, so the zigs themselves differ there
+# run with python 2 from the HeeksCNC folder, with the area module HeeksCNC uses on the path:
+#     python test/pocket_bench.py
+
+import sys
+import os
+import math
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import area
+import area_funcs
+
+tolerance = 0.01 # the furthest a vertex of a band zig may be from the zigs zigzag makes
+
+def polygon(points):
+    curve = area.Curve()
+    for x, y in points + [points[0]]:
+        curve.append(area.Point(x, y))
+    return curve
+
+def circle(cx, cy, r, dir):
+    curve = area.Curve()
+    curve.append(area.Point(cx + r, cy))
+    curve.append(area.Vertex(dir, area.Point(cx - r, cy), area.Point(cx, cy)))
+    curve.append(area.Vertex(dir, area.Point(cx + r, cy), area.Point(cx, cy)))
+    return curve
+
+def plate(n):
+    # a square with n by n round holes in it
+    a = area.Area()
+    a.append(polygon([(0, 0), (200, 0), (200, 200), (0, 200)]))
+    for i in range(0, n):
+        for j in range(0, n):
+            a.append(circle((i + 0.5) * 200.0 / n, (j + 0.5) * 200.0 / n, 60.0 / n, -1))
+    return a
+
+def star(points):
+    # a star with sharp points, most bands across it have several pieces
+    vertices = []
+    for i in range(0, 2 * points):
+        r = 100.0
+        if i % 2: r = 40.0
+        vertices.append((r * math.cos(math.pi * i / points), r * math.sin(math.pi * i / points)))
+    a = area.Area()
+    a.append(polygon(vertices))
+    return a
+
+def comb(teeth):
+    # a bar with teeth pointing up, each band across the teeth has a piece in every tooth
+    vertices = [(0, 0), (10 * teeth - 4, 0)]
+    for i in range(teeth - 1, -1, -1):
+        x = i * 10
+        vertices.append((x + 6, 100))
+        vertices.append((x, 100))
+        if i > 0:
+            vertices.append((x, 10))
+            vertices.append((x - 4, 10))
+    a = area.Area()
+    a.append(polygon(vertices))
+    return a
+
+def disc(r):
+    # one big circle, every band is one piece
+    a = area.Area()
+    a.append(circle(0, 0, r, 1))
+    return a
+
+def set_zig_angle(zig_angle):
+    radians_angle = zig_angle * math.pi / 180
+    area_funcs.sin_angle_for_zigs = math.sin(-radians_angle)
+    area_funcs.cos_angle_for_zigs = math.cos(-radians_angle)
+    area_funcs.sin_minus_angle_for_zigs = math.sin(radians_angle)
+    area_funcs.cos_minus_angle_for_zigs = math.cos(radians_angle)
+
+def band_zig(curve, y0, y, zig_unidirectional):
+    # the zig of a piece of a band, from the piece's side on the zig line at y0 up to the next at y
+    close = 0.002 * area_funcs.one_over_units
+    if area_funcs.rightward_for_zigs:
+        curve.Reverse()
+
+    # a high point to start looking from, the furthest left or right of the highest
+    high_point = None
+    for vertex in curve.getVertices():
+        if high_point == None or vertex.p.y > high_point.y: high_point = vertex.p
+        elif math.fabs(vertex.p.y - high_point.y) < close:
+            if area_funcs.rightward_for_zigs:
+                if vertex.p.x < high_point.x: high_point = vertex.p
+            elif vertex.p.x > high_point.x: high_point = vertex.p
+
+    zig = area.Curve()
+    high_point_found = False
+    zig_started = False
+    zag_found = False
+    for i in range(0, 2): # twice, because the curve may start anywhere
+        prev_p = None
+        for vertex in curve.getVertices():
+            if zag_found: break
+            if prev_p != None:
+                if zig_started:
+                    zig.append(area_funcs.unrotated_vertex(vertex))
+                    if math.fabs(vertex.p.y - y) < close:
+                        zag_found = True
+                        break
+                elif high_point_found:
+                    if math.fabs(vertex.p.y - y0) < close and math.fabs(prev_p.y - y0) < close and vertex.type == 0:
+                        zig.append(area.Vertex(0, area_funcs.unrotated_point(prev_p), area.Point(0, 0)))
+                        zig.append(area_funcs.unrotated_vertex(vertex))
+                        zig_started = True
+                elif vertex.p.x == high_point.x and vertex.p.y == high_point.y:
+                    high_point_found = True
+            prev_p = vertex.p
+
+    if zig_started:
+        if zig_unidirectional == True:
+            vertices = area_funcs.remove_zag(zig.getVertices(), y0, y)
+            zig = area.Curve()
+            for v in vertices:
+                zig.append(v)
+        area_funcs.curve_list_for_zigs.append(zig)
+
+def band_zigzag(a, stepover, zig_unidirectional):
+    # the zigs made by intersecting every band with the area
+    area_funcs.one_over_units = 1 / area.get_units()
+    a = area_funcs.rotated_area(a)
+    b = area.Box()
+    a.GetBox(b)
+    x0 = b.MinX() - 1.0
+    x1 = b.MaxX() + 1.0
+    num_steps = int((b.MaxY() - b.MinY()) / stepover + 1)
+    y = b.MinY() + 0.1 * area_funcs.one_over_units
+    area_funcs.rightward_for_zigs = True
+    area_funcs.curve_list_for_zigs = []
+    for i in range(0, num_steps):
+        band = area.Area()
+        band.append(polygon([(x0, y), (x0, y + stepover), (x1, y + stepover), (x1, y)]))
+        band.Intersect(a)
+        for curve in band.getCurves():
+            band_zig(curve, y, y + stepover, zig_unidirectional)
+        y = y + stepover
+        if zig_unidirectional == False:
+            area_funcs.rightward_for_zigs = (area_funcs.rightward_for_zigs == False)
+    area_funcs.reorder_zigs()
+    return area_funcs.curve_list_for_zigs
+
+def swept_zigzag(a, stepover, zig_unidirectional):
+    area_funcs.zigzag(a, stepover, zig_unidirectional)
+    return area_funcs.curve_list_for_zigs
+
+def timed(function, a, stepover, zig_unidirectional):
+    start = time.time()
+    zigs = function(a, stepover, zig_unidirectional)
+    return zigs, time.time() - start
+
+def zig_line(curve, stepover):
+    # the number of the zig line a zig starts on
+    return int(math.floor(area_funcs.rotated_point(curve.FirstVertex().p).y / stepover + 0.5))
+
+def furthest_off(band_zigs, swept_zigs, stepover):
+    # the furthest a vertex of a band zig is from the zigs zigzag makes along the same zig line
+    on_line = {}
+    for curve in swept_zigs:
+        on_line.setdefault(zig_line(curve, stepover), []).append(curve)
+    d = 0.0
+    for curve in band_zigs:
+        others = on_line.get(zig_line(curve, stepover), [])
+        for vertex in curve.getVertices():
+            nearest = None
+            for other in others:
+                dist = vertex.p.dist(other.NearestPoint(vertex.p))
+                if nearest == None or dist < nearest: nearest = dist
+            if nearest == None: nearest = float('inf')
+            d = max(d, nearest)
+    return d
+
+def compare(name, a, stepover):
+    for zig_angle in (0, 30):
+        for zig_unidirectional in (False, True):
+            set_zig_angle(zig_angle)
+            band_zigs, band_time = timed(band_zigzag, a, stepover, zig_unidirectional)
+            swept_zigs, swept_time = timed(swept_zigzag, a, stepover, zig_unidirectional)
+            worst = furthest_off(band_zigs, swept_zigs, stepover)
+            print '%-16s angle %2d %-15s zigs %5d %5d  worst %.4f  bands %8.3fs  sweep %8.3fs  %s' % (name, zig_angle,
+                ['zigzag', 'unidirectional'][zig_unidirectional], len(band_zigs), len(swept_zigs), worst, band_time, swept_time,
+                ['NOT COVERED', 'covered'][worst < tolerance])
+
+compare('disc r100', disc(100), 0.5)
+compare('disc r500', disc(500), 1.0)
+compare('plate 5x5', plate(5), 1.0)
+compare('plate 20x20', plate(20), 0.5)
+compare('star 50', star(50), 0.5)
+compare('comb 50', comb(50), 0.5)
@@ -0,0 +1,104 @@
+# times splitting the lines of a generated iso program into words with nc_read's lineToWords, against using a simpler
+# pattern for lines without comments or variables, and against a scanner written in python for those lines,
+# checks that all three give the same words, then times reading the whole program with iso_read
+# run with python 2 from the HeeksCNC folder, with the area module HeeksCNC uses on the path:
+#     python test/read_bench.py [number of lines]
+
+import sys
+import os
+import math
+import time
+import tempfile
+import re
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nc'))
+import nc_read
+import iso_read
+
+class NullWriter:
+    # does nothing with what the parser finds
+    def __getattr__(self, name):
+        return self.null
+
+    def null(self, *args):
+        pass
+
+def program(num_lines):
+    # moves and arcs like a post processor writes, with a comment or a variable now and then
+    lines = ['%', 'O0001', '(PROGRAM MADE FOR TIMING)', 'G21 G90 G17', 'T1 M06', 'S5000 M03', 'G0 X0. Y0. Z5.', '#1=2.5']
+    for i in range(0, num_lines):
+        a = i * 0.01
+        x = 50 * math.cos(a)
+        y = 50 * math.sin(a)
+        if i % 500 == 0: lines.append('(PASS %d)' % (i / 500))
+        elif i % 20 == 0: lines.append('G3 X%.3f Y%.3f I%.3f J%.3f' % (x, y, -x / 2, -y / 2))
+        elif i % 20 == 1: lines.append('G1 X%.3f Y%.3f' % (x, y))
+        elif i % 7 == 0: lines.append('N%d G1 X%.3f Y%.3f Z-%.3f F200.' % (i, x, y, (i % 13) * 0.1))
+        else: lines.append('X%.3f Y%.3f' % (x, y))
+    lines.append('M30')
+    return lines
+
+def scan(line):
+    # the words of a line without comments or variables, found one character at a time
+    words = []
+    i = 0
+    n = len(line)
+    while i < n:
+        start = i
+        if line[i].isspace():
+            while i < n and line[i].isspace(): i += 1
+        elif line[i].isalnum() or line[i] in '_:':
+            i += 1
+            if i < n and line[i] in '+-': i += 1
+            while i < n and line[i].isdigit(): i += 1
+            if i < n and line[i] == '.':
+                i += 1
+                while i < n and line[i].isdigit(): i += 1
+        else:
+            i += 1
+            continue
+        words.append(line[start:i])
+    return words
+
+num_lines = 200000
+if len(sys.argv) > 1: num_lines = int(sys.argv[1])
+lines = program(num_lines)
+
+# lines without comments or variables only have letter/number pairs and spaces, which this splits up the same way
+simple_pattern = re.compile('(\s+|[a-zA-Z0-9_:](?:[+-])?\d*(?:\.\d*)?)')
+not_simple_pattern = re.compile('[(!;#]')
+
+class SimplePatternParser(nc_read.Parser):
+    def lineToWords(self):
+        if not_simple_pattern.search(self.line) == None:
+            return simple_pattern.findall(self.line)
+        return self.pattern_main.findall(self.line)
+
+class ScannerParser(nc_read.Parser):
+    def lineToWords(self):
+        if not_simple_pattern.search(self.line) == None:
+            return scan(self.line)
+        return self.pattern_main.findall(self.line)
+
+parsers = [('lineToWords', nc_read.Parser(NullWriter())), ('simple pattern', SimplePatternParser(NullWriter())), ('python scanner', ScannerParser(NullWriter()))]
+
+results = []
+for name, parser in parsers:
+    parser.file_in = open(os.devnull, 'r') # closed by Parser.__del__
+    words = []
+    start = time.time()
+    for line in lines:
+        parser.line = line
+        words.append(parser.lineToWords())
+    print '%-15s %8.3fs' % (name, time.time() - start)
+    results.append(words)
+if results[1] != results[0] or results[2] != results[0]:
+    print 'the words are DIFFERENT'
+
+fd, path = tempfile.mkstemp('.nc')
+f = os.fdopen(fd, 'w')
+f.write('\n'.join(lines) + '\n')
+f.close()
+start = time.time()
+iso_read.Parser(NullWriter()).Parse(path)
+print '%-15s %8.3fs for %d lines' % ('iso_read', time.time() - start, len(lines))
+os.remove(path)
@@ -0,0 +1,51 @@
+# feeds points, given as ints, along lines through nc.simplify with text, and output turned off and on, between them, and checks
+# that the creator it writes to gets each line, joined up, before the text and the output switches, not after
+# run with python 2 from the HeeksCNC folder:
+#     python test/simplify_test.py
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import nc.nc
+nc.nc.nc = nc.nc # recreator's "from nc import *" takes the name nc from nc.nc, as it does in the programs HeeksCNC runs
+import nc.simplify
+
+class Recorder:
+    # keeps the name and arguments of each call it is given
+    def __init__(self):
+        self.x = None
+        self.y = None
+        self.z = None
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name.startswith('__'): raise AttributeError(name)
+        return lambda *args: self.calls.append((name,) + args)
+
+recorder = Recorder()
+nc.nc.creator = recorder
+nc.nc.rapid(0, 0, 0)
+recorder.x, recorder.y, recorder.z = 0, 0, 0
+nc.simplify.simplify_begin()
+for i in range(1, 6): nc.nc.feed(i, 0, 0)
+nc.nc.write('(first)\n')
+for i in range(1, 6): nc.nc.feed(5, i, 0)
+nc.nc.creator.disable_output()
+for i in range(6, 11): nc.nc.feed(5, i, 0)
+nc.nc.creator.enable_output()
+for i in range(6, 11): nc.nc.feed(i, 10, 0)
+nc.simplify.simplify_end()
+
+expected = [('rapid', 0, 0, 0, None, None, None), ('feed', 5, None, None), ('write', '(first)\n'), ('feed', None, 5, None),
+    ('disable_output',), ('feed', None, 10, None), ('enable_output',), ('feed', 10, None, None)]
+
+failures = 0
+if recorder.calls != expected:
+    failures += 1
+    print 'the calls were:'
+    for call in recorder.calls: print '    %r' % (call,)
+    print 'not:'
+    for call in expected: print '    %r' % (call,)
+
+print '%d failures' % failures
+if failures: sys.exit(1)
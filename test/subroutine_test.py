@@ -0,0 +1,73 @@
+# posts a pocket and a profile at several depths with area_funcs.use_subroutines and kurve_funcs.use_subroutines on,
+# through iso, which writes subroutines, and through posts which don't keep a program number, like mach3, which
+# must give the same moves as with subroutines off
+# run with python 2 from the HeeksCNC folder, with the area module HeeksCNC uses on the path:
+#     python test/subroutine_test.py
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import area
+import nc.nc
+nc.nc.nc = nc.nc # the posts' "from nc import *" takes the name nc from nc.nc, as it does in the programs HeeksCNC runs
+import area_funcs
+import kurve_funcs
+import geometry_cache
+from depth_params import depth_params
+
+geometry_cache.cache.size_limit = 0 # calculate everything each time
+
+def square(x, y, w):
+    curve = area.Curve()
+    for px, py in ((x, y), (x + w, y), (x + w, y + w), (x, y + w), (x, y)):
+        curve.append(area.Point(px, py))
+    return curve
+
+def post(machine, subroutines):
+    # returns the text of the program
+    __import__('nc.' + machine)
+    nc.nc.creator = sys.modules['nc.' + machine].Creator() # a new one each time, with none of the modes of the last
+    area_funcs.use_subroutines = subroutines
+    kurve_funcs.use_subroutines = subroutines
+    fd, path = tempfile.mkstemp('.tap')
+    os.close(fd)
+    nc.nc.output(path)
+    nc.nc.program_begin(123, 'subroutine test')
+    nc.nc.absolute()
+    nc.nc.metric()
+    nc.nc.feedrate(100)
+    depths = depth_params(10, 2, 0, 1, 0, 0, -4, None)
+    a = area.Area()
+    a.append(square(0, 0, 20))
+    a.append(square(30, 0, 20))
+    area_funcs.pocket(a, 1.5, 0, 2.0, depths, False, False, False, 0)
+    if nc.nc.use_CRC() == False: # profiles with cutter radius compensation don't use subroutines
+        kurve_funcs.profile(square(0, 30, 20), 'left', 1.5, 0, 2.0, 'auto', 'auto', depths)
+    nc.nc.program_end()
+    nc.nc.creator.file_close()
+    f = open(path)
+    text = f.read()
+    f.close()
+    os.remove(path)
+    return text
+
+failures = 0
+text = post('iso', True)
+if text.find('M98') == -1:
+    failures += 1
+    print 'iso: no subroutine calls'
+for machine in ['mach3', 'emc2', 'tnc151', 'centroid1', 'hm50', 'gantry_router']:
+    try:
+        expanded = post(machine, False)
+        text = post(machine, True)
+    except Exception, e:
+        failures += 1
+        print '%s: %s' % (machine, e)
+        continue
+    if text != expanded:
+        failures += 1
+        print '%s: different moves with subroutines on' % machine
+
+print '%d failures' % failures
+if failures: sys.exit(1)
@@ -0,0 +1,161 @@
+# times removing a tool's cylinders along the moves of a pocket program with Tool.cut_line, against cutting the
+# tool at points spaced along each move, as Toolpath.cut_line used to, and counts the remove_cylinder calls
+# run with python 2 from the HeeksCNC folder, with the area, voxelcut and coords modules the simulator uses on the path:
+#     python test/voxel_bench.py
+# voxelcut can't give back which voxels were removed, so with --model, remove_cylinder is done in a numpy array instead,
+# which also counts the voxels each way leaves that cutting the tool at 20 points per voxel along the moves removes;
+# voxels left more than one voxel inside that volume are counted as deep
+#     python test/voxel_bench.py --model
+
+import sys
+import os
+import math
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+model = ('--model' in sys.argv)
+
+if model:
+    import numpy
+    import types
+
+    class VoxelModel:
+        # removes voxels whose centre is within the radius of x, y, from z0 up to z1, like voxelcut does
+        def __init__(self, nx, ny, nz):
+            self.grid = numpy.ones((nx, ny, nz), dtype = bool)
+            self.masks = {}
+
+        def remove_cylinder(self, x0, y0, z0, x1, y1, z1, r):
+            x0 = int(x0); y0 = int(y0); z0 = int(z0); z1 = int(z1); r = int(r)
+            mask = self.masks.get(r)
+            if mask is None:
+                a = numpy.arange(-r, r + 1)
+                mask = self.masks[r] = (a[:, None] ** 2 + a[None, :] ** 2) <= r * r
+            z0 = max(z0, 0)
+            z1 = min(z1, self.grid.shape[2])
+            if z0 >= z1: return
+            block = self.grid[x0 - r:x0 + r + 1, y0 - r:y0 + r + 1, z0:z1]
+            block &= ~mask[:block.shape[0], :block.shape[1], None]
+
+    voxels = None
+    voxelcut = types.ModuleType('voxelcut')
+    def remove_cylinder(x0, y0, z0, x1, y1, z1, r): voxels.remove_cylinder(x0, y0, z0, x1, y1, z1, r)
+    voxelcut.remove_cylinder = remove_cylinder
+    voxelcut.set_current_color = lambda color: None
+    sys.modules['voxelcut'] = voxelcut
+
+import voxelcut
+import Toolpath
+
+calls = [0]
+remove_cylinder = voxelcut.remove_cylinder
+def counted_remove_cylinder(x0, y0, z0, x1, y1, z1, r):
+    calls[0] += 1
+    remove_cylinder(x0, y0, z0, x1, y1, z1, r)
+voxelcut.remove_cylinder = counted_remove_cylinder
+
+offset = (10.0, 10.0, 6.0) # mm, from the program's origin to the corner of the block of voxels
+
+def flat_tool(radius, voxels_per_mm):
+    tool = Toolpath.Tool([])
+    tool.cylinders = [Toolpath.VoxelCyl(radius * voxels_per_mm, 0, 1), Toolpath.VoxelCyl(radius * voxels_per_mm, 12 * voxels_per_mm, 2)]
+    tool.cylinders[0].z_top = int(12 * voxels_per_mm)
+    tool.cylinders[1].z_top = int(30 * voxels_per_mm)
+    return tool
+
+def ball_tool(radius, voxels_per_mm):
+    # a cylinder for each layer of voxels of the ball, as Tool.calculate_span_cylinders makes them, then the shank
+    tool = Toolpath.Tool([])
+    z = 0.0
+    while z < radius:
+        tool.cylinders.append(Toolpath.VoxelCyl(math.sqrt(radius * radius - (radius - z) * (radius - z)) * voxels_per_mm, z * voxels_per_mm, 1))
+        z += 1 / voxels_per_mm
+    tool.cylinders.append(Toolpath.VoxelCyl(radius * voxels_per_mm, radius * voxels_per_mm, 1))
+    tool.cylinders[-1].z_top = int(20 * voxels_per_mm)
+    tool.refine_cylinders()
+    return tool
+
+def pocket_moves():
+    # a 60 by 40 pocket, cut in offset rectangles 2.5mm apart, at three depths, ramping down to each depth
+    moves = []
+    p = (0.0, 0.0, 5.0)
+    def move(x = None, y = None, z = None):
+        if x == None: x = p[0]
+        if y == None: y = p[1]
+        if z == None: z = p[2]
+        moves.append((p, (x, y, z)))
+        return (x, y, z)
+    for depth in [-2.0, -4.0, -6.0]:
+        p = move(30, 20, 5)
+        p = move(z = depth + 2)
+        p = move(35, 20, depth)
+        p = move(30, 20)
+        offsets = []
+        off = 3.0
+        while off < 20:
+            offsets.append(off)
+            off += 2.5
+        offsets.reverse()
+        for off in offsets:
+            x0, y0, x1, y1 = off, off, 60 - off, 40 - off
+            if x1 <= x0:
+                x0 = 30
+                x1 = 30
+            p = move(x0, y0)
+            p = move(x1, y0)
+            p = move(x1, y1)
+            p = move(x0, y1)
+            p = move(x0, y0)
+        p = move(z = 5)
+    return moves
+
+def to_voxels(p, voxels_per_mm):
+    return ((p[0] + offset[0]) * voxels_per_mm, (p[1] + offset[1]) * voxels_per_mm, (p[2] + offset[2]) * voxels_per_mm)
+
+def cut_at_points(tool, moves, voxels_per_mm, points_per_voxel):
+    # the tool cut at points spaced along each move
+    for p0, p1 in moves:
+        length = math.sqrt((p1[0] - p0[0]) ** 2 + (p1[1] - p0[1]) ** 2 + (p1[2] - p0[2]) ** 2)
+        num_segments = int(1 + length * voxels_per_mm * points_per_voxel)
+        for i in range(0, num_segments + 1):
+            f = float(i) / num_segments
+            x, y, z = to_voxels((p0[0] + (p1[0] - p0[0]) * f, p0[1] + (p1[1] - p0[1]) * f, p0[2] + (p1[2] - p0[2]) * f), voxels_per_mm)
+            tool.cut(x, y, z, False)
+
+def cut_lines(tool, moves, voxels_per_mm):
+    for p0, p1 in moves:
+        x0, y0, z0 = to_voxels(p0, voxels_per_mm)
+        x1, y1, z1 = to_voxels(p1, voxels_per_mm)
+        tool.cut_line(x0, y0, z0, x1, y1, z1, False)
+
+def run(name, function):
+    global voxels
+    if model: voxels = VoxelModel(int(80 * voxels_per_mm), int(60 * voxels_per_mm), int(40 * voxels_per_mm))
+    calls[0] = 0
+    start = time.time()
+    function()
+    t = time.time() - start
+    left = None
+    if model: left = voxels.grid[:, :, :int((5 + offset[2]) * voxels_per_mm)] # below the top of the material
+    return (name, calls[0], t, left)
+
+def inside(removed):
+    # the removed voxels whose six neighbours are removed too
+    result = removed.copy()
+    for axis in range(0, 3):
+        for d in (1, -1):
+            result &= numpy.roll(removed, d, axis)
+    return result
+
+moves = pocket_moves()
+for kind, radius, voxels_per_mm in (('flat', 0.5, 4.0), ('flat', 3.0, 4.0), ('ball', 1.0, 4.0), ('ball', 3.0, 4.0), ('ball', 3.0, 10.0)):
+    if kind == 'flat': tool = flat_tool(radius, voxels_per_mm)
+    else: tool = ball_tool(radius, voxels_per_mm)
+    results = [run('points', lambda: cut_at_points(tool, moves, voxels_per_mm, 0.2)), run('cut_line', lambda: cut_lines(tool, moves, voxels_per_mm))]
+    if model: reference = ~run('reference', lambda: cut_at_points(tool, moves, voxels_per_mm, 20))[3]
+    for name, num_calls, t, left in results:
+        line = '%s %gmm %g voxels/mm %-8s %7d calls %8.3fs' % (kind, radius * 2, voxels_per_mm, name, num_calls, t)
+        if model:
+            missed = reference & left
+            line += '  %7d voxels left, %6d deep, %5d extra' % (missed.sum(), (missed & inside(reference)).sum(), (~left & ~reference).sum())
+        print line
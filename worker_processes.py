@@ -0,0 +1,17 @@
+import os
+import multiprocessing
+
+# the profiles, pocket regions and ocl layers of a program can be made in worker processes, each module having its own
+# processes setting, for example kurve_funcs.processes = 4
+
+def map_jobs(function, jobs, processes):
+    # calls function for each of jobs in worker processes, giving a list of the results in the same order
+    # the processes need fork, on Windows they would run the whole program again, so the jobs are done here
+    if processes > 1 and len(jobs) > 1 and hasattr(os, 'fork'):
+        pool = multiprocessing.Pool(min(processes, len(jobs)))
+        try:
+            return pool.map(function, jobs, 1)
+        finally:
+            pool.close()
+            pool.join()
+    return map(function, jobs)